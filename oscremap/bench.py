@@ -0,0 +1,182 @@
+import os
+import random
+import re
+import socket
+import tempfile
+import time
+
+from bidict import frozenbidict
+
+from .midi import BACKEND_LOOPBACK, CONTROL_CHANGE, LOOPBACK_PORT
+from .rules import SIDE_DAW, RuleSet
+
+
+def generate_rules(num_rules):
+    """
+    Build mix of exact, capturing and fan-out rules for benchmarking.
+    """
+    rules = []
+    for idx in range(num_rules):
+        kind = idx % 3
+        if kind == 0:
+            rules.append({
+                'match': '/bench/exact/{}'.format(idx),
+                'send': {'address': '/out/exact/{}'.format(idx)},
+            })
+        elif kind == 1:
+            rules.append({
+                'match': '/bench/{}/track/{{track:int}}/volume'.format(idx),
+                'send': {
+                    'address': '/out/{}/{{track}}/fader'.format(idx),
+                    'args': [{'arg': 0, 'scale': [0, 1, 0, 127],
+                              'type': 'int'}],
+                },
+            })
+        else:
+            rules.append({
+                'match': '/bench/{}/macro/{{name}}'.format(idx),
+                'send': [
+                    {'address': '/out/{}/a/{{name}}'.format(idx)},
+                    {'address': '/out/{}/b/{{name}}'.format(idx),
+                     'args': [{'arg': 0, 'scale': [0, 1, 1, 0]}]},
+                    {'address': '/out/{}/label'.format(idx),
+                     'args': ['{name}'], 'to': SIDE_DAW},
+                ],
+            })
+    return rules
+
+
+def generate_addresses(num_rules, count, miss_ratio=0.25):
+    addresses = []
+    for _ in range(count):
+        idx = random.randrange(num_rules)
+        if random.random() < miss_ratio:
+            addresses.append('/fx/param/{}/val'.format(idx))
+            continue
+        kind = idx % 3
+        if kind == 0:
+            addresses.append('/bench/exact/{}'.format(idx))
+        elif kind == 1:
+            addresses.append('/bench/{}/track/{}/volume'.format(
+                idx, random.randrange(64)))
+        else:
+            addresses.append('/bench/{}/macro/m{}'.format(
+                idx, random.randrange(8)))
+    return addresses
+
+
+def compile_regex(pattern):
+    regex = re.sub(r'\{(\w+)(?::\w+)?\}', r'(?P<\1>[^/]+)', pattern)
+    return re.compile('^' + regex + '$')
+
+
+def bench_rules(num_rules, count):
+    """
+    Time routing of count messages through num_rules rules, compiled and
+    as linear scan over regular expressions for comparison.
+    """
+    rules_cfg = generate_rules(num_rules)
+    addresses = generate_addresses(num_rules, count)
+    args = (0.5,)
+
+    rules = RuleSet(rules_cfg)
+    route = rules.route
+    matched = 0
+    start_time = time.perf_counter()
+    for address in addresses:
+        if route(SIDE_DAW, address, args) is not None:
+            matched += 1
+    compiled_time = time.perf_counter() - start_time
+
+    regexes = [compile_regex(rule['match']) for rule in rules_cfg]
+    start_time = time.perf_counter()
+    for address in addresses:
+        for regex in regexes:
+            if regex.match(address):
+                break
+    linear_time = time.perf_counter() - start_time
+
+    return {
+        'rules': num_rules,
+        'messages': count,
+        'matched': matched,
+        'compiled_us': compiled_time / count * 1e6,
+        'linear_us': linear_time / count * 1e6,
+        'compiled_rate': count / compiled_time,
+    }
+
+
+BENCH_FX_NAME = 'oscremap-bench'
+
+
+def midi_bench_config(fx_maps_path, params, daw_port):
+    return {
+        'fx_maps_path': fx_maps_path,
+        'global': {'params': params},
+        'controller_midi': {
+            'backend': BACKEND_LOOPBACK,
+            'input_port': LOOPBACK_PORT,
+            'output_port': LOOPBACK_PORT,
+            'param_channel': 0,
+            'cmd_channel': 1,
+            'cc_param_start': 0,
+        },
+        'controller_osc': {
+            'listen_ip': '127.0.0.1',
+            'listen_port': 0,
+            'remote_ip': '127.0.0.1',
+            'remote_port': daw_port,
+        },
+        'daw_osc': {
+            'listen_ip': '127.0.0.1',
+            'listen_port': 0,
+            'remote_ip': '127.0.0.1',
+            'remote_port': daw_port,
+        },
+    }
+
+
+def bench_midi(count, params=16):
+    """
+    Time handling of count controller CCs injected through loopback midi
+    backend into proxy with all params mapped.
+
+    Proxy output is sent to local socket which is never read.
+    """
+    # imported here, proxy pulls in all of its dependencies
+    from .oscproxy import OSCProxy
+
+    messages = [
+        [CONTROL_CHANGE, random.randrange(params), random.randrange(128)]
+        for _ in range(count)
+    ]
+
+    sink = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sink.bind(('127.0.0.1', 0))
+    try:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            proxy = OSCProxy(midi_bench_config(
+                os.path.join(tmp_dir, 'fx_maps.yaml'), params,
+                sink.getsockname()[1]))
+            proxy.fx_maps[BENCH_FX_NAME] = frozenbidict({
+                param: param for param in range(1, params + 1)})
+            proxy.set_fx(BENCH_FX_NAME)
+
+            inject = proxy.midi_in.inject
+            start_time = time.perf_counter()
+            for msg in messages:
+                inject(msg)
+            elapsed = time.perf_counter() - start_time
+
+            # servers were never started, only their sockets are open
+            proxy.daw_osc_server.server_close()
+            proxy.ctl_osc_server.server_close()
+    finally:
+        sink.close()
+
+    return {
+        'messages': count,
+        'params': params,
+        'us': elapsed / count * 1e6,
+        'rate': count / elapsed,
+    }
@@ -0,0 +1,124 @@
+import logging
+import struct
+import threading
+import time
+from collections import deque
+
+
+logger = logging.getLogger(__name__)
+
+
+CAPTURE_MAGIC = b'OSCRMAP\x01'
+CAPTURE_HEADER = struct.Struct('<8sd')
+# 32-bit length, stream transports carry packets over 64k
+CAPTURE_RECORD = struct.Struct('<dBI')
+
+SOURCE_DAW_OSC = 0
+SOURCE_CTL_OSC = 1
+SOURCE_CTL_MIDI = 2
+
+SOURCE_NAMES = {
+    SOURCE_DAW_OSC: 'daw_osc',
+    SOURCE_CTL_OSC: 'controller_osc',
+    SOURCE_CTL_MIDI: 'controller_midi',
+}
+
+
+class CaptureWriter(object):
+    """
+    Append timestamped raw packets to capture file.
+
+    Recording only appends to in-memory deque, packing and writing is
+    done in batches by background thread.
+    """
+
+    def __init__(self, path, flush_interval=0.25):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.pending = deque()
+        self.count = 0
+        self.running = False
+        self.start_time = time.monotonic()
+        self.file = open(path, 'wb')
+        self.file.write(CAPTURE_HEADER.pack(CAPTURE_MAGIC, time.time()))
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(
+            target=self.run, name='capture-writer', daemon=True)
+
+    def record(self, source, data):
+        self.pending.append((time.monotonic(), source, bytes(data)))
+
+    def start(self):
+        logger.info('Recording traffic to %s', self.path)
+        self.running = True
+        self.thread.start()
+
+    def run(self):
+        while not self.stop_event.wait(self.flush_interval):
+            self.flush()
+
+    def flush(self):
+        buf = bytearray()
+        pending = self.pending
+        while pending:
+            timestamp, source, data = pending.popleft()
+            buf += CAPTURE_RECORD.pack(
+                timestamp - self.start_time, source, len(data))
+            buf += data
+            self.count += 1
+        if buf:
+            self.file.write(buf)
+            self.file.flush()
+
+    def close(self):
+        if self.running:
+            self.stop_event.set()
+            self.thread.join()
+            self.running = False
+        self.flush()
+        self.file.close()
+        logger.info('Recorded %d packets to %s', self.count, self.path)
+
+
+def read_capture(path):
+    """
+    Iterate over (offset, source, data) records of capture file.
+    """
+    with open(path, 'rb') as f:
+        header = f.read(CAPTURE_HEADER.size)
+        magic, _ = CAPTURE_HEADER.unpack(header)
+        if magic != CAPTURE_MAGIC:
+            raise ValueError('{} is not a capture file'.format(path))
+
+        while True:
+            record = f.read(CAPTURE_RECORD.size)
+            if len(record) < CAPTURE_RECORD.size:
+                return
+            offset, source, length = CAPTURE_RECORD.unpack(record)
+            yield offset, source, f.read(length)
+
+
+def replay_capture(path, senders, speed=1.0):
+    """
+    Play back capture file calling sender for source of each record.
+
+    Records are paced according to their original offsets divided by
+    speed, speed of 0 sends everything as fast as possible.
+    """
+    start_time = time.monotonic()
+    count = 0
+
+    for offset, source, data in read_capture(path):
+        send = senders.get(source)
+        if send is None:
+            continue
+
+        if speed > 0:
+            delay = start_time + offset / speed - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+
+        send(data)
+        count += 1
+
+    return count, time.monotonic() - start_time
@@ -5,16 +5,26 @@
 import logging
 import os
 import sys
+import threading
+import time
 
 import click
 import mido
-import rtmidi
 import yaml
 
-from pythonosc import udp_client
-
+from .bench import bench_midi, bench_rules
+from .capture import (
+    CaptureWriter, replay_capture,
+    SOURCE_CTL_MIDI, SOURCE_CTL_OSC, SOURCE_DAW_OSC)
+from .loadgen import LOADGEN_FX_NAMES, LoadGenerator
+from .midi import create_midi_ports
 from .oscproxy import OSCProxy
-from .qoscremap.qoscremap import get_app, get_window
+from .watcher import FileWatcher
+from .profiler import SamplingProfiler
+from .sender import Packet
+from .transport import create_osc_client, peer_endpoint
+from .qoscremap.qoscremap import (
+    enable_signal_handling, get_app, get_window)
 
 
 logger = logging.getLogger(__name__)
@@ -50,8 +60,7 @@ def generate_config(config):
     """
     config_path = get_config_path()
 
-    midi_in = rtmidi.MidiIn()
-    midi_out = rtmidi.MidiOut()
+    midi_in, midi_out = create_midi_ports()
 
     config_template = {
         'global': {
@@ -143,11 +152,127 @@ def send_osc(config, addr, args):
     current_config = get_config(config)
 
     cfg_daw_osc = current_config['daw_osc']
-    ctl_osc_client = udp_client.SimpleUDPClient(
-        cfg_daw_osc['listen_ip'], cfg_daw_osc['listen_port'])
+    ctl_osc_client = create_osc_client(peer_endpoint(cfg_daw_osc))
     ctl_osc_client.send_message(addr, eval(args))
 
 
+@cli.command()
+@click.option('-c', '--config', help='Configuration name to use',
+              default='default')
+@click.option('-p', '--pattern', default='sweep',
+              type=click.Choice(['sweep', 'fx-switch', 'midi']),
+              help='Traffic pattern to generate')
+@click.option('-n', '--params', default=16,
+              help='Number of params to drive')
+@click.option('-r', '--rate', default=50.0,
+              help='Sweeps, FX switches or CC rounds per second')
+@click.option('-d', '--duration', default=10.0,
+              help='Duration of the test in seconds')
+@click.option('--direction', default='daw',
+              type=click.Choice(['daw', 'ctl']),
+              help='Side the sweep pattern sends from')
+@click.option('--fx-params', default=512,
+              help='Number of params dumped on each FX switch')
+@click.option('--midi-port', default='oscremap loadgen',
+              help='Name of virtual midi port to send CC flood through')
+@click.option('--learn/--no-learn', default=True,
+              help='Learn mappings for test FX before starting')
+def loadgen(config, pattern, params, rate, duration, direction, fx_params,
+            midi_port, learn):
+    """
+    Stress test running proxy and measure delivery rate, loss and latency.
+
+    Output of the proxy is received on remote ports of DAW and controller,
+    so neither should be running. Set "send_remote: true" in controller_osc
+    section to measure delivery to controller. For midi pattern the proxy
+    has to be started with input port set to the virtual port.
+    """
+    current_config = get_config(config)
+
+    midi_out = None
+    if pattern == 'midi':
+        midi_out = mido.open_output(midi_port, virtual=True)
+
+    load_generator = LoadGenerator(current_config)
+    load_generator.start()
+
+    if learn:
+        for fx_name in LOADGEN_FX_NAMES:
+            load_generator.learn(fx_name, params)
+    else:
+        load_generator.learned_params = params
+    load_generator.select_fx(LOADGEN_FX_NAMES[0])
+
+    click.echo('Running {} pattern for {}s'.format(pattern, duration))
+
+    if pattern == 'sweep':
+        load_generator.sweep(params, rate, duration, direction)
+    elif pattern == 'fx-switch':
+        load_generator.fx_switch(
+            fx_params, rate, duration, LOADGEN_FX_NAMES)
+    elif pattern == 'midi':
+        load_generator.midi_flood(midi_out, params, rate, duration)
+
+    load_generator.stop()
+
+    for side, report in load_generator.reports().items():
+        if not report['sent']:
+            continue
+        click.echo(
+            'To {}: sent {sent} received {received} lost {lost}'
+            ' ({loss_pct:.2f}%) unmatched {unmatched}'
+            ' rate {rate:.1f} msg/s'.format(side, **report))
+        click.echo(
+            '  latency ms: min {:.3f} avg {:.3f} p50 {:.3f}'
+            ' p99 {:.3f} max {:.3f}'.format(
+                report['latency_min'] * 1000,
+                report['latency_avg'] * 1000,
+                report['latency_p50'] * 1000,
+                report['latency_p99'] * 1000,
+                report['latency_max'] * 1000))
+
+
+@cli.group()
+def bench():
+    """
+    Microbenchmarks of proxy hot paths.
+    """
+
+
+@bench.command()
+@click.option('-n', '--rules', 'num_rules', default=500,
+              help='Number of rules to compile')
+@click.option('-m', '--messages', default=100000,
+              help='Number of messages to route')
+def rules(num_rules, messages):
+    """
+    Benchmark rewrite rule routing.
+    """
+    result = bench_rules(num_rules, messages)
+    click.echo(
+        '{rules} rules, {messages} messages, {matched} matched'.format(
+            **result))
+    click.echo(
+        'compiled: {compiled_us:.2f} us/msg ({compiled_rate:.0f} msg/s)'
+        ' linear scan: {linear_us:.2f} us/msg'.format(**result))
+
+
+@bench.command()
+@click.option('-p', '--params', default=16, help='Number of mapped params')
+@click.option('-m', '--messages', default=100000,
+              help='Number of midi messages to handle')
+def midi(params, messages):
+    """
+    Benchmark controller midi input through loopback backend.
+
+    Run with "-l warning" to leave out cost of logging each message.
+    """
+    result = bench_midi(messages, params)
+    click.echo(
+        '{messages} messages, {params} params: {us:.2f} us/msg'
+        ' ({rate:.0f} msg/s)'.format(**result))
+
+
 def parse_config_file():
     config_path = get_config_path()
     logger.info('Reading configuration from {}'.format(config_path))
@@ -208,19 +333,99 @@ def get_config(config_name):
 @click.option('-c', '--config',
               multiple=True, default=["default"],
               help='Configuration name to use')
-def proxy(config):
+@click.option('--reload/--no-reload', default=True,
+              help='Reload configuration and fx maps when files change')
+@click.option('--profile', type=click.Path(dir_okay=False, writable=True),
+              help='Sample proxy threads and write collapsed stacks to file'
+                   ' on exit or SIGUSR1')
+@click.option('--profile-rate', default=100,
+              help='Profiler sampling rate in Hz')
+@click.option('--stats-interval', type=float,
+              help='Log proxy statistics every given number of seconds')
+def proxy(config, reload, profile, profile_rate, stats_interval):
     """
     Start proxy between application and device.
     """
+    profiler = None
+    if profile is not None:
+        profiler = SamplingProfiler(profile, profile_rate)
+        profiler.install_signal_handler()
+        profiler.start()
+    try:
+        result = run_proxies(
+            config, reload, profiler=profiler, stats_interval=stats_interval)
+    finally:
+        if profiler is not None:
+            profiler.stop()
+    sys.exit(result)
 
+
+@cli.command()
+@click.option('-c', '--config', default='default',
+              help='Configuration name to use')
+@click.option('--reload/--no-reload', default=True,
+              help='Reload configuration and fx maps when files change')
+@click.option('--stats-interval', type=float,
+              help='Log proxy statistics every given number of seconds')
+@click.argument('output', type=click.Path(dir_okay=False, writable=True))
+def record(config, reload, stats_interval, output):
+    """
+    Start proxy recording incoming OSC and MIDI traffic to capture file.
+    """
+    capture_writer = CaptureWriter(output)
+    capture_writer.start()
+    try:
+        result = run_proxies(
+            [config], reload, capture_writer, stats_interval=stats_interval)
+    finally:
+        capture_writer.close()
+    sys.exit(result)
+
+
+@cli.command()
+@click.option('-c', '--config', default='default',
+              help='Configuration name to use')
+@click.option('-s', '--speed', default=1.0, type=float,
+              help='Playback speed multiplier, 0 sends as fast as possible')
+@click.option('--midi-port', help='Midi output port to replay midi to')
+@click.argument('capture', type=click.Path(exists=True, dir_okay=False))
+def replay(config, speed, midi_port, capture):
+    """
+    Replay capture file against running proxy.
+    """
+    current_config = get_config(config)
+    cfg_daw_osc = current_config['daw_osc']
+    cfg_ctl_osc = current_config['controller_osc']
+
+    daw_client = create_osc_client(peer_endpoint(cfg_daw_osc))
+    ctl_client = create_osc_client(peer_endpoint(cfg_ctl_osc))
+
+    senders = {
+        SOURCE_DAW_OSC: lambda data: daw_client.send(Packet(data)),
+        SOURCE_CTL_OSC: lambda data: ctl_client.send(Packet(data)),
+    }
+
+    if midi_port is not None:
+        midi_out = mido.open_output(midi_port)
+        senders[SOURCE_CTL_MIDI] = lambda data: midi_out.send(
+            mido.Message.from_bytes(data))
+
+    count, duration = replay_capture(capture, senders, speed)
+    click.echo('Replayed {} packets in {:.3f}s'.format(count, duration))
+
+
+def run_proxies(config_names, reload, capture_writer=None, profiler=None,
+                stats_interval=None):
     app = get_app()
+    if profiler is not None:
+        enable_signal_handling(app)
     windows = []
     osc_proxy_list = []
 
-    for cfg in config:
+    for cfg in config_names:
         current_config = get_config(cfg)
 
-        osc_proxy = OSCProxy(current_config)
+        osc_proxy = OSCProxy(current_config, capture_writer)
         osc_proxy.start()
         osc_proxy_list.append(osc_proxy)
 
@@ -228,12 +433,49 @@ def proxy(config):
             current_config, osc_proxy.send_osc_to_internal_queue)
         windows.append(window)
 
+    if reload:
+        watcher = get_watcher(config_names, osc_proxy_list)
+        watcher.start()
+
+    if stats_interval:
+        start_stats_logger(config_names, osc_proxy_list, stats_interval)
+
     def on_close():
         pass  #message_server_thread.stop()
 
     app.lastWindowClosed.connect(on_close)
 
-    sys.exit(app.exec_())
+    return app.exec_()
+
+
+def start_stats_logger(config_names, osc_proxy_list, interval):
+
+    def log_stats():
+        while True:
+            time.sleep(interval)
+            for config_name, osc_proxy in zip(config_names, osc_proxy_list):
+                logger.info('Stats "%s": %s', config_name, osc_proxy.stats())
+
+    thread = threading.Thread(
+        target=log_stats, name='stats-logger', daemon=True)
+    thread.start()
+
+
+def get_watcher(config_names, osc_proxy_list):
+    config_path = get_config_path()
+
+    def on_change(path):
+        for config_name, osc_proxy in zip(config_names, osc_proxy_list):
+            if path == config_path:
+                osc_proxy.reload_config(get_config(config_name))
+            elif path == osc_proxy.fx_maps_path:
+                osc_proxy.reload_fx_maps()
+
+    watcher = FileWatcher(on_change)
+    watcher.add(config_path)
+    for osc_proxy in osc_proxy_list:
+        watcher.add(osc_proxy.fx_maps_path)
+    return watcher
 
 
 def main():
@@ -0,0 +1,163 @@
+import math
+
+
+CURVE_LINEAR = 'linear'
+CURVE_LOG = 'log'
+CURVE_EXP = 'exp'
+CURVE_SCURVE = 'scurve'
+
+# intervals of dense tables interpolated for float values
+DENSE_TABLE_SIZE = 4096
+
+
+def linear_shape(x, amount):
+    return x
+
+
+def log_shape(x, amount):
+    return math.log1p(amount * x) / math.log1p(amount)
+
+
+def exp_shape(x, amount):
+    return math.expm1(amount * x) / math.expm1(amount)
+
+
+def scurve_shape(x, amount):
+    return 0.5 + 0.5 * math.tanh(amount * (x - 0.5)) / math.tanh(amount / 2)
+
+
+SHAPES = {
+    CURVE_LINEAR: linear_shape,
+    CURVE_LOG: log_shape,
+    CURVE_EXP: exp_shape,
+    CURVE_SCURVE: scurve_shape,
+}
+
+
+def lookup(table, x):
+    """
+    Linearly interpolate table sampled evenly over <0, 1> at x.
+    """
+    last = len(table) - 1
+    pos = x * last
+    if pos <= 0:
+        return table[0]
+    if pos >= last:
+        return table[last]
+    idx = int(pos)
+    low = table[idx]
+    return low + (table[idx + 1] - low) * (pos - idx)
+
+
+def invert_table(table, size):
+    """
+    Sample inverse of monotonic table evenly over <0, 1>.
+
+    Values outside of table range map to nearest end.
+    """
+    last = len(table) - 1
+    increasing = table[last] >= table[0]
+    if not increasing:
+        table = table[::-1]
+
+    low, high = table[0], table[last]
+    inverse = []
+    idx = 0
+    for i in range(size + 1):
+        y = i / size
+        if y <= low:
+            x = 0.0
+        elif y >= high:
+            x = 1.0
+        else:
+            while table[idx + 1] < y:
+                idx += 1
+            y0, y1 = table[idx], table[idx + 1]
+            frac = (y - y0) / (y1 - y0) if y1 > y0 else 0.0
+            x = (idx + frac) / last
+        inverse.append(x if increasing else 1.0 - x)
+    return inverse
+
+
+class Curve(object):
+    """
+    Response curve between controller position and DAW param value.
+
+    Controller position and DAW value are both normalized to <0, 1>,
+    shape is applied first, then output is scaled into <min, max> and
+    optionally inverted. All conversions are table lookups.
+    """
+
+    def __init__(self, shape=CURVE_LINEAR, min_value=0.0, max_value=1.0,
+                 invert=False, amount=4.0):
+        try:
+            shape_func = SHAPES[shape]
+        except KeyError:
+            raise ValueError('Unknown curve shape: {}'.format(shape))
+
+        self.shape = shape
+        self.min_value = min_value
+        self.max_value = max_value
+        self.invert = invert
+        self.amount = amount
+
+        def value(x):
+            if invert:
+                x = 1.0 - x
+            return min_value + (max_value - min_value) * shape_func(x, amount)
+
+        self.value = value
+        self.to_daw_table = [
+            value(i / DENSE_TABLE_SIZE) for i in range(DENSE_TABLE_SIZE + 1)]
+        self.to_ctl_table = invert_table(self.to_daw_table, DENSE_TABLE_SIZE)
+        # DAW value for every 7-bit controller value
+        self.midi_to_daw = [value(i / 127) for i in range(128)]
+
+    @classmethod
+    def from_config(cls, cfg):
+        if isinstance(cfg, str):
+            cfg = {'shape': cfg}
+        return cls(
+            shape=cfg.get('shape', CURVE_LINEAR),
+            min_value=float(cfg.get('min', 0.0)),
+            max_value=float(cfg.get('max', 1.0)),
+            invert=bool(cfg.get('invert', False)),
+            amount=float(cfg.get('amount', 4.0)))
+
+    def to_config(self):
+        cfg = {'shape': self.shape}
+        if self.min_value != 0.0:
+            cfg['min'] = self.min_value
+        if self.max_value != 1.0:
+            cfg['max'] = self.max_value
+        if self.invert:
+            cfg['invert'] = True
+        if self.amount != 4.0:
+            cfg['amount'] = self.amount
+        return cfg
+
+    def __eq__(self, other):
+        return (isinstance(other, Curve) and
+                self.to_config() == other.to_config())
+
+    def __ne__(self, other):
+        return not self == other
+
+    def to_daw(self, x):
+        return lookup(self.to_daw_table, x)
+
+    def to_ctl(self, value):
+        return lookup(self.to_ctl_table, value)
+
+    def to_midi(self, value):
+        return int(round(lookup(self.to_ctl_table, value) * 127))
+
+
+def load_curves(cfg):
+    """
+    Build curves keyed by source param from fx map file section.
+    """
+    return {
+        int(source_param): Curve.from_config(curve_cfg)
+        for source_param, curve_cfg in (cfg or {}).items()
+    }
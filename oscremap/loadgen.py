@@ -0,0 +1,260 @@
+import logging
+import socket
+import threading
+import time
+from collections import defaultdict, deque
+
+from pythonosc import osc_server
+from pythonosc.dispatcher import Dispatcher
+
+from .transport import (
+    BatchOSCUDPServer, create_osc_client, peer_endpoint, unix_path)
+
+
+logger = logging.getLogger(__name__)
+
+
+LOADGEN_FX_NAMES = ['oscremap-loadgen-1', 'oscremap-loadgen-2']
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    idx = min(len(values) - 1, int(len(values) * fraction))
+    return values[idx]
+
+
+class DeliveryMeter(object):
+    """
+    Match delivered values against sent ones to measure loss and latency.
+
+    Sent values are queued per key, each received value consumes the
+    oldest matching send time.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pending = defaultdict(deque)
+        self.sent_count = 0
+        self.received_count = 0
+        self.unmatched_count = 0
+        self.latencies = []
+        self.first_recv_time = None
+        self.last_recv_time = None
+
+    def sent(self, key):
+        with self.lock:
+            self.pending[key].append(time.monotonic())
+            self.sent_count += 1
+
+    def received(self, key):
+        now = time.monotonic()
+        with self.lock:
+            if self.first_recv_time is None:
+                self.first_recv_time = now
+            self.last_recv_time = now
+            send_times = self.pending.get(key)
+            if not send_times:
+                self.unmatched_count += 1
+                return
+            self.latencies.append(now - send_times.popleft())
+            self.received_count += 1
+
+    def report(self):
+        with self.lock:
+            latencies = sorted(self.latencies)
+            lost = self.sent_count - self.received_count
+            if self.first_recv_time is not None:
+                duration = self.last_recv_time - self.first_recv_time
+            else:
+                duration = 0.0
+            return {
+                'sent': self.sent_count,
+                'received': self.received_count,
+                'unmatched': self.unmatched_count,
+                'lost': lost,
+                'loss_pct': (100.0 * lost / self.sent_count
+                             if self.sent_count else 0.0),
+                'rate': (self.received_count / duration
+                         if duration > 0 else 0.0),
+                'latency_min': latencies[0] if latencies else 0.0,
+                'latency_avg': (sum(latencies) / len(latencies)
+                                if latencies else 0.0),
+                'latency_p50': percentile(latencies, 0.5),
+                'latency_p99': percentile(latencies, 0.99),
+                'latency_max': latencies[-1] if latencies else 0.0,
+            }
+
+
+class LoadGenerator(object):
+    """
+    Drive running proxy acting as both DAW and controller.
+
+    Listens on remote ports of the proxy so DAW and controller must not
+    be running at the same time.
+    """
+
+    def __init__(self, cfg):
+        self.cfg_global = cfg['global']
+        self.cfg_daw_osc = cfg_daw_osc = cfg['daw_osc']
+        self.cfg_ctl_osc = cfg_ctl_osc = cfg['controller_osc']
+        self.cfg_ctl_midi = cfg['controller_midi']
+
+        self.daw_client = create_osc_client(peer_endpoint(cfg_daw_osc))
+        self.ctl_client = create_osc_client(peer_endpoint(cfg_ctl_osc))
+
+        self.learned_params = 0
+
+        self.daw_meter = DeliveryMeter()
+        self.ctl_meter = DeliveryMeter()
+
+        self.servers = [
+            self.create_server(
+                cfg_daw_osc['remote_ip'], cfg_daw_osc.get('remote_port'),
+                self.daw_meter),
+            self.create_server(
+                cfg_ctl_osc['remote_ip'], cfg_ctl_osc.get('remote_port'),
+                self.ctl_meter),
+        ]
+
+    def create_server(self, ip, port, meter):
+        dispatcher = Dispatcher()
+
+        def handle(addr, *args):
+            if addr.endswith('/val') and args:
+                param_num = int(addr.split('/')[-2])
+                meter.received(self.value_key(param_num, args[0]))
+
+        dispatcher.set_default_handler(handle)
+        path = unix_path(ip)
+        if path is not None:
+            logger.info('Listening for proxy output on {}'.format(ip))
+            return BatchOSCUDPServer(path, dispatcher, family=socket.AF_UNIX)
+        logger.info('Listening for proxy output on {}:{}'.format(ip, port))
+        return osc_server.ThreadingOSCUDPServer((ip, port), dispatcher)
+
+    def value_key(self, param_num, value):
+        """
+        Key of param value, with learned identity mapping param number is
+        the same on both sides of the proxy.
+        """
+        return param_num, round(float(value), 4)
+
+    def start(self):
+        for server in self.servers:
+            thread = threading.Thread(
+                target=server.serve_forever, name='loadgen-recv', daemon=True)
+            thread.start()
+
+    def stop(self, drain_time=1.0):
+        time.sleep(drain_time)
+        for server in self.servers:
+            server.shutdown()
+            server.server_close()
+
+    def learn(self, fx_name, num_params, step=0.002):
+        """
+        Map controller params 1..N to DAW params 1..N using learn.
+        """
+        logger.info('Learning %d params for fx %s', num_params, fx_name)
+        self.daw_client.send_message('/fx/name', fx_name)
+        time.sleep(0.05)
+        self.ctl_client.send_message('/fx/learn', 1)
+        time.sleep(0.05)
+        for param_num in range(1, num_params + 1):
+            self.ctl_client.send_message(
+                f'/fx/param/{param_num}/val', 0.0)
+            time.sleep(step)
+            self.daw_client.send_message(
+                f'/fx/param/{param_num}/val', 0.0)
+            time.sleep(step)
+        self.ctl_client.send_message('/fx/learn', 1)
+        time.sleep(0.05)
+        self.learned_params = num_params
+
+    def select_fx(self, fx_name):
+        self.daw_client.send_message('/fx/name', fx_name)
+        time.sleep(0.05)
+
+    def run_ticks(self, rate, duration, tick):
+        interval = 1.0 / rate
+        start_time = time.monotonic()
+        next_time = start_time
+        tick_num = 0
+        while time.monotonic() - start_time < duration:
+            tick(tick_num)
+            tick_num += 1
+            next_time += interval
+            delay = next_time - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+        return tick_num
+
+    def sweep(self, num_params, rate, duration, direction='daw'):
+        """
+        Send value of each of N params at given rate.
+
+        With direction "daw" values are sent as DAW feedback and measured
+        on the controller side, with "ctl" the other way around.
+        """
+        if direction == 'daw':
+            client, meter = self.daw_client, self.ctl_meter
+        else:
+            client, meter = self.ctl_client, self.daw_meter
+
+        def tick(tick_num):
+            for param_num in range(1, num_params + 1):
+                seq = tick_num * num_params + param_num
+                value = (seq % 10000) / 10000.0
+                if param_num <= self.learned_params:
+                    meter.sent(self.value_key(param_num, value))
+                client.send_message(f'/fx/param/{param_num}/val', value)
+
+        return self.run_ticks(rate, duration, tick)
+
+    def fx_switch(self, num_params, rate, duration, fx_names):
+        """
+        Switch between FX at given rate dumping all params on each switch.
+        """
+        def tick(tick_num):
+            self.daw_client.send_message(
+                '/fx/name', fx_names[tick_num % len(fx_names)])
+            for param_num in range(1, num_params + 1):
+                prefix = f'/fx/param/{param_num}'
+                value = ((tick_num * num_params + param_num) % 10000) / 10000.0
+                self.daw_client.send_message(
+                    f'{prefix}/name', f'Param {param_num}')
+                if param_num <= self.learned_params:
+                    self.ctl_meter.sent(self.value_key(param_num, value))
+                self.daw_client.send_message(f'{prefix}/val', value)
+                self.daw_client.send_message(
+                    f'{prefix}/str', '{:.4f}'.format(value))
+
+        return self.run_ticks(rate, duration, tick)
+
+    def midi_flood(self, midi_out, num_params, rate, duration):
+        """
+        Send CC for each of N params through midi port at given rate.
+        """
+        import mido
+
+        channel = self.cfg_ctl_midi['param_channel']
+        cc_start = self.cfg_ctl_midi['cc_param_start']
+
+        def tick(tick_num):
+            for param_num in range(num_params):
+                value = (tick_num + param_num) % 128
+                if param_num < self.learned_params:
+                    self.daw_meter.sent(
+                        self.value_key(param_num + 1, value / 127.0))
+                midi_out.send(mido.Message(
+                    'control_change', channel=channel,
+                    control=cc_start + param_num, value=value))
+
+        return self.run_ticks(rate, duration, tick)
+
+    def reports(self):
+        return {
+            'daw': self.daw_meter.report(),
+            'controller': self.ctl_meter.report(),
+        }
@@ -0,0 +1,89 @@
+from .curves import Curve
+
+
+class Macro(object):
+    """
+    Mapping of one source param to several target params.
+
+    Each target has optional curve giving its own range and response.
+    Primary target, first one unless other is marked "primary", provides
+    value fed back to controller.
+    """
+
+    def __init__(self, targets, primary=0):
+        self.targets = tuple(targets)
+        self.primary = primary
+        self.primary_target, self.primary_curve = self.targets[primary]
+
+    @classmethod
+    def from_config(cls, cfg):
+        targets = []
+        primary = 0
+        for idx, target_cfg in enumerate(cfg):
+            if not isinstance(target_cfg, dict):
+                target_cfg = {'target': target_cfg}
+            curve_cfg = target_cfg.get('curve')
+            targets.append((
+                int(target_cfg['target']),
+                Curve.from_config(curve_cfg) if curve_cfg else None))
+            if target_cfg.get('primary'):
+                primary = idx
+        if not targets:
+            raise ValueError('Macro needs at least one target')
+        return cls(targets, primary)
+
+    def to_config(self):
+        cfg = []
+        for idx, (target_param, curve) in enumerate(self.targets):
+            target_cfg = {'target': target_param}
+            if curve is not None:
+                target_cfg['curve'] = curve.to_config()
+            if idx == self.primary and idx != 0:
+                target_cfg['primary'] = True
+            cfg.append(target_cfg)
+        return cfg
+
+    def __eq__(self, other):
+        return (isinstance(other, Macro) and
+                self.to_config() == other.to_config())
+
+    def __ne__(self, other):
+        return not self == other
+
+    def values(self, position):
+        """
+        Return (target param, value) for each target at controller position.
+        """
+        return [
+            (target_param,
+             position if curve is None else curve.to_daw(position))
+            for target_param, curve in self.targets
+        ]
+
+    def midi_values(self, value):
+        position = value / 127.0
+        return [
+            (target_param,
+             position if curve is None else curve.midi_to_daw[value])
+            for target_param, curve in self.targets
+        ]
+
+
+def load_macros(cfg):
+    """
+    Build macros keyed by source param from fx map file section.
+    """
+    return {
+        int(source_param): Macro.from_config(macro_cfg)
+        for source_param, macro_cfg in (cfg or {}).items()
+    }
+
+
+def primary_targets(macros):
+    """
+    Return source param of each macro keyed by its primary target.
+    """
+    return {
+        macro.primary_target: source_param
+        for source_param, macro in macros.items()
+    }
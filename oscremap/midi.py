@@ -0,0 +1,146 @@
+import logging
+import time
+from collections import deque
+
+
+logger = logging.getLogger(__name__)
+
+
+CONTROL_CHANGE = 0xB0
+
+BACKEND_RTMIDI = 'rtmidi'
+BACKEND_MIDO = 'mido'
+BACKEND_LOOPBACK = 'loopback'
+
+LOOPBACK_PORT = 'loopback'
+
+
+class MidoIn(object):
+    """
+    Midi input on top of mido with interface of rtmidi.MidiIn.
+    """
+
+    def __init__(self, mido):
+        self.mido = mido
+        self.port = None
+        self.callback = None
+        self.last_time = None
+
+    def get_ports(self):
+        return self.mido.get_input_names()
+
+    def open_port(self, port):
+        self.port = self.mido.open_input(
+            self.get_ports()[port], callback=self.receive)
+
+    def close_port(self):
+        if self.port is not None:
+            self.port.close()
+            self.port = None
+
+    def set_callback(self, callback):
+        self.callback = callback
+
+    def receive(self, message):
+        now = time.monotonic()
+        deltatime = 0.0 if self.last_time is None else now - self.last_time
+        self.last_time = now
+        if self.callback is not None:
+            self.callback((message.bytes(), deltatime))
+
+
+class MidoOut(object):
+    """
+    Midi output on top of mido with interface of rtmidi.MidiOut.
+    """
+
+    def __init__(self, mido):
+        self.mido = mido
+        self.port = None
+
+    def get_ports(self):
+        return self.mido.get_output_names()
+
+    def open_port(self, port):
+        self.port = self.mido.open_output(self.get_ports()[port])
+
+    def close_port(self):
+        if self.port is not None:
+            self.port.close()
+            self.port = None
+
+    def send_message(self, msg):
+        if self.port is not None:
+            self.port.send(self.mido.Message.from_bytes(msg))
+
+
+class LoopbackMidiIn(object):
+    """
+    In-memory midi input, messages are injected by caller.
+
+    Injected messages are passed to callback synchronously on calling
+    thread, so handling is deterministic and not limited by device rate.
+    """
+
+    def __init__(self):
+        self.callback = None
+        self.received = 0
+
+    def get_ports(self):
+        return [LOOPBACK_PORT]
+
+    def open_port(self, port):
+        pass
+
+    def close_port(self):
+        pass
+
+    def set_callback(self, callback):
+        self.callback = callback
+
+    def inject(self, msg, deltatime=0.0):
+        self.received += 1
+        if self.callback is not None:
+            self.callback((msg, deltatime))
+
+
+class LoopbackMidiOut(object):
+    """
+    In-memory midi output keeping last sent messages.
+    """
+
+    def __init__(self, keep=1024):
+        self.messages = deque(maxlen=keep)
+        self.sent = 0
+
+    def get_ports(self):
+        return [LOOPBACK_PORT]
+
+    def open_port(self, port):
+        pass
+
+    def close_port(self):
+        pass
+
+    def send_message(self, msg):
+        self.sent += 1
+        self.messages.append(msg)
+
+
+def create_midi_ports(backend=BACKEND_RTMIDI):
+    """
+    Return midi input and output of backend.
+
+    Backends are imported only when selected, so loopback works without
+    midi libraries and devices.
+    """
+    logger.info('Using %s midi backend', backend)
+    if backend == BACKEND_RTMIDI:
+        import rtmidi
+        return rtmidi.MidiIn(), rtmidi.MidiOut()
+    elif backend == BACKEND_MIDO:
+        import mido
+        return MidoIn(mido), MidoOut(mido)
+    elif backend == BACKEND_LOOPBACK:
+        return LoopbackMidiIn(), LoopbackMidiOut()
+    raise ValueError('Unknown midi backend: {}'.format(backend))
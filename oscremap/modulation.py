@@ -0,0 +1,222 @@
+import logging
+import threading
+import time
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+logger = logging.getLogger(__name__)
+
+
+KIND_LFO = 'lfo'
+KIND_ENVELOPE = 'envelope'
+
+SHAPES = ('sine', 'triangle', 'saw', 'square')
+
+
+class ModulationEngine(object):
+    """
+    Modulate DAW params with LFOs and envelopes on single scheduler.
+
+    Generators are named presets from configuration, each assignment
+    binds one of them to target param around its value at assignment
+    time. All assignments are evaluated together as arrays on each tick
+    and only params that moved more than threshold are passed to emit as
+    list of (target param, value).
+    """
+
+    def __init__(self, emit, generators, rate=100, threshold=1 / 1024.0):
+        if np is None:
+            raise RuntimeError('Modulation requires numpy to be installed')
+
+        for name, generator in generators.items():
+            kind = generator.get('type', KIND_LFO)
+            if kind not in (KIND_LFO, KIND_ENVELOPE):
+                raise ValueError('Unknown modulator type: {}'.format(kind))
+            if generator.get('shape', 'sine') not in SHAPES:
+                raise ValueError('Unknown LFO shape: {}'.format(
+                    generator['shape']))
+
+        self.emit = emit
+        self.generators = generators
+        self.interval = 1.0 / rate
+        self.threshold = threshold
+
+        self.lock = threading.Lock()
+        self.assignments = {}
+        self.arrays = None
+        self.emitted = None
+
+        self.ticks = 0
+        self.tick_time_max = 0.0
+
+        self.wake_event = threading.Event()
+        self.running = False
+        self.thread = threading.Thread(
+            target=self.run, name='modulator', daemon=True)
+
+    @classmethod
+    def from_config(cls, emit, cfg):
+        return cls(
+            emit,
+            cfg.get('generators', {}),
+            rate=cfg.get('rate', 100),
+            threshold=cfg.get('threshold', 1 / 1024.0))
+
+    def start(self):
+        logger.info('Running %d modulation generators at %d Hz',
+                    len(self.generators), 1.0 / self.interval)
+        self.running = True
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        self.wake_event.set()
+
+    def assign(self, name, target_param, center):
+        if name not in self.generators:
+            logger.info('Unknown modulation generator: %s', name)
+            return
+        logger.info('Modulating param %d with %s', target_param, name)
+        with self.lock:
+            self.assignments[target_param] = (name, center, time.monotonic())
+            self.rebuild()
+
+    def unassign(self, target_param):
+        with self.lock:
+            if self.assignments.pop(target_param, None) is not None:
+                self.rebuild()
+
+    def is_assigned(self, target_param):
+        return target_param in self.assignments
+
+    def clear(self):
+        with self.lock:
+            self.assignments.clear()
+            self.rebuild()
+
+    def trigger(self, name):
+        """
+        Restart generator from its start for all its assignments.
+        """
+        now = time.monotonic()
+        with self.lock:
+            for target_param, (assigned, center, _) in list(
+                    self.assignments.items()):
+                if assigned == name:
+                    self.assignments[target_param] = (assigned, center, now)
+            self.rebuild()
+
+    def rebuild(self):
+        """
+        Pack assignments into arrays evaluated on each tick.
+        """
+        if not self.assignments:
+            self.arrays = None
+            self.emitted = None
+            return
+
+        rows = []
+        for target_param, (name, center, start) in sorted(
+                self.assignments.items()):
+            generator = self.generators[name]
+            rows.append((
+                target_param,
+                generator.get('type', KIND_LFO) == KIND_ENVELOPE,
+                SHAPES.index(generator.get('shape', 'sine')),
+                generator.get('freq', 1.0),
+                generator.get('phase', 0.0),
+                generator.get('depth', 0.25),
+                generator.get('center', center),
+                max(generator.get('attack', 0.01), 1e-6),
+                max(generator.get('release', 0.5), 1e-6),
+                start,
+            ))
+
+        columns = list(zip(*rows))
+        self.arrays = {
+            'targets': np.array(columns[0], dtype=np.int64),
+            'envelope': np.array(columns[1], dtype=bool),
+            'shape': np.array(columns[2], dtype=np.int64),
+            'freq': np.array(columns[3], dtype=float),
+            'phase': np.array(columns[4], dtype=float),
+            'depth': np.array(columns[5], dtype=float),
+            'center': np.array(columns[6], dtype=float),
+            'attack': np.array(columns[7], dtype=float),
+            'release': np.array(columns[8], dtype=float),
+            'start': np.array(columns[9], dtype=float),
+        }
+        self.emitted = np.full(len(rows), np.nan)
+        self.wake_event.set()
+
+    def evaluate(self, arrays, now):
+        elapsed = now - arrays['start']
+
+        phase = np.mod(arrays['phase'] + arrays['freq'] * elapsed, 1.0)
+        shape = arrays['shape']
+        lfo = np.select(
+            [shape == 0, shape == 1, shape == 2],
+            [np.sin(2 * np.pi * phase),
+             1.0 - 4.0 * np.abs(phase - 0.5),
+             2.0 * phase - 1.0],
+            np.where(phase < 0.5, 1.0, -1.0))
+
+        attack = arrays['attack']
+        envelope = np.where(
+            elapsed < attack,
+            elapsed / attack,
+            np.clip(1.0 - (elapsed - attack) / arrays['release'], 0.0, 1.0))
+
+        wave = np.where(arrays['envelope'], envelope, lfo)
+        return np.clip(arrays['center'] + arrays['depth'] * wave, 0.0, 1.0)
+
+    def run(self):
+        while self.running:
+            self.wake_event.wait()
+            next_time = time.monotonic()
+            while self.running and self.tick():
+                next_time += self.interval
+                delay = next_time - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                else:
+                    next_time = time.monotonic()
+
+    def tick(self):
+        """
+        Evaluate all assignments once, return whether any are active.
+        """
+        start_time = time.monotonic()
+        with self.lock:
+            arrays = self.arrays
+            if arrays is None:
+                self.wake_event.clear()
+                return False
+
+            values = self.evaluate(arrays, start_time)
+            emitted = self.emitted
+            with np.errstate(invalid='ignore'):
+                changed = ~(np.abs(values - emitted) <= self.threshold)
+            indices = np.flatnonzero(changed)
+            emitted[indices] = values[indices]
+            updates = list(zip(
+                arrays['targets'][indices].tolist(),
+                values[indices].tolist()))
+
+        if updates:
+            self.emit(updates)
+
+        self.ticks += 1
+        self.tick_time_max = max(
+            self.tick_time_max, time.monotonic() - start_time)
+        return True
+
+    def stats(self):
+        return {
+            'assignments': len(self.assignments),
+            'ticks': self.ticks,
+            'tick_time_max_ms': self.tick_time_max * 1000,
+        }
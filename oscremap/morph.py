@@ -0,0 +1,92 @@
+import logging
+import threading
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+logger = logging.getLogger(__name__)
+
+
+SNAPSHOT_A = 'a'
+SNAPSHOT_B = 'b'
+
+SNAPSHOT_SLOTS = (SNAPSHOT_A, SNAPSHOT_B)
+
+
+class MorphEngine(object):
+    """
+    Store snapshots of FX param values and morph between two of them.
+
+    Snapshots are float arrays indexed by target param - 1, with NaN for
+    params whose value was not known at capture time. Each morph frame
+    passes to emit list of (target param, value) only for params that
+    moved more than threshold since they were last emitted.
+    """
+
+    def __init__(self, emit, num_params=512, threshold=1 / 1024.0):
+        if np is None:
+            raise RuntimeError('Morphing requires numpy to be installed')
+
+        self.emit = emit
+        self.num_params = num_params
+        self.threshold = threshold
+        self.lock = threading.Lock()
+        self.snapshots = {}
+        self.emitted = {}
+
+    @classmethod
+    def from_config(cls, emit, cfg):
+        return cls(
+            emit,
+            num_params=cfg.get('params', 512),
+            threshold=cfg.get('threshold', 1 / 1024.0))
+
+    def capture(self, fx_name, slot, param_state):
+        """
+        Store current values of FX params in snapshot slot.
+        """
+        values = np.full(self.num_params, np.nan)
+        for target_param, state in list(param_state.items()):
+            if 'val' in state and 1 <= target_param <= self.num_params:
+                values[target_param - 1] = state['val']
+
+        with self.lock:
+            self.snapshots.setdefault(fx_name, {})[slot] = values
+            self.emitted.pop(fx_name, None)
+
+        logger.info('Captured snapshot %s of %d params for fx: %s',
+                    slot, np.count_nonzero(~np.isnan(values)), fx_name)
+
+    def morph(self, fx_name, position):
+        """
+        Emit params of frame at position between snapshot A (0) and B (1).
+        """
+        with self.lock:
+            snapshots = self.snapshots.get(fx_name, {})
+            try:
+                values_a = snapshots[SNAPSHOT_A]
+                values_b = snapshots[SNAPSHOT_B]
+            except KeyError:
+                return
+
+            try:
+                emitted = self.emitted[fx_name]
+            except KeyError:
+                emitted = self.emitted[fx_name] = np.full(
+                    self.num_params, np.nan)
+
+            frame = values_a + (values_b - values_a) * position
+            with np.errstate(invalid='ignore'):
+                changed = ~np.isnan(frame) & ~(
+                    np.abs(frame - emitted) <= self.threshold)
+            indices = np.flatnonzero(changed)
+            if not len(indices):
+                return
+            emitted[indices] = frame[indices]
+            updates = list(zip(
+                (indices + 1).tolist(), frame[indices].tolist()))
+
+        self.emit(updates)
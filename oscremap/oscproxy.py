@@ -2,79 +2,131 @@ import logging
 import time
 import threading
 import os
-from queue import Queue, Empty
+from collections import deque
+from functools import partial
+from queue import Empty
 
-import rtmidi
-from rtmidi.midiconstants import CONTROL_CHANGE
 import yaml
 
-from bidict import bidict
+from bidict import bidict, frozenbidict
 
-from pythonosc import osc_server, udp_client
 from pythonosc.dispatcher import Dispatcher
-from pythonosc.osc_message_builder import OscMessageBuilder
-from pythonosc.osc_bundle_builder import OscBundleBuilder, IMMEDIATELY
+from pythonosc.osc_bundle_builder import IMMEDIATELY
+
+from .capture import SOURCE_CTL_MIDI, SOURCE_CTL_OSC, SOURCE_DAW_OSC
+from .curves import load_curves
+from .macros import load_macros
+from .midi import CONTROL_CHANGE, create_midi_ports
+from .modulation import ModulationEngine
+from .morph import SNAPSHOT_A, SNAPSHOT_B, MorphEngine
+from .pacing import ACK_ADDRESS, SEQ_ADDRESS, create_pacer
+from .queues import (
+    BUNDLE_ADDRESS, OverloadQueue, classify_midi, classify_osc,
+    is_param_item, midi_key, osc_key)
+from .realtime import ThreadTuner
+from .routing import EMPTY_ROUTING
+from .rules import SIDE_CONTROLLER, SIDE_DAW, RuleSet
+from .schedule import FlushClock
+from .sender import CoalescingSender, build_bundles, build_message
+from .smoothing import ParamSmoother
+from .sysex import FIELD_NAME, FIELD_STR, SysExDisplay
+from .takeover import (
+    TAKEOVER_OFF, SoftTakeover, check_mode as check_takeover_mode,
+    load_takeover)
+from .transport import (
+    STREAM_BUNDLE_SIZE, TRANSPORT_UDP, SLIPTCPServer,
+    create_bulk_osc_client, create_osc_client, create_osc_server,
+    describe_endpoint, is_bulk_address, max_bundle_size)
 
 
 logger = logging.getLogger(__name__)
 
 
+def config_changed(old_cfg, new_cfg, *keys):
+    return any(old_cfg.get(key) != new_cfg.get(key) for key in keys)
+
+
+# origin of values sent to DAW by proxy itself rather than by controller
+ORIGIN_PROXY = 'proxy'
+
 
 class OSCProxy(object):
 
-    def __init__(self, cfg):
-        self.fx_name = ''
+    def __init__(self, cfg, capture_writer=None):
+        self.capture_writer = capture_writer
+        self.thread_tuner = ThreadTuner(cfg.get('threads'))
         self.learn_active = False
         self.fx_follow = True
         self.fx_visible = False
         self.fx_maps_path = cfg['fx_maps_path']
 
-        self.cfg_global = cfg_global = cfg['global']
+        self.cfg_global = cfg['global']
 
         self.cfg_ctl_midi = cfg_ctl_midi = cfg['controller_midi']
-        self.cfg_ctl_osc = cfg_ctl_osc = cfg['controller_osc']
-        self.cfg_daw_osc = cfg_daw_osc = cfg['daw_osc']
-
-        midi_cc_param_map = {
-            (cfg_ctl_midi['cc_param_start'] + i): (i + 1)
-            for i in range(cfg_global['params'])
-        }
-
-        self.num_params = cfg_global['params']
-
-        self.cc_param_start = self.cfg_ctl_midi['cc_param_start']
-        self.cc_param_end = self.cc_param_start + self.num_params
+        self.cfg_ctl_osc = cfg['controller_osc']
+        self.cfg_daw_osc = cfg['daw_osc']
 
-        self.midi_cc_param_map = bidict(midi_cc_param_map)
+        self.build_midi_cc_param_map()
 
-        self.fx_maps = self.load_fx_maps()
+        # writers hold lock while replacing routing snapshot or fx maps,
+        # readers use self.routing reference without locking
+        self.routing_lock = threading.RLock()
+        self.routing = EMPTY_ROUTING
+        (self.fx_maps, self.fx_curves, self.fx_macros,
+         self.fx_takeover) = self.load_fx_maps()
+        self.takeover = SoftTakeover(
+            cfg_ctl_midi.get('takeover', TAKEOVER_OFF))
 
-        self.source_target_map = bidict()
+        self.fx_param_state = {}
+        self.param_state = {}
+        self.page = 0
+        self.page_paints = {}
 
         self.learn_active = False
-        self.learn_source = None
-        self.learn_target = None
         self.bypass_fx = False
 
-        logger.info('Initializing controller osc client to {}:{}'.format(
-            cfg_ctl_osc['remote_ip'], cfg_ctl_osc['remote_port']
-        ))
-
-        self.ctl_osc_client = udp_client.SimpleUDPClient(
-            cfg_ctl_osc['remote_ip'], cfg_ctl_osc['remote_port'])
+        self.ctl_osc_client = self.create_ctl_osc_client()
+        self.ctl_bulk_osc_client = self.create_ctl_bulk_osc_client()
+        self.to_daw_client = self.create_daw_osc_client()
+        self.daw_sender = CoalescingSender(self.to_daw_client)
+
+        self.echo_window = self.cfg_daw_osc.get('echo_window', 0.1)
+        self.echo_tolerance = self.cfg_daw_osc.get('echo_tolerance', 0.001)
+        self.sent_param_values = {}
+        self.smoothed_origins = {}
+        self.echo_suppressed = 0
+
+        cfg_smoothing = cfg.get('smoothing')
+        if cfg_smoothing:
+            self.smoother = ParamSmoother.from_config(
+                self.send_smoothed_params_to_daw, cfg_smoothing)
+        else:
+            self.smoother = None
 
-        logger.info('Initializing daw osc client to {}:{}'.format(
-            cfg_daw_osc['remote_ip'], cfg_daw_osc['remote_port']
-        ))
+        cfg_morph = cfg.get('morph')
+        if cfg_morph:
+            self.morph_engine = MorphEngine.from_config(
+                self.send_params_to_daw, cfg_morph)
+        else:
+            self.morph_engine = None
 
-        self.to_daw_client = udp_client.SimpleUDPClient(
-            cfg_daw_osc['remote_ip'], cfg_daw_osc['remote_port'])
+        cfg_modulation = cfg.get('modulation')
+        if cfg_modulation:
+            self.modulation_engine = ModulationEngine.from_config(
+                self.send_params_to_daw, cfg_modulation)
+        else:
+            self.modulation_engine = None
+        # generator waiting for learn target and assignments of each fx
+        # as {target param: (generator, center)}
+        self.learn_modulator = None
+        self.learn_modulator_toggled = False
+        self.fx_modulations = {}
 
-        self.midi_in = rtmidi.MidiIn()
-        self.midi_out = rtmidi.MidiOut()
+        self.cfg_rules = cfg.get('rules')
+        self.rules = RuleSet.from_config(self.cfg_rules)
 
-        in_ports = self.midi_in.get_ports()
-        out_ports = self.midi_out.get_ports()
+        self.midi_in, self.midi_out = create_midi_ports(
+            cfg_ctl_midi.get('backend', 'rtmidi'))
 
         logger.info(
             'Initializing midi'
@@ -86,22 +138,24 @@ class OSCProxy(object):
             cfg_ctl_midi['output_port']
         ))
 
-        logger.info('Available input ports: %s', in_ports)
-        try:
-            self.midi_in_port = in_ports.index(cfg_ctl_midi['input_port'])
-        except ValueError:
-            self.midi_in_port = None
+        self.midi_in_port = self.find_midi_port(
+            self.midi_in, cfg_ctl_midi['input_port'], 'input')
 
         self.midi_channel_param = cfg_ctl_midi['param_channel']
         self.midi_channel_cmd = cfg_ctl_midi['cmd_channel']
 
-        logger.info('Available output ports: %s', out_ports)
-        try:
-            self.midi_out_port = out_ports.index(cfg_ctl_midi['output_port'])
-        except ValueError:
-            self.midi_out_port = None
+        self.midi_out_port = self.find_midi_port(
+            self.midi_out, cfg_ctl_midi['output_port'], 'output')
 
-        self.midi_in.set_callback(self.handle_midi_from_ctl)
+        self.midi_in_thread_named = False
+        self.midi_in_queue = deque()
+        self.midi_in_event = threading.Event()
+        self.midi_in_received = 0
+        self.midi_in_coalesced = 0
+        self.midi_in_thread = threading.Thread(
+            target=self.consume_midi_from_ctl_queue, name='ctl-midi-batch',
+            daemon=True)
+        self.set_midi_input_mode()
 
         self.daw_osc_dispatcher = Dispatcher()
         self.daw_osc_dispatcher.map('/*', self.handle_osc_from_daw)
@@ -109,56 +163,168 @@ class OSCProxy(object):
         self.ctl_osc_dispatcher = Dispatcher()
         self.ctl_osc_dispatcher.map('/*', self.handle_osc_from_ctl)
 
-        logger.info('Initializing daw osc server on {}:{}'.format(
-            cfg_daw_osc['listen_ip'], cfg_daw_osc['listen_port']
-        ))
+        self.daw_osc_server, self.daw_osc_thread = \
+            self.create_daw_osc_server()
+        self.ctl_osc_server, self.ctl_osc_thread = \
+            self.create_ctl_osc_server()
 
-        self.daw_osc_server = osc_server.BlockingOSCUDPServer(
-            (cfg_daw_osc['listen_ip'], cfg_daw_osc['listen_port']),
-            self.daw_osc_dispatcher)
-        self.daw_osc_thread = threading.Thread(
-            target=self.daw_osc_server.serve_forever)
+        cfg_queues = cfg.get('queues')
+        self.send_osc_to_internal_queue = OverloadQueue.from_config(
+            classify_osc, osc_key, cfg_queues)
+        self.send_osc_to_ctl_queue = OverloadQueue.from_config(
+            classify_osc, osc_key, cfg_queues)
+        self.send_osc_to_ctl_thread = threading.Thread(
+            target=self.consume_ctl_osc_queue, name='ctl-osc-sender')
+        self.ctl_pacer = create_pacer(
+            self.cfg_ctl_osc, max_bundle_size(self.cfg_ctl_osc))
+        self.ctl_flush_clock = FlushClock(
+            self.ctl_pacer.interval, self.cfg_ctl_osc.get('schedule_latency'))
+
+        self.send_midi_to_ctl_queue = OverloadQueue.from_config(
+            classify_midi, midi_key, cfg_queues)
+        self.sysex_display = self.create_sysex_display()
+        self.send_midi_to_ctl_thread = threading.Thread(
+            target=self.consume_send_midi_to_ctl_queue,
+            name='ctl-midi-sender')
 
-        logger.info('Initializing controller osc server on {}:{}'.format(
-            cfg_ctl_osc['listen_ip'], cfg_ctl_osc['listen_port']
-        ))
+    def build_midi_cc_param_map(self):
+        self.num_params = self.cfg_global['params']
 
-        self.ctl_osc_server = osc_server.BlockingOSCUDPServer(
-            (cfg_ctl_osc['listen_ip'], cfg_ctl_osc['listen_port']),
-            self.ctl_osc_dispatcher)
+        self.cc_param_start = self.cfg_ctl_midi['cc_param_start']
+        self.cc_param_end = self.cc_param_start + self.num_params
 
-        self.ctl_osc_thread = threading.Thread(
-            target=self.ctl_osc_server.serve_forever)
+        self.midi_cc_param_map = bidict({
+            (self.cc_param_start + i): (i + 1)
+            for i in range(self.num_params)
+        })
 
-        self.send_osc_to_internal_queue = Queue()
-        self.send_osc_to_ctl_queue = Queue()
-        self.send_osc_to_ctl_thread = threading.Thread(
-            target=self.consume_ctl_osc_queue)
-        self.send_interval = 0.01
+    def create_ctl_osc_client(self):
+        cfg_ctl_osc = self.cfg_ctl_osc
+        logger.info('Initializing controller osc client to {} ({})'.format(
+            describe_endpoint(cfg_ctl_osc, 'remote_ip', 'remote_port'),
+            cfg_ctl_osc.get('transport', TRANSPORT_UDP)
+        ))
+        return create_osc_client(cfg_ctl_osc)
+
+    def create_ctl_bulk_osc_client(self):
+        cfg_ctl_osc = self.cfg_ctl_osc
+        if cfg_ctl_osc.get('bulk_remote_port') is not None:
+            logger.info('Initializing controller bulk osc client to {}:{}'
+                        .format(cfg_ctl_osc['remote_ip'],
+                                cfg_ctl_osc['bulk_remote_port']))
+        return create_bulk_osc_client(cfg_ctl_osc)
+
+    def create_daw_osc_client(self):
+        cfg_daw_osc = self.cfg_daw_osc
+        logger.info('Initializing daw osc client to {} ({})'.format(
+            describe_endpoint(cfg_daw_osc, 'remote_ip', 'remote_port'),
+            cfg_daw_osc.get('transport', TRANSPORT_UDP)
+        ))
+        return create_osc_client(cfg_daw_osc)
 
-        self.send_midi_to_ctl_queue = Queue()
-        self.send_midi_to_ctl_thread = threading.Thread(
-            target=self.consume_send_midi_to_ctl_queue)
+    def create_daw_osc_server(self):
+        cfg_daw_osc = self.cfg_daw_osc
+        logger.info('Initializing daw osc server on {} ({})'.format(
+            describe_endpoint(cfg_daw_osc, 'listen_ip', 'listen_port'),
+            cfg_daw_osc.get('transport', TRANSPORT_UDP)
+        ))
+        server = create_osc_server(cfg_daw_osc, self.daw_osc_dispatcher)
+        if self.capture_writer is not None:
+            server.tap = partial(self.capture_writer.record, SOURCE_DAW_OSC)
+        thread = threading.Thread(
+            target=server.serve_forever, name='daw-osc-server')
+        if isinstance(server, SLIPTCPServer):
+            server.on_handler_thread = partial(
+                self.register_handler_thread, thread.name)
+        return server, thread
+
+    def create_ctl_osc_server(self):
+        cfg_ctl_osc = self.cfg_ctl_osc
+        logger.info('Initializing controller osc server on {} ({})'.format(
+            describe_endpoint(cfg_ctl_osc, 'listen_ip', 'listen_port'),
+            cfg_ctl_osc.get('transport', TRANSPORT_UDP)
+        ))
+        server = create_osc_server(cfg_ctl_osc, self.ctl_osc_dispatcher)
+        if self.capture_writer is not None:
+            server.tap = partial(self.capture_writer.record, SOURCE_CTL_OSC)
+        thread = threading.Thread(
+            target=server.serve_forever, name='ctl-osc-server')
+        if isinstance(server, SLIPTCPServer):
+            server.on_handler_thread = partial(
+                self.register_handler_thread, thread.name)
+        return server, thread
+
+    def find_midi_port(self, midi_port, port_name, direction):
+        ports = midi_port.get_ports()
+        logger.info('Available %s ports: %s', direction, ports)
+        try:
+            return ports.index(port_name)
+        except ValueError:
+            return None
 
     def load_fx_maps(self):
+        """
+        Return maps, curves, macros and takeover modes per FX.
+
+        FX entry is either plain source to target map or dict with "map",
+        "curves", "macros" and "takeover" keys, all but map being keyed by
+        source param.
+        """
         if not os.path.exists(self.fx_maps_path):
-            return {}
+            return {}, {}, {}, {}
 
         with open(self.fx_maps_path) as f:
             data = yaml.safe_load(f)
             if data is None:
                 data = {}
             logger.info('Loaded maps for fx: {}'.format(','.join(data)))
-            return {
-                fx_name: bidict(fx_map) for fx_name, fx_map in data.items()
-            }
+
+        fx_maps = {}
+        fx_curves = {}
+        fx_macros = {}
+        fx_takeover = {}
+        for fx_name, fx_data in data.items():
+            if isinstance(fx_data, dict) and isinstance(
+                    fx_data.get('map'), dict):
+                fx_maps[fx_name] = frozenbidict(fx_data['map'])
+                fx_curves[fx_name] = load_curves(fx_data.get('curves'))
+                fx_macros[fx_name] = load_macros(fx_data.get('macros'))
+                fx_takeover[fx_name] = load_takeover(fx_data.get('takeover'))
+            else:
+                fx_maps[fx_name] = frozenbidict(fx_data or {})
+                fx_curves[fx_name] = {}
+                fx_macros[fx_name] = {}
+                fx_takeover[fx_name] = {}
+        return fx_maps, fx_curves, fx_macros, fx_takeover
 
     def save_fx_maps(self):
-        with open(self.fx_maps_path, 'w') as f:
-            data = {
-                fx_name: dict(fx_map) for fx_name, fx_map in self.fx_maps.items()
-            }
-            yaml.dump(data, f)
+        with self.routing_lock:
+            data = {}
+            for fx_name, fx_map in self.fx_maps.items():
+                curves = {
+                    source_param: curve.to_config()
+                    for source_param, curve in self.fx_curves.get(
+                        fx_name, {}).items()
+                }
+                macros = {
+                    source_param: macro.to_config()
+                    for source_param, macro in self.fx_macros.get(
+                        fx_name, {}).items()
+                }
+                takeover = dict(self.fx_takeover.get(fx_name, {}))
+                if curves or macros or takeover:
+                    data[fx_name] = {'map': dict(fx_map)}
+                    if curves:
+                        data[fx_name]['curves'] = curves
+                    if macros:
+                        data[fx_name]['macros'] = macros
+                    if takeover:
+                        data[fx_name]['takeover'] = takeover
+                else:
+                    data[fx_name] = dict(fx_map)
+
+            with open(self.fx_maps_path, 'w') as f:
+                yaml.dump(data, f)
 
     def refresh_fx(self):
         return
@@ -166,46 +332,113 @@ class OSCProxy(object):
         self.send_osc_to_daw("/fx/select/next", 1)
 
     def clear(self):
-        self.source_target_map.clear()
-        self.save_fx_maps()
-        self.init_osc_device_params()
-        self.init_midi_device_params()
+        with self.routing_lock:
+            fx_name = self.routing.fx_name
+            self.fx_maps[fx_name] = frozenbidict()
+            self.fx_curves[fx_name] = {}
+            self.fx_macros[fx_name] = {}
+            self.fx_takeover[fx_name] = {}
+            self.routing = self.routing.with_maps(
+                self.fx_maps[fx_name], self.fx_curves[fx_name],
+                self.fx_macros[fx_name], self.fx_takeover[fx_name])
+            self.save_fx_maps()
+        self.page = 0
+        self.takeover.reset()
+        self.paint_page()
         self.refresh_fx()
 
     def consume_ctl_osc_queue(self):
-        bundle_builder = OscBundleBuilder(IMMEDIATELY)
-        last_send_time = 0
         while True:
-            try:
-                item = self.send_osc_to_ctl_queue.get_nowait()
-            except Empty:
-                time.sleep(0.005)
-            else:
-                address, values = item
-                msg_builder = OscMessageBuilder(address=address)
-                for value in values:
-                    msg_builder.add_arg(value)
-                msg = msg_builder.build()
-                bundle_builder.add_content(msg)
-
-            if not bundle_builder._contents:
+            if not self.send_osc_to_ctl_queue.wait(timeout=1.0):
                 continue
 
-            curr_time = time.time()
-            if curr_time - last_send_time > self.send_interval:
-                bundle = bundle_builder.build()
-                self.ctl_osc_client.send(bundle)
-                bundle_builder = OscBundleBuilder(IMMEDIATELY)
-                last_send_time = curr_time
+            timestamp = self.ctl_flush_clock.wait()
+            pacer = self.ctl_pacer
+            items = self.send_osc_to_ctl_queue.get_many(pacer.flush_size)
+
+            client = self.ctl_osc_client
+            dropped = getattr(client, 'dropped', 0)
+            start_time = time.monotonic()
+            self.send_items_to_ctl(items, timestamp)
+            pacer.update(
+                self.send_osc_to_ctl_queue.qsize(),
+                time.monotonic() - start_time,
+                getattr(client, 'dropped', 0) - dropped)
+            self.ctl_flush_clock.interval = pacer.interval
+
+    def send_items_to_ctl(self, items, timestamp=IMMEDIATELY):
+        msgs = []
+        bulk_msgs = []
+        for address, values in items:
+            # bundle entry is expanded in place, so its messages go out
+            # together in this flush
+            if address == BUNDLE_ADDRESS:
+                entries = values
+            else:
+                entries = ((address, values),)
+            for address, values in entries:
+                msg = build_message(address, values)
+                if (self.ctl_bulk_osc_client is not None and
+                        is_bulk_address(address)):
+                    bulk_msgs.append(msg)
+                else:
+                    msgs.append(msg)
+
+        if msgs:
+            if self.ctl_pacer.acks:
+                msgs.append(build_message(
+                    SEQ_ADDRESS, [self.ctl_pacer.next_seq()]))
+            self.ctl_osc_client.send_many(build_bundles(
+                msgs, self.ctl_pacer.bundle_size, timestamp))
+        if bulk_msgs:
+            self.ctl_bulk_osc_client.send_many(build_bundles(
+                bulk_msgs, STREAM_BUNDLE_SIZE, timestamp))
+
+    def create_sysex_display(self):
+        cfg_sysex = self.cfg_ctl_midi.get('sysex')
+        if not cfg_sysex:
+            return None
+        return SysExDisplay.from_config(cfg_sysex)
 
     def consume_send_midi_to_ctl_queue(self):
         while True:
-            msg = self.send_midi_to_ctl_queue.get()
-            print('midi send', msg)
-            self.midi_out.send_message(msg)
+            display = self.sysex_display
+            try:
+                # with display wake up at its delay to flush texts
+                msg = self.send_midi_to_ctl_queue.get(
+                    timeout=None if display is None else display.delay)
+            except Empty:
+                msg = None
+
+            if display is not None:
+                for sysex in display.flush():
+                    self.midi_out.send_message(sysex)
+
+            if msg is not None:
+                self.midi_out.send_message(msg)
+
+    def send_texts_to_midi_ctl(self, texts):
+        """
+        Show (slot, field, text) on midi controller display if enabled.
+        """
+        if self.sysex_display is not None:
+            self.sysex_display.update(texts)
+
+    def paint_midi_display(self):
+        if self.sysex_display is None:
+            return
+        texts = []
+        routing = self.routing
+        for slot in range(1, self.num_params + 1):
+            target_param, _ = routing.source_feedback(
+                self.slot_to_source(slot))
+            state = self.param_state.get(target_param, {})
+            texts.append((slot, FIELD_NAME, state.get('name', '')))
+            texts.append((slot, FIELD_STR, state.get('str', '')))
+        self.sysex_display.update(texts)
 
     def init_osc_device_params(self):
-        for param_num in range(1, 17):
+        for param_num in range(1, self.num_params + 1):
             self.send_osc_to_ctl(
                 f"/fx/param/{param_num}/str", '')
             self.send_osc_to_ctl(
@@ -218,6 +451,8 @@ class OSCProxy(object):
             f"/fx/learn", 0)
         self.send_osc_to_ctl(
             "/fx/name", '')
+        self.send_osc_to_ctl(
+            "/fx/page", self.page + 1)
         self.init_osc_device_params()
 
     def init_midi_device_params(self):
@@ -226,49 +461,84 @@ class OSCProxy(object):
 
     def init_midi_device(self):
         self.init_midi_device_params()
+        if self.sysex_display is not None:
+            self.sysex_display.reset()
+            self.paint_midi_display()
 
     def handle_osc_from_daw(self, addr, *args):
         print('got', addr, args)
+        if self.rules is not None and self.apply_rules(SIDE_DAW, addr, args):
+            return
+
         if addr == '/fx/name':
             fx_name = args[0]
             logger.info('Set FX: %s', fx_name)
             self.set_fx(fx_name)
             self.send_osc_to_ctl(
                 "/fx/name", fx_name)
+            self.send_osc_to_ctl(
+                "/fx/page", self.page + 1)
             self.init_osc_device_params()
             self.init_midi_device_params()
+            self.paint_midi_display()
+            # filled in by param dump DAW sends after FX change
+            self.prefetch_pages()
 
         elif addr.startswith('/fx/param/'):
             fields = addr.split('/')
             target_param = int(fields[-2])
             param_attr = fields[-1]
 
-            if param_attr == 'val' and self.learn_active:
-                self.set_learn_target(target_param)
+            echo_origin = None
+            if param_attr == 'val':
+                val = float(args[0])
+                echo_origin = self.echo_origin(target_param, val)
+                # feedback of values sent by proxy itself is not user touch
+                if (self.learn_active and echo_origin is None and
+                        not self.is_modulated(target_param)):
+                    self.set_learn_target(target_param, val)
 
-            try:
-                source_param = self.source_target_map.inverse[target_param]
-            except KeyError:
+            self.update_param_state(target_param, param_attr, args[0])
+
+            routing = self.routing
+            source_param = routing.target_source(target_param)
+            if source_param is None:
                 return
 
-            prefix = f"/fx/param/{source_param}"
+            slot = self.source_to_slot(source_param)
+            if slot is None:
+                self.update_page_paint(source_param, param_attr, args[0])
+                return
+
+            prefix = f"/fx/param/{slot}"
 
             if param_attr == 'name':
                 name = args[0]
                 print('got fx param', name)
                 self.send_osc_to_ctl(
                     f"{prefix}/name", name)
+                self.send_texts_to_midi_ctl([(slot, FIELD_NAME, name)])
             if param_attr == 'val':
-                val = float(args[0])
-                self.send_osc_to_ctl(
-                    f"{prefix}/val", val)
-                cc = self.midi_cc_param_map.inverse[source_param]
-                midi_val = int(val * 127)
-                self.send_midi_to_ctl(cc, midi_val)
+                # echo is not sent back to controller which sent value,
+                # other one still has to follow it, values set by proxy
+                # itself (morph, modulation) go to both
+                if echo_origin is None or echo_origin == ORIGIN_PROXY:
+                    self.takeover.release(source_param)
+                    if self.smoother is not None:
+                        self.smoother.observe(target_param, val)
+                _, curve = routing.source_feedback(source_param)
+                ctl_val, midi_val = self.daw_to_ctl(curve, val)
+                if echo_origin != SOURCE_CTL_OSC:
+                    self.send_osc_to_ctl(
+                        f"{prefix}/val", ctl_val)
+                if echo_origin != SOURCE_CTL_MIDI:
+                    cc = self.midi_cc_param_map.inverse[slot]
+                    self.send_midi_to_ctl(cc, midi_val)
             elif param_attr == 'str':
                 s = args[0]
                 self.send_osc_to_ctl(
                     f"{prefix}/str", s)
+                self.send_texts_to_midi_ctl([(slot, FIELD_STR, s)])
 
         elif addr == '/fx/bypass':
             print('bypass', bool(args[0]))
@@ -278,28 +548,88 @@ class OSCProxy(object):
             self.fx_visible = bool(args[0])
 
     def handle_osc_from_ctl(self, addr, *args):
+        if (self.rules is not None and
+                self.apply_rules(SIDE_CONTROLLER, addr, args)):
+            return
+
         if addr.startswith('/fx/param/'):
             fields = addr.split('/')
-            source_param = int(fields[-2])
+            source_param = self.slot_to_source(int(fields[-2]))
 
             param_attr = fields[-1]
 
             if param_attr == 'val' and self.learn_active:
                 self.set_learn_source(source_param)
 
+            routing = self.routing
+            macro = routing.macros.get(source_param)
+            if macro is not None:
+                if param_attr == 'val':
+                    self.send_params_to_daw(
+                        macro.values(args[0]), SOURCE_CTL_OSC)
+                return
+
             try:
-                target_param = self.source_target_map[source_param]
+                target_param = routing.source_target_map[source_param]
             except KeyError:
                 return
 
             prefix = f"/fx/param/{target_param}"
             if param_attr == 'val':
+                val = args[0]
+                curve = routing.curves.get(source_param)
+                if curve is not None:
+                    val = curve.to_daw(val)
+                self.note_param_sent(target_param, val, SOURCE_CTL_OSC)
                 self.send_osc_to_daw(
-                    f"{prefix}/val", args[0])
+                    f"{prefix}/val", val)
         elif addr == '/fx/learn':
             self.toggle_learn()
         elif addr == '/fx/clear':
             self.clear()
+        elif addr == '/fx/page/next':
+            self.select_page(self.page + 1)
+        elif addr == '/fx/page/prev':
+            self.select_page(self.page - 1)
+        elif addr == '/fx/page':
+            self.select_page(int(args[0]) - 1)
+        elif addr == '/fx/snapshot/a':
+            self.capture_snapshot(SNAPSHOT_A)
+        elif addr == '/fx/snapshot/b':
+            self.capture_snapshot(SNAPSHOT_B)
+        elif addr == '/fx/morph':
+            self.morph_to(float(args[0]))
+        elif addr == '/fx/mod/learn':
+            self.set_learn_modulator(args[0])
+        elif addr == '/fx/mod/trigger':
+            self.trigger_modulator(args[0])
+        elif addr == '/fx/mod/clear':
+            self.clear_modulations()
+        elif addr == ACK_ADDRESS:
+            self.ctl_pacer.ack(int(args[0]))
+
+    def apply_rules(self, source, addr, args):
+        """
+        Send messages produced by matching rewrite rule, return whether
+        original message is consumed.
+        """
+        routed = self.rules.route(source, addr, args)
+        if routed is None:
+            return False
+
+        rule, outputs = routed
+        ctl_msgs = []
+        for side, address, out_args in outputs:
+            if side == SIDE_DAW:
+                self.daw_sender.put(address, *out_args)
+            else:
+                ctl_msgs.append((address, tuple(out_args)))
+
+        self.daw_sender.flush()
+        if ctl_msgs:
+            self.send_osc_bundle_to_ctl(ctl_msgs)
+
+        return not rule.passthrough
 
     def toggle_fx_follow(self):
         self.fx_follow = not self.fx_follow
@@ -335,8 +665,89 @@ class OSCProxy(object):
         logger.info('Selected next FX')
         self.send_osc_to_daw("/fx/select/next", 1)
 
+    def set_midi_input_mode(self):
+        if self.cfg_ctl_midi.get('input_mode', 'callback') == 'batch':
+            logger.info('Handling midi input in batches')
+            self.midi_in.set_callback(self.enqueue_midi_from_ctl)
+        else:
+            self.midi_in.set_callback(self.handle_midi_from_ctl)
+
+    def name_midi_in_thread(self):
+        if not self.midi_in_thread_named:
+            # midi backend calls back from its own native thread
+            threading.current_thread().name = 'ctl-midi-in'
+            self.midi_in_thread_named = True
+            self.thread_tuner.register(
+                'ctl-midi-in', threading.get_native_id())
+
+    def enqueue_midi_from_ctl(self, event, data=None):
+        """
+        Queue raw message for batch handling, never blocking midi thread.
+        """
+        msg, deltatime = event
+        self.name_midi_in_thread()
+        if self.capture_writer is not None:
+            self.capture_writer.record(SOURCE_CTL_MIDI, msg)
+        self.midi_in_queue.append(msg)
+        self.midi_in_event.set()
+
+    def consume_midi_from_ctl_queue(self):
+        while True:
+            self.midi_in_event.wait()
+            self.midi_in_event.clear()
+
+            msgs = []
+            while True:
+                try:
+                    msgs.append(self.midi_in_queue.popleft())
+                except IndexError:
+                    break
+            self.midi_in_received += len(msgs)
+
+            updates = []
+            for msg in self.coalesce_midi(msgs):
+                try:
+                    self.handle_midi_message(msg, updates)
+                except Exception:
+                    logger.exception('Handling midi message %s failed', msg)
+            if updates:
+                self.send_params_to_daw(updates, SOURCE_CTL_MIDI)
+
+            time.sleep(self.cfg_ctl_midi.get('input_interval', 0.005))
+
+    def coalesce_midi(self, msgs):
+        """
+        Keep only latest value of each param channel CC at position of its
+        first occurrence, leaving other messages as they are.
+        """
+        param_status = CONTROL_CHANGE | self.midi_channel_param
+        coalesced = []
+        positions = {}
+        for msg in msgs:
+            if len(msg) == 3 and msg[0] == param_status:
+                pos = positions.get(msg[1])
+                if pos is not None:
+                    coalesced[pos] = msg
+                    self.midi_in_coalesced += 1
+                    continue
+                positions[msg[1]] = len(coalesced)
+            coalesced.append(msg)
+        return coalesced
+
     def handle_midi_from_ctl(self, event, data=None):
         msg, deltatime = event
+        self.name_midi_in_thread()
+
+        if self.capture_writer is not None:
+            self.capture_writer.record(SOURCE_CTL_MIDI, msg)
+
+        self.handle_midi_message(msg)
+
+    def handle_midi_message(self, msg, updates=None):
+        """
+        Handle single midi message, collecting param values for DAW into
+        updates list if given instead of sending them right away.
+        """
         logger.info('MIDI RECV: %s', msg)
 
         if msg[0] == (CONTROL_CHANGE | self.midi_channel_cmd):
@@ -354,19 +765,50 @@ class OSCProxy(object):
                 self.select_next_fx()
             elif cc == self.cfg_ctl_midi['cc_learn'] and value == 127:
                 self.toggle_learn()
+            elif cc == self.cfg_ctl_midi.get('cc_prev_page') and value == 127:
+                self.select_page(self.page - 1)
+            elif cc == self.cfg_ctl_midi.get('cc_next_page') and value == 127:
+                self.select_page(self.page + 1)
+            elif cc == self.cfg_ctl_midi.get('cc_snapshot_a') and value == 127:
+                self.capture_snapshot(SNAPSHOT_A)
+            elif cc == self.cfg_ctl_midi.get('cc_snapshot_b') and value == 127:
+                self.capture_snapshot(SNAPSHOT_B)
+            elif cc == self.cfg_ctl_midi.get('cc_morph'):
+                self.morph_to(value / 127.0)
+            elif cc in self.cfg_ctl_midi.get('cc_mod_learn', {}) \
+                    and value == 127:
+                self.set_learn_modulator(self.cfg_ctl_midi['cc_mod_learn'][cc])
         elif msg[0] == (CONTROL_CHANGE | self.midi_channel_param):
             cc, value = msg[1], msg[2]
             logger.info('Handling MIDI param CC={}'.format(cc))
 
-            if self.cc_param_start <= cc <= self.cc_param_end:
-                source_param = self.midi_cc_param_map[cc]
+            if self.cc_param_start <= cc < self.cc_param_end:
+                source_param = self.slot_to_source(self.midi_cc_param_map[cc])
 
                 if self.learn_active:
                     self.set_learn_source(source_param)
                     return
 
+                routing = self.routing
+                position = value / 127.0
+                takeover_position = self.soft_takeover(
+                    routing, source_param, position)
+                if takeover_position is None:
+                    return
+                scaled = takeover_position != position
+
+                macro = routing.macros.get(source_param)
+                if macro is not None:
+                    if scaled:
+                        param_updates = macro.values(takeover_position)
+                    else:
+                        param_updates = macro.midi_values(value)
+                    self.send_param_updates(
+                        param_updates, updates, SOURCE_CTL_MIDI)
+                    return
+
                 try:
-                    target_param = self.source_target_map[source_param]
+                    target_param = routing.source_target_map[source_param]
                 except KeyError:
                     logger.info('Don\'t know how to map source param {} to target param'.format(
                         source_param))
@@ -374,49 +816,270 @@ class OSCProxy(object):
 
                 prefix = f"/fx/param/{target_param}"
 
-                osc_val = value / 127.0
-                self.send_osc_to_daw(
-                    f"{prefix}/val", osc_val)
+                curve = routing.curves.get(source_param)
+                if curve is None:
+                    osc_val = takeover_position
+                elif scaled:
+                    osc_val = curve.to_daw(takeover_position)
+                else:
+                    osc_val = curve.midi_to_daw[value]
+                if self.smoother is not None:
+                    self.smoothed_origins[target_param] = SOURCE_CTL_MIDI
+                    self.smoother.set_target(target_param, osc_val)
+                elif updates is not None:
+                    updates.append((target_param, osc_val))
+                else:
+                    self.note_param_sent(
+                        target_param, osc_val, SOURCE_CTL_MIDI)
+                    self.send_osc_to_daw(
+                        f"{prefix}/val", osc_val)
             else:
                 logger.info('Out of bounds <{},{}>'.format(
                     self.cc_param_start, self.cc_param_end))
         else:
             logger.info('Unknown message "{}"'.format(msg))
 
-    def set_fx(self, fx_name):
-        self.fx_name = fx_name
+    def soft_takeover(self, routing, source_param, position):
+        """
+        Return controller position after soft takeover of source param,
+        None if it should be ignored.
+        """
+        mode = routing.takeover.get(source_param, self.takeover.default_mode)
+        if mode == TAKEOVER_OFF:
+            return position
+        target_param, curve = routing.source_feedback(source_param)
+        val = self.param_state.get(target_param, {}).get('val')
+        if val is not None:
+            val = float(val) if curve is None else curve.to_ctl(float(val))
+        return self.takeover.filter(mode, source_param, position, val)
+
+    def slot_to_source(self, slot):
+        return self.page * self.num_params + slot
+
+    def source_page(self, source_param):
+        return (source_param - 1) // self.num_params
+
+    def source_to_slot(self, source_param):
+        """
+        Return controller slot showing source param or None if off page.
+        """
+        if self.source_page(source_param) != self.page:
+            return None
+        return (source_param - 1) % self.num_params + 1
+
+    def update_param_state(self, target_param, param_attr, value):
+        try:
+            state = self.param_state[target_param]
+        except KeyError:
+            state = self.param_state[target_param] = {}
+        state[param_attr] = value
+
+    def send_param_updates(self, param_updates, updates=None,
+                           origin=ORIGIN_PROXY):
+        """
+        Send (target param, value) pairs to DAW as one bundle, through
+        smoother if enabled or into updates list if given.
+        """
+        if self.smoother is not None:
+            for target_param, val in param_updates:
+                self.smoothed_origins[target_param] = origin
+                self.smoother.set_target(target_param, val)
+        elif updates is not None:
+            updates.extend(param_updates)
+        else:
+            self.send_params_to_daw(param_updates, origin)
+
+    def daw_to_ctl(self, curve, val):
+        """
+        Return controller OSC and MIDI values showing DAW param value.
+        """
+        if curve is None:
+            return val, int(val * 127)
+        return curve.to_ctl(val), curve.to_midi(val)
+
+    def num_pages(self):
+        max_source = self.routing.max_source()
+        if max_source is None:
+            return 1
+        # one page past last mapped param is left free for learning
+        return self.source_page(max_source) + 2
+
+    def build_page_paint(self, page):
+        osc_msgs = []
+        midi_msgs = []
+        routing = self.routing
+        for slot in range(1, self.num_params + 1):
+            source_param = page * self.num_params + slot
+            target_param, curve = routing.source_feedback(source_param)
+            state = self.param_state.get(target_param, {})
+            ctl_val, midi_val = self.daw_to_ctl(
+                curve, float(state.get('val', 0)))
+            prefix = f"/fx/param/{slot}"
+            osc_msgs.append((f"{prefix}/name", (state.get('name', ''),)))
+            osc_msgs.append((f"{prefix}/str", (state.get('str', ''),)))
+            osc_msgs.append((f"{prefix}/val", (ctl_val,)))
+            midi_msgs.append(
+                (self.midi_cc_param_map.inverse[slot], midi_val))
+        return osc_msgs, midi_msgs
+
+    def update_page_paint(self, source_param, param_attr, value):
+        """
+        Keep prefetched paint of off page param up to date.
+        """
+        paint = self.page_paints.get(self.source_page(source_param))
+        if paint is None:
+            return
+        osc_msgs, midi_msgs = paint
+        idx = (source_param - 1) % self.num_params
+        prefix = f"/fx/param/{idx + 1}"
+        if param_attr == 'name':
+            osc_msgs[idx * 3] = (f"{prefix}/name", (value,))
+        elif param_attr == 'str':
+            osc_msgs[idx * 3 + 1] = (f"{prefix}/str", (value,))
+        elif param_attr == 'val':
+            _, curve = self.routing.source_feedback(source_param)
+            ctl_val, midi_val = self.daw_to_ctl(curve, float(value))
+            osc_msgs[idx * 3 + 2] = (f"{prefix}/val", (ctl_val,))
+            midi_msgs[idx] = (midi_msgs[idx][0], midi_val)
+
+    def prefetch_pages(self):
+        for page in (self.page - 1, self.page + 1):
+            if 0 <= page < self.num_pages() and page not in self.page_paints:
+                self.page_paints[page] = self.build_page_paint(page)
+
+    def paint_page(self):
+        """
+        Send cached state of all params on current page to controller.
+        """
         try:
-            source_target_map = self.fx_maps[fx_name]
+            osc_msgs, midi_msgs = self.page_paints.pop(self.page)
         except KeyError:
-            source_target_map = bidict()
-            self.fx_maps[fx_name] = source_target_map
-        self.source_target_map = source_target_map
+            osc_msgs, midi_msgs = self.build_page_paint(self.page)
+
+        # paint carries latest state of every slot, queued slot updates
+        # would only overwrite it with older values
+        self.send_osc_bundle_to_ctl(
+            [("/fx/page", (self.page + 1,))] + osc_msgs,
+            supersedes=is_param_item)
+        for cc, midi_val in midi_msgs:
+            self.send_midi_to_ctl(cc, midi_val)
+        self.paint_midi_display()
+
+        self.page_paints.clear()
+        self.prefetch_pages()
+
+    def select_page(self, page):
+        page = max(0, min(page, self.num_pages() - 1))
+        if page == self.page:
+            return
+        logger.info('Selected page %d', page + 1)
+        self.page = page
+        self.takeover.reset()
+        self.paint_page()
 
-    def set_learn_target(self, param_num):
-        if self.learn_source is None:
+    def set_fx(self, fx_name):
+        with self.routing_lock:
+            self.routing = self.routing._replace(fx_name=fx_name).with_maps(
+                self.fx_maps.setdefault(fx_name, frozenbidict()),
+                self.fx_curves.setdefault(fx_name, {}),
+                self.fx_macros.setdefault(fx_name, {}),
+                self.fx_takeover.setdefault(fx_name, {}))
+        self.param_state = self.fx_param_state.setdefault(fx_name, {})
+        self.page = 0
+        self.page_paints = {}
+        self.takeover.reset()
+        if self.smoother is not None:
+            self.smoother.clear()
+            self.smoothed_origins.clear()
+        self.load_modulations()
+
+    def capture_snapshot(self, slot):
+        if self.morph_engine is None:
+            logger.info('Morphing is not configured')
             return
-        self.learn_target = param_num
+        self.morph_engine.capture(
+            self.routing.fx_name, slot, self.param_state)
+
+    def morph_to(self, position):
+        if self.morph_engine is None:
+            return
+        self.morph_engine.morph(self.routing.fx_name, position)
+
+    def load_modulations(self):
+        if self.modulation_engine is None:
+            return
+        self.modulation_engine.clear()
+        modulations = self.fx_modulations.get(self.routing.fx_name, {})
+        for target_param, (name, center) in modulations.items():
+            self.modulation_engine.assign(name, target_param, center)
+
+    def set_learn_modulator(self, name):
+        """
+        Assign modulation generator to next DAW param touched in learn.
+        """
+        if self.modulation_engine is None:
+            logger.info('Modulation is not configured')
+            return
+        if not self.learn_active:
+            self.toggle_learn()
+            self.learn_modulator_toggled = True
+        self.learn_modulator = name
+        logger.info('Learn modulator set to: %s', name)
+
+    def is_modulated(self, target_param):
+        return (self.modulation_engine is not None and
+                self.modulation_engine.is_assigned(target_param))
+
+    def trigger_modulator(self, name):
+        if self.modulation_engine is not None:
+            self.modulation_engine.trigger(name)
+
+    def clear_modulations(self):
+        if self.modulation_engine is None:
+            return
+        self.fx_modulations.pop(self.routing.fx_name, None)
+        self.modulation_engine.clear()
+
+    def set_learn_target(self, param_num, val=None):
+        name = self.learn_modulator
+        if name is not None and val is not None:
+            self.learn_modulator = None
+            logger.info('Learned modulator: %s, target: %s', name, param_num)
+            self.fx_modulations.setdefault(
+                self.routing.fx_name, {})[param_num] = (name, val)
+            self.modulation_engine.assign(name, param_num, val)
+            if self.learn_modulator_toggled:
+                # leave learn mode entered just for this assignment
+                self.toggle_learn()
+            return
+
+        with self.routing_lock:
+            if self.routing.learn_source is None:
+                return
+            self.routing = self.routing._replace(learn_target=param_num)
         logger.info('Learn target set to: %d', param_num)
         self.learn_check()
 
     def set_learn_source(self, param_num):
-        self.learn_source = param_num
+        with self.routing_lock:
+            self.routing = self.routing._replace(learn_source=param_num)
         logger.info('Learn source set to: %d', param_num)
         self.learn_check()
 
     def learn_check(self):
-        if self.learn_source is None or self.learn_target is None:
-            return
-        logger.info(
-            'Learned source: %s, target: %s',
-            self.learn_source,
-            self.learn_target)
-        self.source_target_map.forceput(self.learn_source, self.learn_target)
-        self.learn_source = None
-        self.learn_target = None
-        self.save_fx_maps()
-        self.init_osc_device_params()
-        self.init_midi_device_params()
+        with self.routing_lock:
+            routing = self.routing
+            if routing.learn_source is None or routing.learn_target is None:
+                return
+            logger.info(
+                'Learned source: %s, target: %s',
+                routing.learn_source,
+                routing.learn_target)
+            self.routing = routing.learned()
+            self.fx_maps[routing.fx_name] = self.routing.source_target_map
+            self.fx_macros[routing.fx_name] = self.routing.macros
+            self.save_fx_maps()
+        self.paint_page()
         self.refresh_fx()
 
     def send_midi_to_ctl(self, cc, val, channel=None):
@@ -429,19 +1092,104 @@ class OSCProxy(object):
         logger.info('Sending to controller: %s %s', address, args)
 
         msg = address, args
-        #self.send_osc_to_ctl_queue.put(msg)
         self.send_osc_to_internal_queue.put(msg)
+        if self.cfg_ctl_osc.get('send_remote', False):
+            self.send_osc_to_ctl_queue.put(msg)
+
+    def send_osc_bundle_to_ctl(self, msgs, supersedes=None):
+        """
+        Send messages to controller together, remote controller gets them
+        as single queue entry sent within one flush.
+
+        Queued messages matching supersedes predicate are dropped first.
+        """
+        logger.info('Sending %d messages to controller', len(msgs))
+        if supersedes is not None:
+            self.send_osc_to_internal_queue.discard(supersedes)
+        for msg in msgs:
+            self.send_osc_to_internal_queue.put(msg)
+        if self.cfg_ctl_osc.get('send_remote', False):
+            if supersedes is not None:
+                self.send_osc_to_ctl_queue.discard(supersedes)
+            self.send_osc_to_ctl_queue.put((BUNDLE_ADDRESS, tuple(msgs)))
 
     def send_osc_to_daw(self, address, *args):
         logger.info('Sending to DAW: %s %s', address, args)
         self.to_daw_client.send_message(address, *args)
 
+    def send_params_to_daw(self, updates, origin=ORIGIN_PROXY):
+        for target_param, val in updates:
+            self.note_param_sent(target_param, val, origin)
+            self.daw_sender.put(f"/fx/param/{target_param}/val", val)
+        self.daw_sender.flush()
+
+    def send_smoothed_params_to_daw(self, updates):
+        for target_param, val in updates:
+            self.note_param_sent(
+                target_param, val,
+                self.smoothed_origins.get(target_param, ORIGIN_PROXY))
+            self.daw_sender.put(f"/fx/param/{target_param}/val", val)
+        self.daw_sender.flush()
+
+    def note_param_sent(self, target_param, val, origin=ORIGIN_PROXY):
+        try:
+            recent = self.sent_param_values[target_param]
+        except KeyError:
+            recent = self.sent_param_values[target_param] = deque(maxlen=8)
+        recent.append((val, time.monotonic(), origin))
+
+    def echo_origin(self, target_param, val):
+        """
+        Return origin of value if DAW reflects back value recently sent to
+        it, None otherwise.
+        """
+        recent = self.sent_param_values.get(target_param)
+        if not recent:
+            return None
+        min_time = time.monotonic() - self.echo_window
+        for sent_val, sent_time, origin in reversed(recent):
+            if sent_time < min_time:
+                break
+            if abs(sent_val - val) <= self.echo_tolerance:
+                self.echo_suppressed += 1
+                return origin
+        return None
+
+
+    def start_thread(self, thread):
+        thread.start()
+        self.thread_tuner.register(thread.name, thread.native_id)
+
+    def register_handler_thread(self, role, thread, started):
+        """
+        Tune TCP connection thread like server thread accepting it.
+        """
+        if started:
+            thread.name = '{}-conn'.format(role)
+            self.thread_tuner.register(
+                role, thread.native_id, key=thread.native_id)
+        else:
+            self.thread_tuner.unregister(thread.native_id)
 
     def start(self):
-        self.daw_osc_thread.start()
-        self.ctl_osc_thread.start()
-        self.send_osc_to_ctl_thread.start()
-        self.send_midi_to_ctl_thread.start()
+        self.start_thread(self.daw_osc_thread)
+        self.start_thread(self.ctl_osc_thread)
+        self.start_thread(self.send_osc_to_ctl_thread)
+        self.start_thread(self.send_midi_to_ctl_thread)
+        self.start_thread(self.midi_in_thread)
+        # midi backend thread is registered on its first message
+        self.thread_tuner.expect('ctl-midi-in')
+
+        if self.smoother is not None:
+            self.smoother.start()
+            self.thread_tuner.register(
+                self.smoother.thread.name, self.smoother.thread.native_id)
+
+        if self.modulation_engine is not None:
+            self.modulation_engine.start()
+            self.thread_tuner.register(
+                self.modulation_engine.thread.name,
+                self.modulation_engine.thread.native_id)
 
         if self.midi_in_port is not None:
             self.midi_in.open_port(self.midi_in_port)
@@ -454,8 +1202,196 @@ class OSCProxy(object):
 
         self.refresh_fx()
 
+    def stats(self):
+        return {
+            'daw_osc_server': self.daw_osc_server.stats(),
+            'ctl_osc_server': self.ctl_osc_server.stats(),
+            'daw_sender': {
+                'messages': self.daw_sender.sent_messages,
+                'bundles': self.daw_sender.sent_bundles,
+            },
+            'echo_suppressed': self.echo_suppressed,
+            'internal_queue': self.send_osc_to_internal_queue.stats(),
+            'ctl_osc_queue': self.send_osc_to_ctl_queue.stats(),
+            'ctl_osc_flush': self.ctl_flush_clock.stats(),
+            'ctl_osc_pacing': self.ctl_pacer.stats(),
+            'threads': self.thread_tuner.stats(),
+            'ctl_midi_queue': self.send_midi_to_ctl_queue.stats(),
+            'ctl_midi_display': (self.sysex_display.stats()
+                                 if self.sysex_display is not None else None),
+            'ctl_midi_in': {
+                'received': self.midi_in_received,
+                'coalesced': self.midi_in_coalesced,
+            },
+            'takeover': self.takeover.stats(),
+            'modulation': (self.modulation_engine.stats()
+                           if self.modulation_engine is not None else None),
+        }
+
+    def reload_config(self, cfg):
+        """
+        Apply changed configuration in place, rebuilding only the parts
+        that differ from the running configuration.
+        """
+        old_global = self.cfg_global
+        old_ctl_midi = self.cfg_ctl_midi
+        old_ctl_osc = self.cfg_ctl_osc
+        old_daw_osc = self.cfg_daw_osc
+
+        self.cfg_global = cfg['global']
+        self.cfg_ctl_midi = cfg_ctl_midi = cfg['controller_midi']
+        self.cfg_ctl_osc = cfg['controller_osc']
+        self.cfg_daw_osc = cfg['daw_osc']
+
+        self.midi_channel_param = cfg_ctl_midi['param_channel']
+        self.midi_channel_cmd = cfg_ctl_midi['cmd_channel']
+
+        self.echo_window = self.cfg_daw_osc.get('echo_window', 0.1)
+        self.echo_tolerance = self.cfg_daw_osc.get('echo_tolerance', 0.001)
+
+        self.ctl_flush_clock.latency = self.cfg_ctl_osc.get('schedule_latency')
+
+        if cfg.get('threads') != self.thread_tuner.cfg:
+            self.thread_tuner.reload(cfg.get('threads'))
+
+        if cfg.get('rules') != self.cfg_rules:
+            logger.info('Recompiling rewrite rules')
+            self.rules = RuleSet.from_config(cfg.get('rules'))
+            self.cfg_rules = cfg.get('rules')
+
+        if (config_changed(old_global, self.cfg_global, 'params') or
+                config_changed(old_ctl_midi, cfg_ctl_midi, 'cc_param_start')):
+            logger.info('Reloading midi param map')
+            self.build_midi_cc_param_map()
+            self.page = 0
+            # cached paints were built for previous layout
+            self.page_paints.clear()
+            self.paint_page()
+
+        if config_changed(old_ctl_osc, self.cfg_ctl_osc,
+                          'remote_ip', 'remote_port', 'transport'):
+            old_client = self.ctl_osc_client
+            self.ctl_osc_client = self.create_ctl_osc_client()
+            old_client.close()
+
+        if config_changed(old_ctl_osc, self.cfg_ctl_osc,
+                          'remote_ip', 'transport', 'send_interval',
+                          'max_bundle_size', 'flush_size', 'pacing'):
+            self.ctl_pacer = create_pacer(
+                self.cfg_ctl_osc, max_bundle_size(self.cfg_ctl_osc))
+            self.ctl_flush_clock.interval = self.ctl_pacer.interval
+
+        if config_changed(old_ctl_osc, self.cfg_ctl_osc,
+                          'remote_ip', 'bulk_remote_port'):
+            old_client = self.ctl_bulk_osc_client
+            self.ctl_bulk_osc_client = self.create_ctl_bulk_osc_client()
+            if old_client is not None:
+                old_client.close()
+
+        if config_changed(old_daw_osc, self.cfg_daw_osc,
+                          'remote_ip', 'remote_port', 'transport'):
+            old_client = self.to_daw_client
+            self.to_daw_client = self.create_daw_osc_client()
+            self.daw_sender.client = self.to_daw_client
+            old_client.close()
+
+        if config_changed(old_daw_osc, self.cfg_daw_osc,
+                          'listen_ip', 'listen_port', 'transport',
+                          'rcvbuf', 'max_batch', 'coalesce'):
+            self.stop_osc_server(self.daw_osc_server)
+            self.daw_osc_server, self.daw_osc_thread = \
+                self.create_daw_osc_server()
+            self.start_thread(self.daw_osc_thread)
+
+        if config_changed(old_ctl_osc, self.cfg_ctl_osc,
+                          'listen_ip', 'listen_port', 'transport',
+                          'rcvbuf', 'max_batch', 'coalesce'):
+            self.stop_osc_server(self.ctl_osc_server)
+            self.ctl_osc_server, self.ctl_osc_thread = \
+                self.create_ctl_osc_server()
+            self.start_thread(self.ctl_osc_thread)
+
+        if config_changed(old_ctl_midi, cfg_ctl_midi, 'input_mode'):
+            self.set_midi_input_mode()
+
+        if config_changed(old_ctl_midi, cfg_ctl_midi, 'takeover'):
+            self.takeover.default_mode = check_takeover_mode(
+                cfg_ctl_midi.get('takeover', TAKEOVER_OFF))
+            self.takeover.reset()
+
+        if config_changed(old_ctl_midi, cfg_ctl_midi, 'input_port'):
+            logger.info('Reopening midi input port "{}"'.format(
+                cfg_ctl_midi['input_port']))
+            self.midi_in.close_port()
+            self.midi_in_port = self.find_midi_port(
+                self.midi_in, cfg_ctl_midi['input_port'], 'input')
+            if self.midi_in_port is not None:
+                self.midi_in.open_port(self.midi_in_port)
+
+        if config_changed(old_ctl_midi, cfg_ctl_midi, 'output_port'):
+            logger.info('Reopening midi output port "{}"'.format(
+                cfg_ctl_midi['output_port']))
+            self.midi_out.close_port()
+            self.midi_out_port = self.find_midi_port(
+                self.midi_out, cfg_ctl_midi['output_port'], 'output')
+            if self.midi_out_port is not None:
+                self.midi_out.open_port(self.midi_out_port)
+            if self.sysex_display is not None:
+                self.sysex_display.reset()
+                self.paint_midi_display()
+
+        if config_changed(old_ctl_midi, cfg_ctl_midi, 'sysex'):
+            self.sysex_display = self.create_sysex_display()
+            self.paint_midi_display()
+
+    def stop_osc_server(self, server):
+        server.shutdown()
+        server.server_close()
+
+    def reload_fx_maps(self):
+        """
+        Reload FX maps from disk, replacing only maps that changed.
+        """
+        fx_maps, fx_curves, fx_macros, fx_takeover = self.load_fx_maps()
+        changed = False
+
+        with self.routing_lock:
+            for fx_name in set(self.fx_maps) - set(fx_maps):
+                fx_maps[fx_name] = frozenbidict()
+                fx_curves[fx_name] = {}
+                fx_macros[fx_name] = {}
+                fx_takeover[fx_name] = {}
+
+            for fx_name, fx_map in fx_maps.items():
+                current_map = self.fx_maps.get(fx_name)
+                curves = fx_curves[fx_name]
+                macros = fx_macros[fx_name]
+                takeover = fx_takeover[fx_name]
+                if (current_map is not None and
+                        dict(current_map) == dict(fx_map) and
+                        self.fx_curves.get(fx_name) == curves and
+                        self.fx_macros.get(fx_name) == macros and
+                        self.fx_takeover.get(fx_name) == takeover):
+                    continue
+                logger.info('Reloaded map for fx: %s', fx_name)
+                self.fx_maps[fx_name] = fx_map
+                self.fx_curves[fx_name] = curves
+                self.fx_macros[fx_name] = macros
+                self.fx_takeover[fx_name] = takeover
+                if fx_name == self.routing.fx_name:
+                    self.routing = self.routing.with_maps(
+                        fx_map, curves, macros, takeover)
+                    changed = True
+
+        if changed:
+            self.page = min(self.page, self.num_pages() - 1)
+            self.paint_page()
+            self.refresh_fx()
+
     def toggle_learn(self):
         self.learn_active = not self.learn_active
+        self.learn_modulator = None
+        self.learn_modulator_toggled = False
 
         if self.learn_active:
             logger.info('Learn activated')
@@ -463,8 +1399,9 @@ class OSCProxy(object):
             self.save_fx_maps()
             logger.info('Learn disactivated')
 
-        self.learn_source = None
-        self.learn_target = None
+        with self.routing_lock:
+            self.routing = self.routing._replace(
+                learn_source=None, learn_target=None)
 
         self.send_osc_to_ctl(
             f"/fx/learn", 1 if self.learn_active else 0)
@@ -0,0 +1,193 @@
+import logging
+import threading
+import time
+from collections import deque
+
+
+logger = logging.getLogger(__name__)
+
+
+SEQ_ADDRESS = '/proxy/seq'
+ACK_ADDRESS = '/proxy/ack'
+
+
+class FixedPacer(object):
+    """
+    Constant send interval, bundle size and flush size of endpoint.
+    """
+
+    acks = False
+
+    def __init__(self, interval, bundle_size, flush_size=256):
+        self.interval = interval
+        self.bundle_size = bundle_size
+        self.flush_size = flush_size
+
+    def update(self, depth, flush_time, dropped=0):
+        pass
+
+    def ack(self, seq):
+        pass
+
+    def stats(self):
+        return {
+            'mode': 'fixed',
+            'interval_ms': self.interval * 1000,
+            'bundle_size': self.bundle_size,
+            'flush_size': self.flush_size,
+        }
+
+
+class AdaptivePacer(object):
+    """
+    Adapt send interval, bundle size and number of messages per flush of
+    endpoint to what link sustains.
+
+    Interval, bundle size and flush size follow AIMD. Each clean flush
+    shortens the interval by step, and grows bundles by bundle step and
+    flushes by flush step while queue has backlog. Congestion doubles
+    the interval and halves bundles and flushes.
+    Congestion is flush taking more than flush budget fraction of
+    interval, packets dropped by client, and with acks enabled more than
+    max in flight flushes not acknowledged or ack not arriving within ack
+    timeout. Acked flushes carry sequence number which controller
+    returns in ack message.
+    """
+
+    def __init__(self, interval, bundle_size, flush_size=256,
+                 min_interval=0.001, max_interval=0.1, step=0.0005,
+                 min_bundle_size=512, bundle_step=256, min_flush_size=16,
+                 flush_step=16, flush_budget=0.5, acks=False,
+                 max_in_flight=4, ack_timeout=0.5):
+        self.interval = interval
+        self.bundle_size = bundle_size
+        self.flush_size = flush_size
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.step = step
+        self.min_bundle_size = min(min_bundle_size, bundle_size)
+        self.max_bundle_size = bundle_size
+        self.bundle_step = bundle_step
+        self.min_flush_size = min(min_flush_size, flush_size)
+        self.max_flush_size = flush_size
+        self.flush_step = flush_step
+        self.flush_budget = flush_budget
+        self.acks = acks
+        self.max_in_flight = max_in_flight
+        self.ack_timeout = ack_timeout
+
+        self.lock = threading.Lock()
+        self.seq = 0
+        # (seq, send time) of flushes waiting for ack
+        self.in_flight = deque()
+
+        self.backoffs = 0
+        self.lost = 0
+        self.rtt = None
+        self.rtt_max = 0.0
+
+    @classmethod
+    def from_config(cls, cfg, interval, bundle_size, flush_size=256):
+        return cls(
+            interval,
+            bundle_size,
+            flush_size,
+            min_interval=cfg.get('min_interval', 0.001),
+            max_interval=cfg.get('max_interval', 0.1),
+            step=cfg.get('step', 0.0005),
+            min_bundle_size=cfg.get('min_bundle_size', 512),
+            bundle_step=cfg.get('bundle_step', 256),
+            min_flush_size=cfg.get('min_flush_size', 16),
+            flush_step=cfg.get('flush_step', 16),
+            flush_budget=cfg.get('flush_budget', 0.5),
+            acks=cfg.get('acks', False),
+            max_in_flight=cfg.get('max_in_flight', 4),
+            ack_timeout=cfg.get('ack_timeout', 0.5))
+
+    def next_seq(self):
+        """
+        Return sequence number for flush about to be sent.
+        """
+        with self.lock:
+            self.seq += 1
+            self.in_flight.append((self.seq, time.monotonic()))
+            return self.seq
+
+    def ack(self, seq):
+        now = time.monotonic()
+        with self.lock:
+            acked = None
+            while self.in_flight and self.in_flight[0][0] <= seq:
+                acked = self.in_flight.popleft()
+            if acked is None or acked[0] != seq:
+                return
+            rtt = now - acked[1]
+            self.rtt = rtt if self.rtt is None else (
+                0.875 * self.rtt + 0.125 * rtt)
+            self.rtt_max = max(self.rtt_max, rtt)
+
+    def expire_acks(self):
+        """
+        Drop flushes not acked in time, return whether link is congested.
+        """
+        if not self.acks:
+            return False
+        min_time = time.monotonic() - self.ack_timeout
+        with self.lock:
+            expired = 0
+            while self.in_flight and self.in_flight[0][1] < min_time:
+                self.in_flight.popleft()
+                expired += 1
+            self.lost += expired
+            return expired > 0 or len(self.in_flight) > self.max_in_flight
+
+    def update(self, depth, flush_time, dropped=0):
+        """
+        Adapt pacing after flush, given queue depth left after it, time
+        flush took and packets client dropped during it.
+        """
+        if (self.expire_acks() or dropped or
+                flush_time > self.interval * self.flush_budget):
+            self.interval = min(self.max_interval, self.interval * 2)
+            self.bundle_size = max(
+                self.min_bundle_size, self.bundle_size // 2)
+            self.flush_size = max(self.min_flush_size, self.flush_size // 2)
+            self.backoffs += 1
+            logger.debug(
+                'Backing off to interval %.1f ms, bundle size %d,'
+                ' flush size %d', self.interval * 1000, self.bundle_size,
+                self.flush_size)
+            return
+
+        self.interval = max(self.min_interval, self.interval - self.step)
+        if depth:
+            self.bundle_size = min(
+                self.max_bundle_size, self.bundle_size + self.bundle_step)
+            self.flush_size = min(
+                self.max_flush_size, self.flush_size + self.flush_step)
+
+    def stats(self):
+        return {
+            'mode': 'adaptive',
+            'interval_ms': self.interval * 1000,
+            'bundle_size': self.bundle_size,
+            'flush_size': self.flush_size,
+            'backoffs': self.backoffs,
+            'in_flight': len(self.in_flight),
+            'lost': self.lost,
+            'rtt_ms': None if self.rtt is None else self.rtt * 1000,
+            'rtt_max_ms': self.rtt_max * 1000,
+        }
+
+
+def create_pacer(cfg, bundle_size):
+    """
+    Return pacer for endpoint, adaptive if its config has pacing section.
+    """
+    interval = cfg.get('send_interval', 0.01)
+    flush_size = cfg.get('flush_size', 256)
+    cfg_pacing = cfg.get('pacing')
+    if cfg_pacing:
+        return AdaptivePacer.from_config(
+            cfg_pacing, interval, bundle_size, flush_size)
+    return FixedPacer(interval, bundle_size, flush_size)
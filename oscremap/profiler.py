@@ -0,0 +1,93 @@
+import logging
+import os
+import signal
+import sys
+import threading
+import time
+from collections import Counter
+
+
+logger = logging.getLogger(__name__)
+
+
+def frame_label(frame):
+    code = frame.f_code
+    return '{} ({}:{})'.format(
+        code.co_name, os.path.basename(code.co_filename), code.co_firstlineno)
+
+
+class SamplingProfiler(object):
+    """
+    Periodically sample stacks of all threads into collapsed stack counts.
+
+    Output file uses format understood by flamegraph.pl and speedscope,
+    each stack starts with name of the thread it was sampled in.
+    """
+
+    def __init__(self, path, rate=100):
+        self.path = path
+        self.interval = 1.0 / rate
+        self.stacks = Counter()
+        self.samples = 0
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(
+            target=self.run, name='profiler', daemon=True)
+
+    def start(self):
+        logger.info('Profiling at %d Hz to %s', 1.0 / self.interval, self.path)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        self.thread.join()
+        self.write()
+
+    def install_signal_handler(self, signum=None):
+        if signum is None:
+            # SIGUSR1 does not exist on Windows
+            signum = getattr(signal, 'SIGUSR1', None)
+            if signum is None:
+                logger.info('No SIGUSR1 on this platform, profile is only'
+                            ' written on exit')
+                return
+        signal.signal(signum, lambda signum, frame: self.write())
+
+    def run(self):
+        own_ident = threading.get_ident()
+        next_time = time.monotonic()
+        while not self.stop_event.is_set():
+            self.sample(own_ident)
+            next_time += self.interval
+            delay = next_time - time.monotonic()
+            if delay > 0:
+                self.stop_event.wait(delay)
+            else:
+                next_time = time.monotonic()
+
+    def sample(self, own_ident):
+        thread_names = {
+            thread.ident: thread.name for thread in threading.enumerate()}
+        samples = []
+        for ident, frame in sys._current_frames().items():
+            if ident == own_ident:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(frame_label(frame))
+                frame = frame.f_back
+            stack.append(thread_names.get(ident, 'thread-{}'.format(ident)))
+            samples.append(';'.join(reversed(stack)))
+
+        with self.lock:
+            self.stacks.update(samples)
+            self.samples += 1
+
+    def write(self):
+        with self.lock:
+            stacks = sorted(self.stacks.items())
+            samples = self.samples
+        with open(self.path, 'w') as f:
+            for stack, count in stacks:
+                f.write('{} {}\n'.format(stack, count))
+        logger.info('Wrote %d samples to %s', samples, self.path)
@@ -3,6 +3,7 @@
 """Main module."""
 
 import logging
+import threading
 import time
 import queue
 
@@ -99,6 +100,11 @@ class ControlWidget(QWidget):
 
         vbox.addWidget(self.name_label)
 
+        self.page_label = QLabel()
+        self.page_label.setAlignment(Qt.AlignCenter)
+
+        vbox.addWidget(self.page_label)
+
         self.parameters_grid = ParametersGrid(rows, cols)
         vbox.addWidget(self.parameters_grid)
 
@@ -117,6 +123,9 @@ class ControlWidget(QWidget):
     def setControlName(self, name):
         self.name_label.setText(name)
 
+    def setPage(self, page):
+        self.page_label.setText('Page {}'.format(page))
+
     def setLearnActive(self, active):
         self.learn_button.setChecked(active)
 
@@ -164,6 +173,8 @@ class MainWindow(QMainWindow):
             self.ctl_widget.setBypassActive(bool(args[0]))
         elif addr == '/fx/name':
             self.ctl_widget.setControlName(args[0])
+        elif addr == '/fx/page':
+            self.ctl_widget.setPage(args[0])
         elif addr.startswith('/fx/param/'):
             fields = addr.split('/')
             target_param = int(fields[-2])
@@ -196,6 +207,7 @@ class MessageServerThread(QThread):
         self.running = False
 
     def run(self):
+        threading.current_thread().name = 'ui-messages'
         self.running = True
         while self.running:
             try:
@@ -244,6 +256,17 @@ def get_app():
     return app
 
 
+def enable_signal_handling(app, interval=250):
+    """
+    Wake the interpreter periodically so Python signal handlers get to run
+    while Qt event loop is blocked in native code.
+    """
+    timer = QTimer(app)
+    timer.timeout.connect(lambda: None)
+    timer.start(interval)
+    return timer
+
+
 def get_window(cfg, recv_queue):
     window = MainWindow(cfg)
     message_server_thread = MessageServerThread(recv_queue)
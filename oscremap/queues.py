@@ -0,0 +1,221 @@
+import threading
+import time
+from collections import OrderedDict, deque
+from queue import Empty
+
+from .midi import CONTROL_CHANGE
+
+
+CLASS_STATE = 'state'
+CLASS_VALUE = 'value'
+CLASS_NAME = 'name'
+CLASS_TEXT = 'text'
+
+# from most to least important
+MESSAGE_CLASSES = (CLASS_STATE, CLASS_VALUE, CLASS_NAME, CLASS_TEXT)
+
+POLICY_NEVER_DROP = 'never_drop'
+POLICY_DROP_OLDEST = 'drop_oldest'
+POLICY_LATEST = 'latest'
+
+DEFAULT_POLICIES = {
+    CLASS_STATE: POLICY_NEVER_DROP,
+    CLASS_VALUE: POLICY_LATEST,
+    CLASS_NAME: POLICY_LATEST,
+    CLASS_TEXT: POLICY_DROP_OLDEST,
+}
+
+DEFAULT_MAXSIZE = 2048
+
+# address of queue entry carrying messages to be sent together
+BUNDLE_ADDRESS = '#bundle'
+
+
+def classify_osc(item):
+    address = item[0]
+    if address.startswith('/fx/param/'):
+        if address.endswith('/val'):
+            return CLASS_VALUE
+        if address.endswith('/name'):
+            return CLASS_NAME
+        return CLASS_TEXT
+    return CLASS_STATE
+
+
+def is_param_item(item):
+    return item[0].startswith('/fx/param/')
+
+
+def osc_key(item):
+    return item[0]
+
+
+def classify_midi(item):
+    if len(item) == 3 and item[0] & 0xF0 == CONTROL_CHANGE:
+        return CLASS_VALUE
+    return CLASS_STATE
+
+
+def midi_key(item):
+    return item[0], item[1]
+
+
+class OverloadQueue(object):
+    """
+    Bounded queue shedding less important messages when full.
+
+    Each message class has policy: never_drop messages are always
+    accepted, latest keeps only newest message per key at position of the
+    oldest one, drop_oldest sheds oldest messages. When full, incoming
+    message sheds the oldest droppable message of least important class
+    not more important than its own, or is dropped itself.
+    """
+
+    def __init__(self, classify, key, maxsize=DEFAULT_MAXSIZE, policies=None):
+        self.classify = classify
+        self.key = key
+        self.maxsize = maxsize
+        self.policies = dict(DEFAULT_POLICIES)
+        if policies:
+            self.policies.update(policies)
+
+        self.cond = threading.Condition()
+        self.items = OrderedDict()
+        self.lanes = {cls: deque() for cls in MESSAGE_CLASSES}
+        self.seq = 0
+
+        self.max_size_seen = 0
+        self.dropped = dict.fromkeys(MESSAGE_CLASSES, 0)
+        self.coalesced = dict.fromkeys(MESSAGE_CLASSES, 0)
+
+    @classmethod
+    def from_config(cls, classify, key, cfg):
+        cfg = cfg or {}
+        return cls(
+            classify, key,
+            maxsize=cfg.get('maxsize', DEFAULT_MAXSIZE),
+            policies=cfg.get('policies'))
+
+    def put(self, item):
+        cls = self.classify(item)
+        policy = self.policies[cls]
+
+        with self.cond:
+            if policy == POLICY_LATEST:
+                entry_key = (cls, self.key(item))
+                entry = self.items.get(entry_key)
+                if entry is not None:
+                    self.items[entry_key] = (entry[0], cls, item)
+                    self.coalesced[cls] += 1
+                    return
+            else:
+                entry_key = self.seq
+
+            if len(self.items) >= self.maxsize and not self.shed(cls):
+                if policy != POLICY_NEVER_DROP:
+                    self.dropped[cls] += 1
+                    return
+
+            seq = self.seq
+            self.seq += 1
+            self.items[entry_key] = (seq, cls, item)
+            self.lanes[cls].append((seq, entry_key))
+            self.max_size_seen = max(self.max_size_seen, len(self.items))
+            self.cond.notify()
+
+    def shed(self, incoming_cls):
+        """
+        Drop oldest message to make room for message of given class.
+        """
+        incoming_idx = MESSAGE_CLASSES.index(incoming_cls)
+        for cls in reversed(MESSAGE_CLASSES[incoming_idx:]):
+            if self.policies[cls] == POLICY_NEVER_DROP:
+                continue
+            lane = self.lanes[cls]
+            while lane:
+                seq, entry_key = lane.popleft()
+                entry = self.items.get(entry_key)
+                if entry is not None and entry[0] == seq:
+                    del self.items[entry_key]
+                    self.dropped[cls] += 1
+                    return True
+        return False
+
+    def wait_items(self, block, timeout):
+        if self.items:
+            return True
+        if not block:
+            return False
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not self.items:
+            remaining = None if deadline is None else (
+                deadline - time.monotonic())
+            if remaining is not None and remaining <= 0:
+                return False
+            self.cond.wait(remaining)
+        return True
+
+    def wait(self, timeout=None):
+        """
+        Block until queue is not empty, return False on timeout.
+        """
+        with self.cond:
+            return self.wait_items(True, timeout)
+
+    def get(self, block=True, timeout=None):
+        with self.cond:
+            if not self.wait_items(block, timeout):
+                raise Empty
+
+            _, (seq, cls, item) = self.items.popitem(last=False)
+            lane = self.lanes[cls]
+            while lane and lane[0][0] <= seq:
+                lane.popleft()
+            return item
+
+    def get_many(self, max_items):
+        """
+        Remove up to max_items messages, more important classes first.
+        """
+        items = []
+        with self.cond:
+            for cls in MESSAGE_CLASSES:
+                lane = self.lanes[cls]
+                while lane and len(items) < max_items:
+                    seq, entry_key = lane.popleft()
+                    entry = self.items.get(entry_key)
+                    if entry is None or entry[0] != seq:
+                        continue
+                    del self.items[entry_key]
+                    items.append(entry[2])
+        return items
+
+    def discard(self, predicate):
+        """
+        Remove queued messages superseded by newer state.
+        """
+        with self.cond:
+            keys = [
+                entry_key for entry_key, (_, _, item) in self.items.items()
+                if predicate(item)]
+            for entry_key in keys:
+                _, cls, _ = self.items.pop(entry_key)
+                self.coalesced[cls] += 1
+            return len(keys)
+
+    def get_nowait(self):
+        return self.get(block=False)
+
+    def qsize(self):
+        return len(self.items)
+
+    def empty(self):
+        return not self.items
+
+    def stats(self):
+        return {
+            'size': len(self.items),
+            'max_size': self.max_size_seen,
+            'dropped': dict(self.dropped),
+            'coalesced': dict(self.coalesced),
+        }
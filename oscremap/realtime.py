@@ -0,0 +1,133 @@
+import logging
+import os
+
+
+logger = logging.getLogger(__name__)
+
+
+POLICIES = {
+    name: getattr(os, const)
+    for name, const in (
+        ('other', 'SCHED_OTHER'),
+        ('batch', 'SCHED_BATCH'),
+        ('idle', 'SCHED_IDLE'),
+        ('fifo', 'SCHED_FIFO'),
+        ('rr', 'SCHED_RR'),
+    )
+    if hasattr(os, const)
+}
+
+POLICY_NAMES = {value: name for name, value in POLICIES.items()}
+
+REALTIME_POLICIES = ('fifo', 'rr')
+
+SUPPORTED = all(
+    hasattr(os, func) for func in (
+        'sched_setscheduler', 'sched_getscheduler', 'sched_getparam',
+        'sched_setaffinity', 'sched_getaffinity'))
+
+
+class ThreadTuner(object):
+    """
+    Apply scheduling policy, priority and CPU affinity per thread role.
+
+    Settings are keyed by thread name, with "default" used for roles
+    without their own entry. Threads are addressed by native id, so
+    settings can be applied from any thread and reapplied on reload.
+    Several threads can share role when registered under their own key.
+    Failures, such as missing privileges for real-time policies, are
+    logged and leave thread with its current settings.
+    """
+
+    def __init__(self, cfg=None):
+        self.cfg = cfg or {}
+        self.threads = {}
+        self.effective = {}
+
+    def settings(self, role):
+        return self.cfg.get(role, self.cfg.get('default'))
+
+    def register(self, role, native_id, key=None):
+        self.threads[role if key is None else key] = (role, native_id)
+        self.apply(role, native_id)
+
+    def unregister(self, key):
+        self.threads.pop(key, None)
+
+    def expect(self, role):
+        """
+        Note role of thread that is registered only once it runs.
+        """
+        if self.settings(role) and role not in self.threads:
+            logger.info('Thread %s scheduling settings will be applied'
+                        ' when it starts running', role)
+            self.effective.setdefault(role, {'pending': True})
+
+    def reload(self, cfg):
+        self.cfg = cfg or {}
+        for role, native_id in list(self.threads.values()):
+            self.apply(role, native_id)
+
+    def apply(self, role, native_id):
+        settings = self.settings(role)
+        if not settings:
+            return
+        if not SUPPORTED:
+            logger.warning(
+                'Thread scheduling settings are not supported on this'
+                ' platform, ignoring settings for %s', role)
+            return
+
+        policy_name = settings.get('policy')
+        if policy_name is not None:
+            self.set_scheduler(role, native_id, policy_name,
+                               settings.get('priority'))
+
+        cpus = settings.get('cpus')
+        if cpus is not None:
+            try:
+                os.sched_setaffinity(native_id, cpus)
+            except OSError as e:
+                logger.warning(
+                    'Cannot set CPU affinity %s for thread %s: %s',
+                    cpus, role, e)
+
+        self.effective[role] = self.read(native_id)
+        logger.info('Thread %s scheduling: %s', role, self.effective[role])
+
+    def set_scheduler(self, role, native_id, policy_name, priority):
+        try:
+            policy = POLICIES[policy_name]
+        except KeyError:
+            logger.warning('Unknown scheduling policy %s for thread %s',
+                           policy_name, role)
+            return
+
+        if policy_name in REALTIME_POLICIES:
+            priority = max(
+                os.sched_get_priority_min(policy),
+                min(priority or 1, os.sched_get_priority_max(policy)))
+        else:
+            priority = 0
+
+        try:
+            os.sched_setscheduler(
+                native_id, policy, os.sched_param(priority))
+        except OSError as e:
+            logger.warning(
+                'Cannot set %s scheduling with priority %d for thread %s,'
+                ' keeping current policy: %s', policy_name, priority, role, e)
+
+    def read(self, native_id):
+        try:
+            policy = os.sched_getscheduler(native_id)
+            return {
+                'policy': POLICY_NAMES.get(policy, policy),
+                'priority': os.sched_getparam(native_id).sched_priority,
+                'cpus': sorted(os.sched_getaffinity(native_id)),
+            }
+        except OSError as e:
+            return {'error': str(e)}
+
+    def stats(self):
+        return dict(self.effective)
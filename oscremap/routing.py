@@ -0,0 +1,80 @@
+from collections import namedtuple
+
+from bidict import bidict, frozenbidict
+
+from .macros import primary_targets
+
+
+class Routing(namedtuple('Routing', [
+        'fx_name', 'source_target_map', 'curves', 'macros',
+        'macro_feedback', 'takeover', 'learn_source', 'learn_target'])):
+    """
+    Immutable snapshot of routing state.
+
+    Snapshot is never modified in place, writers build new one with
+    _replace under lock and swap reference to it, so readers can take
+    reference once per message and use it without locking. Source target
+    map is frozenbidict, curves, macros and takeover dicts are not mutated
+    after creation.
+    """
+
+    __slots__ = ()
+
+    def learned(self):
+        """
+        Return snapshot with learned source mapped to learned target.
+        """
+        source_target_map = bidict(self.source_target_map)
+        source_target_map.forceput(self.learn_source, self.learn_target)
+        # learned mapping replaces macro of the same source
+        macros = {
+            source_param: macro for source_param, macro in self.macros.items()
+            if source_param != self.learn_source
+        }
+        return self._replace(
+            learn_source=None,
+            learn_target=None,
+        ).with_maps(frozenbidict(source_target_map), self.curves, macros,
+                    self.takeover)
+
+    def with_maps(self, source_target_map, curves, macros, takeover):
+        return self._replace(
+            source_target_map=source_target_map,
+            curves=curves,
+            macros=macros,
+            macro_feedback=primary_targets(macros),
+            takeover=takeover)
+
+    def target_source(self, target_param):
+        """
+        Return source param showing target param on controller or None.
+        """
+        source_param = self.source_target_map.inverse.get(target_param)
+        if source_param is None:
+            source_param = self.macro_feedback.get(target_param)
+        return source_param
+
+    def source_feedback(self, source_param):
+        """
+        Return target param and curve providing value of source param.
+        """
+        macro = self.macros.get(source_param)
+        if macro is not None:
+            return macro.primary_target, macro.primary_curve
+        return (self.source_target_map.get(source_param),
+                self.curves.get(source_param))
+
+    def max_source(self):
+        return max(
+            list(self.source_target_map) + list(self.macros), default=None)
+
+
+EMPTY_ROUTING = Routing(
+    fx_name='',
+    source_target_map=frozenbidict(),
+    curves={},
+    macros={},
+    macro_feedback={},
+    takeover={},
+    learn_source=None,
+    learn_target=None)
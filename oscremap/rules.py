@@ -0,0 +1,290 @@
+import logging
+import re
+import string
+
+
+logger = logging.getLogger(__name__)
+
+
+SIDE_DAW = 'daw'
+SIDE_CONTROLLER = 'controller'
+
+SIDES = (SIDE_DAW, SIDE_CONTROLLER)
+
+CAPTURE_RE = re.compile(r'^\{(\w+)(?::(int|float|str))?\}$')
+
+CAPTURE_TYPES = {
+    'int': int,
+    'float': float,
+    'str': str,
+}
+
+ARG_TYPES = {
+    'int': int,
+    'float': float,
+    'str': str,
+    'bool': lambda value: int(bool(value)),
+}
+
+
+class RuleError(Exception):
+    pass
+
+
+class TrieNode(object):
+
+    __slots__ = ('literals', 'captures', 'rules')
+
+    def __init__(self):
+        self.literals = {}
+        self.captures = []
+        self.rules = []
+
+
+def compile_pattern(pattern):
+    """
+    Split address pattern into list of literal strings and
+    (name, converter) captures, "*" captures anonymously.
+    """
+    if not pattern.startswith('/'):
+        raise RuleError('Pattern must start with "/": {}'.format(pattern))
+    segments = []
+    for segment in pattern[1:].split('/'):
+        if segment == '*':
+            segments.append((None, str))
+            continue
+        m = CAPTURE_RE.match(segment)
+        if m is None:
+            segments.append(segment)
+        else:
+            name, type_name = m.groups()
+            segments.append((name, CAPTURE_TYPES[type_name or 'str']))
+    return segments
+
+
+def check_template(template, names):
+    for _, field, _, _ in string.Formatter().parse(template):
+        if field is not None and field not in names:
+            raise RuleError('Unknown capture "{}" in: {}'.format(
+                field, template))
+
+
+def compile_address(template):
+    """
+    Return function of (captures, address) producing output address,
+    missing template keeps incoming address.
+    """
+    if template is None:
+        return lambda captures, address: address
+    if '{' not in template:
+        return lambda captures, address: template
+    return lambda captures, address: template.format_map(captures)
+
+
+def compile_scale(scale, clamp):
+    in_min, in_max, out_min, out_max = (float(x) for x in scale)
+    if in_max == in_min:
+        raise RuleError('Empty input range in scale: {}'.format(scale))
+    factor = (out_max - out_min) / (in_max - in_min)
+    low, high = min(out_min, out_max), max(out_min, out_max)
+
+    if clamp:
+        def scale_value(value):
+            value = out_min + (value - in_min) * factor
+            return low if value < low else high if value > high else value
+    else:
+        def scale_value(value):
+            return out_min + (value - in_min) * factor
+    return scale_value
+
+
+def compile_arg(spec, names):
+    """
+    Return function of (captures, args) producing single output arg.
+    """
+    if isinstance(spec, str):
+        if '{' in spec:
+            check_template(spec, names)
+            return lambda captures, args: spec.format_map(captures)
+        return lambda captures, args: spec
+
+    if not isinstance(spec, dict):
+        return lambda captures, args: spec
+
+    if 'capture' in spec:
+        name = spec['capture']
+        if name not in names:
+            raise RuleError('Unknown capture: {}'.format(name))
+
+        def get_value(captures, args):
+            return captures[name]
+    elif 'arg' in spec:
+        idx = spec['arg']
+
+        def get_value(captures, args):
+            return args[idx]
+    else:
+        raise RuleError('Arg spec needs "arg" or "capture": {}'.format(spec))
+
+    transforms = []
+    if 'scale' in spec:
+        transforms.append(
+            compile_scale(spec['scale'], spec.get('clamp', True)))
+    if 'type' in spec:
+        transforms.append(ARG_TYPES[spec['type']])
+
+    if not transforms:
+        return get_value
+    if len(transforms) == 1:
+        transform = transforms[0]
+        return lambda captures, args: transform(get_value(captures, args))
+
+    def transform_all(captures, args):
+        value = get_value(captures, args)
+        for transform in transforms:
+            value = transform(value)
+        return value
+    return transform_all
+
+
+def compile_send(spec, default_side, names):
+    side = spec.get('to', default_side)
+    if side not in SIDES:
+        raise RuleError('Unknown side: {}'.format(side))
+    if spec.get('address') is not None:
+        check_template(spec['address'], names)
+    build_address = compile_address(spec.get('address'))
+
+    if 'args' not in spec:
+        return lambda captures, address, args: (
+            side, build_address(captures, address), args)
+
+    arg_builders = [
+        compile_arg(arg_spec, names) for arg_spec in spec['args']]
+
+    def build(captures, address, args):
+        return (
+            side,
+            build_address(captures, address),
+            tuple(build_arg(captures, args) for build_arg in arg_builders))
+    return build
+
+
+class Rule(object):
+
+    __slots__ = ('idx', 'source', 'match', 'segments', 'sends', 'passthrough')
+
+    def __init__(self, idx, cfg):
+        self.idx = idx
+        self.source = cfg.get('from', SIDE_DAW)
+        if self.source not in SIDES:
+            raise RuleError('Unknown side: {}'.format(self.source))
+        default_side = cfg.get(
+            'to', SIDE_CONTROLLER if self.source == SIDE_DAW else SIDE_DAW)
+        self.match = cfg['match']
+        self.segments = compile_pattern(self.match)
+        sends = cfg.get('send', [{}])
+        if isinstance(sends, dict):
+            sends = [sends]
+        names = set(
+            segment[0] for segment in self.segments
+            if not isinstance(segment, str))
+        self.sends = [
+            compile_send(send, default_side, names) for send in sends]
+        self.passthrough = cfg.get('continue', False)
+
+    def apply(self, captures, address, args):
+        return [build(captures, address, args) for build in self.sends]
+
+
+class RuleSet(object):
+    """
+    Rewrite rules compiled into per source exact address lookup and
+    segment trie for patterns with captures.
+
+    First matching rule in configuration order wins.
+    """
+
+    def __init__(self, rules_cfg):
+        self.rules = [Rule(idx, cfg) for idx, cfg in enumerate(rules_cfg)]
+        self.exact = {side: {} for side in SIDES}
+        self.tries = {side: TrieNode() for side in SIDES}
+
+        for rule in self.rules:
+            if all(isinstance(segment, str) for segment in rule.segments):
+                self.exact[rule.source].setdefault(rule.match, rule)
+            else:
+                self.add_to_trie(self.tries[rule.source], rule)
+
+        logger.info('Compiled %d rewrite rules', len(self.rules))
+
+    @classmethod
+    def from_config(cls, rules_cfg):
+        if not rules_cfg:
+            return None
+        return cls(rules_cfg)
+
+    def add_to_trie(self, node, rule):
+        for segment in rule.segments:
+            if isinstance(segment, str):
+                node = node.literals.setdefault(segment, TrieNode())
+            else:
+                for capture, child in node.captures:
+                    if capture == segment:
+                        node = child
+                        break
+                else:
+                    child = TrieNode()
+                    node.captures.append((segment, child))
+                    node = child
+        node.rules.append(rule)
+
+    def match_trie(self, node, segments, pos, captures):
+        """
+        Return (rule, captures) of first rule matching segments from pos.
+        """
+        if pos == len(segments):
+            if node.rules:
+                return node.rules[0], captures
+            return None
+
+        segment = segments[pos]
+        best = None
+
+        child = node.literals.get(segment)
+        if child is not None:
+            best = self.match_trie(child, segments, pos + 1, captures)
+
+        for (name, convert), child in node.captures:
+            try:
+                value = convert(segment)
+            except ValueError:
+                continue
+            if name is not None:
+                child_captures = dict(captures)
+                child_captures[name] = value
+            else:
+                child_captures = captures
+            found = self.match_trie(child, segments, pos + 1, child_captures)
+            if found is not None and (best is None or
+                                      found[0].idx < best[0].idx):
+                best = found
+
+        return best
+
+    def route(self, source, address, args):
+        """
+        Return (rule, outputs) for message or None if no rule matches.
+
+        Outputs are list of (side, address, args).
+        """
+        exact = self.exact[source].get(address)
+        found = self.match_trie(
+            self.tries[source], address[1:].split('/'), 0, {})
+
+        if exact is not None and (found is None or exact.idx < found[0].idx):
+            return exact, exact.apply({}, address, args)
+        if found is None:
+            return None
+        rule, captures = found
+        return rule, rule.apply(captures, address, args)
@@ -0,0 +1,69 @@
+import math
+import time
+
+from pythonosc.osc_bundle_builder import IMMEDIATELY
+
+
+class FlushClock(object):
+    """
+    Pace flushes of send loop and measure how late they happen.
+
+    Without latency flushes are only spaced at least interval apart and
+    bundles are sent for immediate execution. With latency flushes are
+    aligned to fixed monotonic tick grid and bundles are stamped with
+    tick time plus latency, so receivers honouring timetags execute them
+    at steady rate as long as flush is not later than latency.
+    """
+
+    def __init__(self, interval, latency=None):
+        self.interval = interval
+        self.latency = latency
+        self.origin = time.monotonic()
+        self.last_flush_time = 0
+
+        self.flushes = 0
+        self.late = 0
+        self.lateness_sum = 0.0
+        self.lateness_max = 0.0
+
+    def next_flush_time(self, now):
+        if self.latency is None:
+            return max(now, self.last_flush_time + self.interval)
+        ticks = math.ceil((now - self.origin) / self.interval)
+        return self.origin + ticks * self.interval
+
+    def wait(self):
+        """
+        Sleep until next flush time, return timetag for flushed bundles.
+        """
+        flush_time = self.next_flush_time(time.monotonic())
+        delay = flush_time - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+        now = time.monotonic()
+        self.last_flush_time = now
+        lateness = now - flush_time
+        self.flushes += 1
+        self.lateness_sum += lateness
+        self.lateness_max = max(self.lateness_max, lateness)
+
+        if self.latency is None:
+            if lateness > self.interval:
+                self.late += 1
+            return IMMEDIATELY
+
+        if lateness > self.latency:
+            self.late += 1
+        return time.time() + (flush_time - now) + self.latency
+
+    def stats(self):
+        return {
+            'mode': 'immediate' if self.latency is None else 'scheduled',
+            'flushes': self.flushes,
+            'late': self.late,
+            'lateness_avg_ms': (
+                self.lateness_sum / self.flushes * 1000
+                if self.flushes else 0.0),
+            'lateness_max_ms': self.lateness_max * 1000,
+        }
@@ -0,0 +1,132 @@
+import struct
+import threading
+
+from pythonosc.osc_message_builder import OscMessageBuilder
+from pythonosc.osc_bundle_builder import IMMEDIATELY
+from pythonosc.parsing import osc_types
+
+
+# safe UDP payload size for typical 1500 bytes MTU
+MAX_BUNDLE_SIZE = 1400
+
+BUNDLE_HEADER_SIZE = 16
+BUNDLE_ELEMENT_HEADER_SIZE = 4
+
+BUNDLE_PREFIX = b'#bundle\x00'
+
+INT = struct.Struct('>i')
+FLOAT = struct.Struct('>f')
+
+INT_MIN = -2 ** 31
+INT_MAX = 2 ** 31 - 1
+
+
+class Packet(object):
+    """
+    Encoded OSC message or bundle.
+
+    Accepted by clients in place of pythonosc messages and bundles, which
+    parse back their own datagram when built.
+    """
+
+    __slots__ = ('dgram',)
+
+    def __init__(self, dgram):
+        self.dgram = dgram
+
+    @property
+    def size(self):
+        return len(self.dgram)
+
+
+def encode_arg(value):
+    kind = type(value)
+    if kind is float:
+        return 'f', FLOAT.pack(value)
+    if kind is str:
+        return 's', osc_types.write_string(value)
+    if kind is int and INT_MIN <= value <= INT_MAX:
+        return 'i', INT.pack(value)
+    return None
+
+
+def build_message(address, values):
+    tags = ','
+    data = []
+    for value in values:
+        encoded = encode_arg(value)
+        if encoded is None:
+            # less common types are left to pythonosc
+            msg_builder = OscMessageBuilder(address=address)
+            for value in values:
+                msg_builder.add_arg(value)
+            return msg_builder.build()
+        tags += encoded[0]
+        data.append(encoded[1])
+    return Packet(b''.join([
+        osc_types.write_string(address), osc_types.write_string(tags)] +
+        data))
+
+
+def build_bundles(msgs, max_size=MAX_BUNDLE_SIZE, timestamp=IMMEDIATELY):
+    """
+    Pack messages into as few bundles as possible, each within max_size.
+    """
+    header = BUNDLE_PREFIX + osc_types.write_date(timestamp)
+    bundles = []
+    parts = [header]
+    size = BUNDLE_HEADER_SIZE
+
+    for msg in msgs:
+        dgram = msg.dgram
+        msg_size = BUNDLE_ELEMENT_HEADER_SIZE + len(dgram)
+        if len(parts) > 1 and size + msg_size > max_size:
+            bundles.append(Packet(b''.join(parts)))
+            parts = [header]
+            size = BUNDLE_HEADER_SIZE
+        parts.append(INT.pack(len(dgram)))
+        parts.append(dgram)
+        size += msg_size
+
+    if len(parts) > 1:
+        bundles.append(Packet(b''.join(parts)))
+
+    return bundles
+
+
+class CoalescingSender(object):
+    """
+    Collect messages keeping only latest value per address and send them
+    as bundles on flush.
+    """
+
+    def __init__(self, client, max_bundle_size=MAX_BUNDLE_SIZE):
+        self.client = client
+        self.max_bundle_size = max_bundle_size
+        self.lock = threading.Lock()
+        self.pending = {}
+        self.sent_messages = 0
+        self.sent_bundles = 0
+
+    def put(self, address, *args):
+        with self.lock:
+            self.pending.pop(address, None)
+            self.pending[address] = args
+
+    def flush(self):
+        with self.lock:
+            pending = self.pending
+            self.pending = {}
+
+        if not pending:
+            return
+
+        msgs = [
+            build_message(address, args) for address, args in pending.items()]
+        self.send(msgs)
+
+    def send(self, msgs):
+        for bundle in build_bundles(msgs, self.max_bundle_size):
+            self.client.send(bundle)
+            self.sent_bundles += 1
+        self.sent_messages += len(msgs)
@@ -0,0 +1,155 @@
+import logging
+import math
+import threading
+import time
+
+
+logger = logging.getLogger(__name__)
+
+
+SMOOTHING_ONE_POLE = 'one_pole'
+SMOOTHING_LINEAR = 'linear'
+
+
+class ParamSmoother(object):
+    """
+    Interpolate parameter values toward their targets at fixed tick rate.
+
+    Each tick passes list of (param, value) for params that moved by at
+    least resolution since last emitted value, or settled on target, to
+    emit. Ticking stops while all params are settled.
+    """
+
+    def __init__(self, emit, mode=SMOOTHING_ONE_POLE, ramp_time=0.05,
+                 rate=50, epsilon=1 / 4096.0, resolution=1 / 127.0):
+        if mode not in (SMOOTHING_ONE_POLE, SMOOTHING_LINEAR):
+            raise ValueError('Unknown smoothing mode: {}'.format(mode))
+
+        self.emit = emit
+        self.mode = mode
+        self.interval = 1.0 / rate
+        self.ticks = max(1.0, ramp_time * rate)
+        self.coef = 1.0 - math.exp(-1.0 / self.ticks)
+        self.epsilon = epsilon
+        self.resolution = resolution
+
+        self.lock = threading.Lock()
+        self.current = {}
+        self.targets = {}
+        self.steps = {}
+        self.emitted = {}
+
+        self.wake_event = threading.Event()
+        self.running = False
+        self.thread = threading.Thread(
+            target=self.run, name='param-smoother', daemon=True)
+
+    @classmethod
+    def from_config(cls, emit, cfg):
+        return cls(
+            emit,
+            mode=cfg.get('mode', SMOOTHING_ONE_POLE),
+            ramp_time=cfg.get('time', 0.05),
+            rate=cfg.get('rate', 50),
+            resolution=cfg.get('resolution', 1 / 127.0))
+
+    def start(self):
+        logger.info('Smoothing params with %s mode at %d Hz',
+                    self.mode, 1.0 / self.interval)
+        self.running = True
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        self.wake_event.set()
+
+    def observe(self, param, value):
+        """
+        Track value reported by DAW as starting point of next ramp.
+        """
+        with self.lock:
+            if param not in self.targets:
+                self.current[param] = value
+                self.emitted[param] = value
+
+    def clear(self):
+        """
+        Forget all params, stopping ramps in progress.
+        """
+        with self.lock:
+            self.current.clear()
+            self.targets.clear()
+            self.steps.clear()
+            self.emitted.clear()
+
+    def set_target(self, param, value):
+        with self.lock:
+            current = self.current.get(param)
+            if current is None:
+                # nothing to interpolate from, jump straight to value
+                self.current[param] = value
+                self.emitted[param] = value
+                jump = True
+            else:
+                self.targets[param] = value
+                self.steps[param] = abs(value - current) / self.ticks
+                jump = False
+
+        if jump:
+            self.emit([(param, value)])
+        else:
+            self.wake_event.set()
+
+    def run(self):
+        while self.running:
+            self.wake_event.wait()
+            next_time = time.monotonic()
+            while self.running and self.tick():
+                next_time += self.interval
+                delay = next_time - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                else:
+                    next_time = time.monotonic()
+
+    def tick(self):
+        """
+        Advance all active params one step, return whether any remain.
+        """
+        updates = []
+        with self.lock:
+            for param, target in list(self.targets.items()):
+                current = self.current[param]
+                if self.mode == SMOOTHING_ONE_POLE:
+                    current += (target - current) * self.coef
+                else:
+                    step = self.steps[param]
+                    if current < target:
+                        current = min(target, current + step)
+                    else:
+                        current = max(target, current - step)
+
+                settled = abs(target - current) < self.epsilon
+                if settled:
+                    current = target
+                    del self.targets[param]
+                    del self.steps[param]
+                self.current[param] = current
+
+                # steps finer than resolution would only add packets
+                emitted = self.emitted.get(param)
+                if emitted is None or (
+                        abs(current - emitted) >= self.resolution or
+                        settled and current != emitted):
+                    self.emitted[param] = current
+                    updates.append((param, current))
+
+            if not self.targets:
+                self.wake_event.clear()
+
+            # emitted under lock, so nothing computed before clear is
+            # sent after it
+            if updates:
+                self.emit(updates)
+
+            return bool(self.targets)
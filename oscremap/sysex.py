@@ -0,0 +1,129 @@
+import threading
+import time
+
+
+SYSEX_START = 0xF0
+SYSEX_END = 0xF7
+
+# non-commercial manufacturer id
+DEFAULT_HEADER = (0x7D,)
+
+CMD_TEXT = 0x01
+
+FIELD_NAME = 'name'
+FIELD_STR = 'str'
+
+FIELD_CODES = {
+    FIELD_NAME: 0x00,
+    FIELD_STR: 0x01,
+}
+
+
+def encode_text(text, width):
+    return list(str(text)[:width].encode('ascii', 'replace'))
+
+
+class SysExDisplay(object):
+    """
+    Send param names and value strings to midi controller as SysEx.
+
+    Keeps texts device already shows per slot and field, so only changed
+    ones are sent. Changes are collected for delay and then packed into
+    as few messages as fit max size:
+
+        F0 <header> 01 (<slot> <field> <length> <ascii>...)... F7
+
+    Field is 0 for name and 1 for value string, texts are truncated to
+    width.
+    """
+
+    def __init__(self, header=DEFAULT_HEADER, width=16, max_size=256,
+                 delay=0.02):
+        self.header = list(header)
+        self.width = width
+        self.max_size = max_size
+        self.delay = delay
+
+        self.lock = threading.Lock()
+        self.shown = {}
+        self.pending = {}
+        self.pending_time = None
+
+        self.messages = 0
+        self.texts = 0
+        self.bytes = 0
+        self.cached = 0
+
+    @classmethod
+    def from_config(cls, cfg):
+        return cls(
+            header=cfg.get('header', DEFAULT_HEADER),
+            width=cfg.get('width', 16),
+            max_size=cfg.get('max_size', 256),
+            delay=cfg.get('delay', 0.02))
+
+    def reset(self):
+        """
+        Forget what device shows, so all texts are sent again.
+        """
+        with self.lock:
+            self.shown.clear()
+
+    def update(self, texts):
+        """
+        Queue (slot, field, text) updates not already shown on device.
+        """
+        with self.lock:
+            for slot, field, text in texts:
+                key = slot, FIELD_CODES[field]
+                data = encode_text(text, self.width)
+                if self.shown.get(key) == data:
+                    self.cached += 1
+                    self.pending.pop(key, None)
+                    continue
+                self.pending[key] = data
+            if not self.pending:
+                # texts changed and reverted before flush
+                self.pending_time = None
+            elif self.pending_time is None:
+                self.pending_time = time.monotonic()
+
+    def flush(self):
+        """
+        Return SysEx messages of changes collected for at least delay.
+        """
+        with self.lock:
+            if (self.pending_time is None or
+                    time.monotonic() - self.pending_time < self.delay):
+                return []
+            cells = sorted(self.pending.items())
+            self.shown.update(self.pending)
+            self.pending.clear()
+            self.pending_time = None
+        if not cells:
+            return []
+
+        prefix = [SYSEX_START] + self.header + [CMD_TEXT]
+        msgs = []
+        msg = list(prefix)
+        for (slot, field_code), data in cells:
+            cell = [slot & 0x7F, field_code, len(data)] + data
+            if (len(msg) > len(prefix) and
+                    len(msg) + len(cell) + 1 > self.max_size):
+                msgs.append(msg + [SYSEX_END])
+                msg = list(prefix)
+            msg.extend(cell)
+        msgs.append(msg + [SYSEX_END])
+
+        self.messages += len(msgs)
+        self.texts += len(cells)
+        self.bytes += sum(len(msg) for msg in msgs)
+        return msgs
+
+    def stats(self):
+        return {
+            'messages': self.messages,
+            'texts': self.texts,
+            'bytes': self.bytes,
+            'cached': self.cached,
+        }
@@ -0,0 +1,96 @@
+TAKEOVER_OFF = 'off'
+TAKEOVER_PICKUP = 'pickup'
+TAKEOVER_SCALE = 'scale'
+
+TAKEOVER_MODES = (TAKEOVER_OFF, TAKEOVER_PICKUP, TAKEOVER_SCALE)
+
+
+class SoftTakeover(object):
+    """
+    Keep absolute controller knobs from jumping DAW params.
+
+    Positions and values are in controller range 0-1. Until knob of
+    source param is picked up, pickup mode ignores it until it reaches or
+    crosses DAW value, scale mode moves value by knob travel scaled so
+    that both reach the end of range together. State is kept per source
+    param and dropped when knobs stop matching their params, on FX or
+    page change and when DAW value changes from elsewhere.
+    """
+
+    def __init__(self, default_mode=TAKEOVER_OFF, tolerance=1.5 / 127):
+        check_mode(default_mode)
+        self.default_mode = default_mode
+        self.tolerance = tolerance
+        # source param -> [picked up, last position, scaled value]
+        self.states = {}
+        self.ignored = 0
+        self.scaled = 0
+
+    def reset(self):
+        self.states.clear()
+
+    def release(self, source_param):
+        self.states.pop(source_param, None)
+
+    def filter(self, mode, source_param, position, value):
+        """
+        Return position to send for knob position or None to ignore it.
+
+        Value is current DAW value of source param, None if not known.
+        """
+        if mode is None:
+            mode = self.default_mode
+        if mode == TAKEOVER_OFF or value is None:
+            return position
+
+        try:
+            state = self.states[source_param]
+        except KeyError:
+            state = self.states[source_param] = [False, None, value]
+        picked, last, scaled_value = state
+
+        if picked:
+            return position
+        if abs(position - value) <= self.tolerance or (
+                mode == TAKEOVER_PICKUP and last is not None and
+                (last - value) * (position - value) <= 0):
+            state[0] = True
+            return position
+        state[1] = position
+
+        if mode == TAKEOVER_PICKUP or last is None or position == last:
+            self.ignored += 1
+            return None
+
+        if position > last:
+            scaled_value += (
+                (position - last) * (1.0 - scaled_value) / (1.0 - last))
+        else:
+            scaled_value -= (last - position) * scaled_value / last
+        state[2] = scaled_value
+        if abs(position - scaled_value) <= self.tolerance:
+            state[0] = True
+        self.scaled += 1
+        return scaled_value
+
+    def stats(self):
+        return {
+            'ignored': self.ignored,
+            'scaled': self.scaled,
+        }
+
+
+def check_mode(mode):
+    if mode not in TAKEOVER_MODES:
+        raise ValueError('Unknown takeover mode: {}'.format(mode))
+    return mode
+
+
+def load_takeover(cfg):
+    """
+    Build takeover modes keyed by source param from fx map file section.
+    """
+    return {
+        int(source_param): check_mode(mode)
+        for source_param, mode in (cfg or {}).items()
+    }
@@ -0,0 +1,542 @@
+import logging
+import os
+import select
+import socket
+import socketserver
+import stat
+import struct
+import sys
+import threading
+import time
+
+from pythonosc import osc_packet, udp_client
+
+from .sender import MAX_BUNDLE_SIZE, build_message
+
+
+logger = logging.getLogger(__name__)
+
+
+TRANSPORT_UDP = 'udp'
+TRANSPORT_TCP = 'tcp'
+
+# host prefix selecting unix datagram socket at given path
+UNIX_PREFIX = 'unix:'
+
+# bundles sent over stream or unix socket are not limited by MTU
+STREAM_BUNDLE_SIZE = 64 * 1024
+
+# not exported by socket module
+SO_RXQ_OVFL = 40
+DROP_COUNTER = struct.Struct('I')
+
+SLIP_END = b'\xc0'
+SLIP_ESC = b'\xdb'
+SLIP_ESC_END = b'\xdb\xdc'
+SLIP_ESC_ESC = b'\xdb\xdd'
+
+
+def slip_encode(data):
+    """
+    Frame packet with double END encoding used by OSC 1.1 over streams.
+    """
+    data = data.replace(SLIP_ESC, SLIP_ESC_ESC).replace(SLIP_END, SLIP_ESC_END)
+    return SLIP_END + data + SLIP_END
+
+
+class SLIPDecoder(object):
+
+    def __init__(self):
+        self.buffer = b''
+
+    def feed(self, data):
+        """
+        Add received bytes and return list of completed packets.
+        """
+        frames = (self.buffer + data).split(SLIP_END)
+        self.buffer = frames.pop()
+        return [
+            frame.replace(SLIP_ESC_END, SLIP_END)
+                 .replace(SLIP_ESC_ESC, SLIP_ESC)
+            for frame in frames if frame
+        ]
+
+
+def unix_path(host):
+    """
+    Return socket path if host names unix socket endpoint, else None.
+    """
+    if host.startswith(UNIX_PREFIX):
+        return host[len(UNIX_PREFIX):]
+    return None
+
+
+def describe_endpoint(cfg, host_key, port_key):
+    host = cfg[host_key]
+    if unix_path(host) is not None:
+        return host
+    return '{}:{}'.format(host, cfg.get(port_key))
+
+
+def peer_endpoint(cfg):
+    """
+    Return endpoint config with listen and remote sides swapped, for
+    tools standing in for peer of proxy.
+    """
+    peer_cfg = dict(cfg)
+    peer_cfg['listen_ip'] = cfg['remote_ip']
+    peer_cfg['listen_port'] = cfg.get('remote_port')
+    peer_cfg['remote_ip'] = cfg['listen_ip']
+    peer_cfg['remote_port'] = cfg.get('listen_port')
+    return peer_cfg
+
+
+def is_bulk_address(address):
+    return address.endswith('/name') or address.endswith('/str')
+
+
+class UDPClient(udp_client.SimpleUDPClient):
+
+    dropped = 0
+
+    def send(self, content):
+        # socket may be closed under sender when client is replaced
+        try:
+            super(UDPClient, self).send(content)
+        except OSError:
+            self.dropped += 1
+
+    def send_many(self, contents):
+        for content in contents:
+            self.send(content)
+
+    def close(self):
+        self._sock.close()
+
+
+class UnixDatagramClient(object):
+    """
+    OSC client sending datagrams to unix socket of peer on the same host.
+
+    Packets sent while peer is not listening or its receive queue is full
+    are dropped rather than blocking sender.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self.sock.setblocking(False)
+        self.dropped = 0
+
+    def send(self, content):
+        try:
+            self.sock.sendto(content.dgram, self.path)
+        except OSError:
+            self.dropped += 1
+
+    def send_many(self, contents):
+        for content in contents:
+            self.send(content)
+
+    def send_message(self, address, value):
+        if not isinstance(value, (list, tuple)):
+            value = [value]
+        self.send(build_message(address, value))
+
+    def close(self):
+        self.sock.close()
+
+
+class SLIPTCPClient(object):
+    """
+    OSC client sending SLIP framed packets over TCP connection.
+
+    Sends only queue data for writer thread, which connects on first
+    send, reconnects after errors and writes to socket, so callers never
+    block on slow or unreachable peer. Packets queued while peer is
+    unreachable or over max pending bytes are dropped. Closed client
+    stays closed, so sender still holding it never reconnects.
+    """
+
+    def __init__(self, address, port, reconnect_interval=1.0,
+                 max_pending=1024 * 1024):
+        self._address = address
+        self._port = port
+        self.reconnect_interval = reconnect_interval
+        self.max_pending = max_pending
+        self.sock = None
+        self.last_connect_time = None
+        self.cond = threading.Condition()
+        self.pending = []
+        self.pending_bytes = 0
+        self.pending_count = 0
+        self.thread = None
+        self.closed = False
+        self.dropped = 0
+
+    def connect(self):
+        now = time.monotonic()
+        if (self.last_connect_time is not None and
+                now - self.last_connect_time < self.reconnect_interval):
+            return False
+        self.last_connect_time = now
+        try:
+            sock = socket.create_connection(
+                (self._address, self._port), timeout=self.reconnect_interval)
+        except OSError as e:
+            logger.info('Cannot connect to {}:{}: {}'.format(
+                self._address, self._port, e))
+            return False
+        sock.settimeout(None)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.sock = sock
+        logger.info('Connected to {}:{}'.format(self._address, self._port))
+        return True
+
+    def run(self):
+        while True:
+            with self.cond:
+                while not self.pending and not self.closed:
+                    self.cond.wait()
+                if self.closed:
+                    break
+                data = b''.join(self.pending)
+                count = self.pending_count
+                self.pending = []
+                self.pending_bytes = 0
+                self.pending_count = 0
+
+            if self.sock is None and not self.connect():
+                self.drop(count)
+                continue
+            try:
+                self.sock.sendall(data)
+            except OSError as e:
+                logger.info('Connection to {}:{} lost: {}'.format(
+                    self._address, self._port, e))
+                self.sock.close()
+                self.sock = None
+                self.drop(count)
+
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+
+    def drop(self, count):
+        with self.cond:
+            self.dropped += count
+
+    def send_many(self, contents):
+        """
+        Queue messages or bundles to be sent in single write.
+        """
+        data = b''.join(slip_encode(content.dgram) for content in contents)
+        with self.cond:
+            if (self.closed or
+                    self.pending_bytes + len(data) > self.max_pending):
+                self.dropped += len(contents)
+                return
+            if self.thread is None:
+                self.thread = threading.Thread(
+                    target=self.run, name='tcp-sender', daemon=True)
+                self.thread.start()
+            self.pending.append(data)
+            self.pending_bytes += len(data)
+            self.pending_count += len(contents)
+            self.cond.notify()
+
+    def send(self, content):
+        self.send_many([content])
+
+    def send_message(self, address, value):
+        if not isinstance(value, (list, tuple)):
+            value = [value]
+        self.send(build_message(address, value))
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.cond.notify()
+            self.dropped += self.pending_count
+            self.pending = []
+            self.pending_bytes = 0
+            self.pending_count = 0
+
+
+class BatchOSCUDPServer(object):
+    """
+    OSC UDP server draining all pending datagrams on each wakeup.
+
+    Datagrams are received into preallocated buffer, parsed and
+    dispatched batch by batch. With coalesce enabled, repeated values for
+    the same address within batch are coalesced to the latest one, never
+    across other messages in between. Kernel drops are counted where
+    platform reports them (Linux SO_RXQ_OVFL).
+    """
+
+    tap = None
+
+    def __init__(self, server_address, dispatcher, rcvbuf=None,
+                 max_batch=256, max_packet_size=65536,
+                 family=socket.AF_INET, coalesce=False):
+        self.dispatcher = dispatcher
+        self.max_batch = max_batch
+        self.coalesce = coalesce
+
+        self.socket = socket.socket(family, socket.SOCK_DGRAM)
+        if rcvbuf:
+            self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, rcvbuf)
+        self.rcvbuf = self.socket.getsockopt(
+            socket.SOL_SOCKET, socket.SO_RCVBUF)
+
+        self.report_drops = False
+        if sys.platform.startswith('linux'):
+            try:
+                self.socket.setsockopt(socket.SOL_SOCKET, SO_RXQ_OVFL, 1)
+            except OSError:
+                pass
+            else:
+                self.report_drops = True
+
+        self.unix_path = None
+        if family == socket.AF_UNIX:
+            # stale socket file left by previous run would fail bind,
+            # anything else at the path is not ours to remove
+            try:
+                mode = os.stat(server_address).st_mode
+            except FileNotFoundError:
+                pass
+            else:
+                if not stat.S_ISSOCK(mode):
+                    self.socket.close()
+                    raise FileExistsError(
+                        'Cannot listen on {}, it exists and is not a'
+                        ' socket'.format(server_address))
+                os.unlink(server_address)
+            self.unix_path = server_address
+
+        self.socket.bind(server_address)
+        self.socket.setblocking(False)
+        self.server_address = self.socket.getsockname()
+
+        self.buffer = bytearray(max_packet_size)
+        self.buffer_view = memoryview(self.buffer)
+        self.ancbufsize = socket.CMSG_SPACE(DROP_COUNTER.size)
+
+        self.wakeup_recv, self.wakeup_send = socket.socketpair()
+        self.running = False
+        self.stopped = threading.Event()
+
+        self.received = 0
+        self.batches = 0
+        self.max_batch_seen = 0
+        self.coalesced = 0
+        self.parse_errors = 0
+        self.kernel_drops = 0
+
+    def serve_forever(self):
+        self.running = True
+        self.stopped.clear()
+        try:
+            while self.running:
+                readable, _, _ = select.select(
+                    [self.socket, self.wakeup_recv], [], [])
+                if self.socket in readable:
+                    self.handle_batch(self.drain())
+        finally:
+            self.stopped.set()
+
+    def drain(self):
+        packets = []
+        buffer_view = self.buffer_view
+        while len(packets) < self.max_batch:
+            try:
+                if self.report_drops:
+                    size, ancdata, _, client_address = \
+                        self.socket.recvmsg_into(
+                            [buffer_view], self.ancbufsize)
+                    for level, kind, data in ancdata:
+                        if level == socket.SOL_SOCKET and kind == SO_RXQ_OVFL:
+                            self.kernel_drops = DROP_COUNTER.unpack(data)[0]
+                else:
+                    size, client_address = self.socket.recvfrom_into(
+                        buffer_view)
+            except (BlockingIOError, InterruptedError):
+                break
+            packets.append((bytes(buffer_view[:size]), client_address))
+        return packets
+
+    def handle_batch(self, packets):
+        if not packets:
+            return
+        self.received += len(packets)
+        self.batches += 1
+        self.max_batch_seen = max(self.max_batch_seen, len(packets))
+
+        messages = []
+        for data, client_address in packets:
+            if self.tap is not None:
+                self.tap(data)
+            try:
+                packet = osc_packet.OscPacket(data)
+            except osc_packet.ParseError:
+                self.parse_errors += 1
+                continue
+            for timed_msg in packet.messages:
+                messages.append((client_address, timed_msg.message))
+
+        superseded = set()
+        if self.coalesce:
+            later_values = set()
+            for idx in range(len(messages) - 1, -1, -1):
+                address = messages[idx][1].address
+                if not address.endswith('/val'):
+                    # value before e.g. FX change belongs to other state
+                    later_values.clear()
+                elif address in later_values:
+                    superseded.add(idx)
+                else:
+                    later_values.add(address)
+
+        dispatcher = self.dispatcher
+        for idx, (client_address, message) in enumerate(messages):
+            address = message.address
+            if idx in superseded:
+                self.coalesced += 1
+                continue
+            for handler in dispatcher.handlers_for_address(address):
+                try:
+                    handler.invoke(client_address, message)
+                except Exception:
+                    logger.exception('Handling %s failed', address)
+
+    def shutdown(self):
+        self.running = False
+        self.wakeup_send.send(b'\0')
+        self.stopped.wait()
+
+    def server_close(self):
+        self.socket.close()
+        self.wakeup_recv.close()
+        self.wakeup_send.close()
+        if self.unix_path is not None and os.path.exists(self.unix_path):
+            os.unlink(self.unix_path)
+
+    def stats(self):
+        return {
+            'received': self.received,
+            'batches': self.batches,
+            'max_batch': self.max_batch_seen,
+            'coalesced': self.coalesced,
+            'parse_errors': self.parse_errors,
+            'kernel_drops': (
+                self.kernel_drops if self.report_drops else None),
+            'rcvbuf': self.rcvbuf,
+        }
+
+
+class _SLIPTCPHandler(socketserver.BaseRequestHandler):
+
+    def handle(self):
+        server = self.server
+        if server.on_handler_thread is None:
+            self.receive()
+            return
+        thread = threading.current_thread()
+        server.on_handler_thread(thread, True)
+        try:
+            self.receive()
+        finally:
+            server.on_handler_thread(thread, False)
+
+    def receive(self):
+        decoder = SLIPDecoder()
+        server = self.server
+        while True:
+            try:
+                data = self.request.recv(65536)
+            except OSError:
+                return
+            if not data:
+                return
+            for packet in decoder.feed(data):
+                server.received += 1
+                if server.tap is not None:
+                    server.tap(packet)
+                server.dispatcher.call_handlers_for_packet(
+                    packet, self.client_address)
+
+
+class SLIPTCPServer(socketserver.ThreadingTCPServer):
+    """
+    OSC server accepting SLIP framed packets over TCP connections.
+    """
+
+    allow_reuse_address = True
+    daemon_threads = True
+
+    tap = None
+    # called with (thread, True) by each connection handler thread when
+    # it starts and with (thread, False) when connection ends
+    on_handler_thread = None
+
+    def __init__(self, server_address, dispatcher):
+        self.dispatcher = dispatcher
+        self.received = 0
+        super(SLIPTCPServer, self).__init__(server_address, _SLIPTCPHandler)
+
+    def stats(self):
+        return {
+            'received': self.received,
+        }
+
+
+def create_osc_client(cfg):
+    path = unix_path(cfg['remote_ip'])
+    if path is not None:
+        return UnixDatagramClient(path)
+    transport = cfg.get('transport', TRANSPORT_UDP)
+    if transport == TRANSPORT_TCP:
+        return SLIPTCPClient(cfg['remote_ip'], cfg['remote_port'])
+    elif transport == TRANSPORT_UDP:
+        return UDPClient(cfg['remote_ip'], cfg['remote_port'])
+    raise ValueError('Unknown OSC transport: {}'.format(transport))
+
+
+def create_osc_server(cfg, dispatcher):
+    path = unix_path(cfg['listen_ip'])
+    if path is not None:
+        return BatchOSCUDPServer(
+            path, dispatcher,
+            rcvbuf=cfg.get('rcvbuf'),
+            max_batch=cfg.get('max_batch', 256),
+            family=socket.AF_UNIX,
+            coalesce=cfg.get('coalesce', False))
+    transport = cfg.get('transport', TRANSPORT_UDP)
+    server_address = (cfg['listen_ip'], cfg['listen_port'])
+    if transport == TRANSPORT_TCP:
+        return SLIPTCPServer(server_address, dispatcher)
+    elif transport == TRANSPORT_UDP:
+        return BatchOSCUDPServer(
+            server_address, dispatcher,
+            rcvbuf=cfg.get('rcvbuf'),
+            max_batch=cfg.get('max_batch', 256),
+            coalesce=cfg.get('coalesce', False))
+    raise ValueError('Unknown OSC transport: {}'.format(transport))
+
+
+def max_bundle_size(cfg):
+    if (cfg.get('transport', TRANSPORT_UDP) == TRANSPORT_TCP or
+            unix_path(cfg['remote_ip']) is not None):
+        return STREAM_BUNDLE_SIZE
+    return cfg.get('max_bundle_size', MAX_BUNDLE_SIZE)
+
+
+def create_bulk_osc_client(cfg):
+    """
+    Return TCP client for bulk text updates if endpoint has one configured.
+    """
+    bulk_port = cfg.get('bulk_remote_port')
+    if bulk_port is None or unix_path(cfg['remote_ip']) is not None:
+        return None
+    return SLIPTCPClient(cfg['remote_ip'], bulk_port)
@@ -0,0 +1,152 @@
+import ctypes
+import ctypes.util
+import logging
+import os
+import select
+import struct
+import threading
+
+
+logger = logging.getLogger(__name__)
+
+
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+
+INOTIFY_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+
+INOTIFY_EVENT = struct.Struct('iIII')
+
+
+def load_inotify():
+    """
+    Return libc with inotify functions or None if not available.
+    """
+    libc_name = ctypes.util.find_library('c')
+    if libc_name is None:
+        return None
+    try:
+        libc = ctypes.CDLL(libc_name, use_errno=True)
+        libc.inotify_init
+        libc.inotify_add_watch
+    except (OSError, AttributeError):
+        return None
+    return libc
+
+
+class FileWatcher(object):
+    """
+    Watch files for changes and invoke callback with changed path.
+
+    Uses inotify on directories containing watched files where available
+    and falls back to mtime polling otherwise.
+    """
+
+    def __init__(self, callback, poll_interval=1.0, settle_time=0.2):
+        self.callback = callback
+        self.poll_interval = poll_interval
+        self.settle_time = settle_time
+        self.paths = set()
+        self.poll_stats = {}
+        self.dir_watches = {}
+        self.running = False
+        self.thread = threading.Thread(
+            target=self.run, name='config-watcher', daemon=True)
+
+        self.libc = load_inotify()
+        self.inotify_fd = None
+        if self.libc is not None:
+            fd = self.libc.inotify_init()
+            if fd >= 0:
+                self.inotify_fd = fd
+
+        logger.info('File watcher using %s',
+                    'inotify' if self.inotify_fd is not None else 'polling')
+
+    def add(self, path):
+        path = os.path.abspath(path)
+        self.paths.add(path)
+        dir_path = os.path.dirname(path)
+
+        if self.inotify_fd is not None and dir_path not in self.dir_watches:
+            wd = self.libc.inotify_add_watch(
+                self.inotify_fd, dir_path.encode(), INOTIFY_MASK)
+            if wd >= 0:
+                self.dir_watches[dir_path] = wd
+                return
+            logger.info('Cannot watch %s with inotify, polling instead',
+                        dir_path)
+
+        if dir_path not in self.dir_watches:
+            self.poll_stats[path] = self.stat(path)
+
+    def stat(self, path):
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def start(self):
+        self.running = True
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+
+    def run(self):
+        while self.running:
+            changed = set()
+            if self.inotify_fd is not None and self.dir_watches:
+                changed.update(self.read_inotify(self.poll_interval))
+            else:
+                select.select([], [], [], self.poll_interval)
+            changed.update(self.poll())
+
+            if not changed:
+                continue
+
+            # editors tend to write files in several steps
+            select.select([], [], [], self.settle_time)
+            if self.inotify_fd is not None and self.dir_watches:
+                changed.update(self.read_inotify(0))
+
+            for path in sorted(changed):
+                logger.info('Detected change of %s', path)
+                try:
+                    self.callback(path)
+                except Exception:
+                    logger.exception('Reloading %s failed', path)
+
+    def read_inotify(self, timeout):
+        readable, _, _ = select.select([self.inotify_fd], [], [], timeout)
+        if not readable:
+            return set()
+
+        data = os.read(self.inotify_fd, 64 * 1024)
+        wd_dirs = {wd: dir_path for dir_path, wd in self.dir_watches.items()}
+        changed = set()
+        offset = 0
+        while offset < len(data):
+            wd, mask, cookie, length = INOTIFY_EVENT.unpack_from(data, offset)
+            offset += INOTIFY_EVENT.size
+            name = data[offset:offset + length].rstrip(b'\0').decode()
+            offset += length
+            dir_path = wd_dirs.get(wd)
+            if dir_path is None:
+                continue
+            path = os.path.join(dir_path, name)
+            if path in self.paths:
+                changed.add(path)
+        return changed
+
+    def poll(self):
+        changed = set()
+        for path, old_stat in self.poll_stats.items():
+            new_stat = self.stat(path)
+            if new_stat != old_stat:
+                self.poll_stats[path] = new_stat
+                changed.add(path)
+        return changed
@@ -16,11 +16,16 @@ requirements = [
     'bidict',
     'mido',
     'python-rtmidi',
-    'python-osc>=1.7.0',
+    'python-osc>=1.8.0',
     'PySide2',
     'PyYAML',
 ]
 
+extras_requirements = {
+    'morph': ['numpy'],
+    'modulation': ['numpy'],
+}
+
 setup_requirements = [
     'pytest-runner',
 ]
@@ -52,6 +57,7 @@ setup(
         ],
     },
     install_requires=requirements,
+    extras_require=extras_requirements,
     license="MIT license",
     long_description=readme + '\n\n' + history,
     include_package_data=True,
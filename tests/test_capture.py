@@ -0,0 +1,38 @@
+"""Tests for `oscremap.capture`."""
+
+import pytest
+
+from oscremap.capture import (
+    SOURCE_CTL_MIDI, SOURCE_DAW_OSC, CaptureWriter, read_capture)
+
+
+def test_round_trip(tmp_path):
+    path = str(tmp_path / 'session.cap')
+    writer = CaptureWriter(path)
+    writer.record(SOURCE_DAW_OSC, b'/fx/name\x00\x00\x00\x00')
+    writer.record(SOURCE_CTL_MIDI, bytes([0xB0, 1, 64]))
+    writer.close()
+
+    records = list(read_capture(path))
+    assert [(source, data) for _, source, data in records] == [
+        (SOURCE_DAW_OSC, b'/fx/name\x00\x00\x00\x00'),
+        (SOURCE_CTL_MIDI, bytes([0xB0, 1, 64]))]
+    assert records[0][0] <= records[1][0]
+
+
+def test_packet_over_64k(tmp_path):
+    path = str(tmp_path / 'session.cap')
+    data = bytes(70000)
+    writer = CaptureWriter(path, flush_interval=0.01)
+    writer.start()
+    writer.record(SOURCE_DAW_OSC, data)
+    writer.close()
+
+    assert [record[2] for record in read_capture(path)] == [data]
+
+
+def test_rejects_other_files(tmp_path):
+    path = tmp_path / 'session.cap'
+    path.write_bytes(bytes(64))
+    with pytest.raises(ValueError):
+        list(read_capture(str(path)))
@@ -0,0 +1,44 @@
+"""Tests for `oscremap.curves`."""
+
+import pytest
+
+from oscremap.curves import Curve, invert_table, load_curves
+
+
+def test_invert_table_increasing():
+    assert invert_table([0.0, 0.5, 1.0], 4) == [0.0, 0.25, 0.5, 0.75, 1.0]
+
+
+def test_invert_table_decreasing():
+    assert invert_table([1.0, 0.5, 0.0], 2) == [1.0, 0.5, 0.0]
+
+
+def test_invert_table_clamps_outside_range():
+    assert invert_table([0.25, 0.75], 4) == [0.0, 0.0, 0.5, 1.0, 1.0]
+
+
+@pytest.mark.parametrize('shape', ['linear', 'log', 'exp', 'scurve'])
+def test_to_ctl_inverts_to_daw(shape):
+    curve = Curve(shape)
+    for x in (0.0, 0.1, 0.3, 0.5, 0.9, 1.0):
+        assert curve.to_ctl(curve.to_daw(x)) == pytest.approx(x, abs=1e-3)
+
+
+def test_range_and_invert():
+    curve = Curve(min_value=0.2, max_value=0.6, invert=True)
+    assert curve.to_daw(0.0) == pytest.approx(0.6)
+    assert curve.to_daw(1.0) == pytest.approx(0.2)
+    assert curve.midi_to_daw[127] == pytest.approx(0.2)
+    assert curve.to_midi(0.6) == 0
+
+
+def test_unknown_shape():
+    with pytest.raises(ValueError):
+        Curve('cubic')
+
+
+def test_config_round_trip():
+    curves = load_curves({'3': 'log', 5: {'shape': 'exp', 'max': 0.5}})
+    assert set(curves) == {3, 5}
+    assert curves[3].to_config() == {'shape': 'log'}
+    assert Curve.from_config(curves[5].to_config()) == curves[5]
@@ -0,0 +1,73 @@
+"""Tests for `oscremap.loadgen`."""
+
+from oscremap.loadgen import DeliveryMeter, LoadGenerator, percentile
+from oscremap.transport import create_osc_client
+
+
+def test_percentile():
+    assert percentile([], 0.5) == 0.0
+    assert percentile([1, 2, 3, 4], 0.5) == 3
+    assert percentile([1, 2, 3, 4], 0.99) == 4
+
+
+def test_meter_matches_param_and_value():
+    meter = DeliveryMeter()
+    meter.sent((1, 0.5))
+    meter.sent((2, 0.5))
+    meter.received((2, 0.5))
+    meter.received((3, 0.5))
+
+    report = meter.report()
+    assert report['sent'] == 2
+    assert report['received'] == 1
+    assert report['unmatched'] == 1
+    assert report['lost'] == 1
+    assert meter.pending[(1, 0.5)]
+    assert not meter.pending[(2, 0.5)]
+
+
+def test_meter_consumes_oldest_send():
+    meter = DeliveryMeter()
+    meter.sent((1, 0.5))
+    meter.sent((1, 0.5))
+    meter.received((1, 0.5))
+    meter.received((1, 0.5))
+    meter.received((1, 0.5))
+
+    report = meter.report()
+    assert report['received'] == 2
+    assert report['unmatched'] == 1
+    assert report['loss_pct'] == 0.0
+
+
+def test_receiver_keys_by_param_from_address(tmp_path):
+    def endpoint(name):
+        return {
+            'listen_ip': 'unix:' + str(tmp_path / (name + '-proxy.sock')),
+            'remote_ip': 'unix:' + str(tmp_path / (name + '.sock')),
+        }
+
+    loadgen = LoadGenerator({
+        'global': {'params': 4},
+        'daw_osc': endpoint('daw'),
+        'controller_osc': endpoint('ctl'),
+        'controller_midi': {},
+    })
+    server = loadgen.servers[0]
+    try:
+        loadgen.daw_meter.sent(loadgen.value_key(2, 0.5))
+        loadgen.daw_meter.sent(loadgen.value_key(2, 0.5))
+        client = create_osc_client({'remote_ip': 'unix:' + server.unix_path})
+        client.send_message('/fx/param/2/val', 0.5)
+        client.send_message('/fx/param/2/val', 0.5)
+        client.send_message('/fx/param/3/val', 0.5)
+        client.close()
+        for _ in range(3):
+            server.handle_batch(server.drain())
+    finally:
+        for server in loadgen.servers:
+            server.server_close()
+
+    report = loadgen.daw_meter.report()
+    assert report['received'] == 2
+    assert report['unmatched'] == 1
@@ -0,0 +1,29 @@
+"""Tests for `oscremap.macros`."""
+
+import pytest
+
+from oscremap.macros import Macro, load_macros, primary_targets
+
+
+def test_from_config_with_curves_and_primary():
+    macro = Macro.from_config([
+        3, {'target': 4, 'curve': {'max': 0.5}, 'primary': True}])
+    assert macro.primary_target == 4
+    assert macro.primary_curve.max_value == 0.5
+    assert Macro.from_config(macro.to_config()) == macro
+
+
+def test_values_apply_target_curves():
+    macro = Macro.from_config([3, {'target': 4, 'curve': {'max': 0.5}}])
+    assert macro.values(1.0) == [(3, 1.0), (4, pytest.approx(0.5))]
+    assert macro.midi_values(127) == [(3, 1.0), (4, pytest.approx(0.5))]
+
+
+def test_macro_needs_target():
+    with pytest.raises(ValueError):
+        Macro.from_config([])
+
+
+def test_primary_targets_keyed_by_target():
+    macros = load_macros({'1': [3, 4], 2: [{'target': 6, 'primary': True}]})
+    assert primary_targets(macros) == {3: 1, 6: 2}
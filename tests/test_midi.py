@@ -0,0 +1,38 @@
+"""Tests for `oscremap.midi`."""
+
+import pytest
+
+from oscremap.midi import (
+    BACKEND_LOOPBACK, LOOPBACK_PORT, LoopbackMidiIn, LoopbackMidiOut,
+    create_midi_ports)
+
+
+def test_loopback_ports():
+    midi_in, midi_out = create_midi_ports(BACKEND_LOOPBACK)
+    assert isinstance(midi_in, LoopbackMidiIn)
+    assert isinstance(midi_out, LoopbackMidiOut)
+    assert midi_in.get_ports() == [LOOPBACK_PORT]
+    assert midi_out.get_ports() == [LOOPBACK_PORT]
+
+
+def test_loopback_in_calls_back_synchronously():
+    midi_in = LoopbackMidiIn()
+    events = []
+    midi_in.inject([0xB0, 1, 2])
+    midi_in.set_callback(events.append)
+    midi_in.inject([0xB0, 1, 3], 0.5)
+    assert events == [([0xB0, 1, 3], 0.5)]
+    assert midi_in.received == 2
+
+
+def test_loopback_out_keeps_last_messages():
+    midi_out = LoopbackMidiOut(keep=2)
+    for value in range(3):
+        midi_out.send_message([0xB0, 1, value])
+    assert list(midi_out.messages) == [[0xB0, 1, 1], [0xB0, 1, 2]]
+    assert midi_out.sent == 3
+
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        create_midi_ports('jack')
@@ -0,0 +1,54 @@
+"""Tests for `oscremap.morph`."""
+
+import pytest
+
+from oscremap.morph import SNAPSHOT_A, SNAPSHOT_B, MorphEngine
+
+
+def make_engine(**kwargs):
+    frames = []
+    engine = MorphEngine(frames.append, num_params=8, **kwargs)
+    engine.capture('Synth', SNAPSHOT_A, {1: {'val': 0.0}, 2: {'val': 0.5}})
+    engine.capture('Synth', SNAPSHOT_B, {
+        1: {'val': 1.0}, 2: {'val': 0.5}, 3: {'val': 1.0}})
+    return engine, frames
+
+
+def test_morph_emits_known_params_between_snapshots():
+    engine, frames = make_engine()
+    engine.morph('Synth', 0.25)
+    assert frames == [[(1, 0.25), (2, 0.5)]]
+
+
+def test_morph_emits_only_moved_params():
+    engine, frames = make_engine(threshold=0.1)
+    engine.morph('Synth', 0.0)
+    engine.morph('Synth', 0.05)
+    engine.morph('Synth', 0.5)
+    assert frames == [[(1, 0.0), (2, 0.5)], [(1, 0.5)]]
+
+
+def test_morph_without_both_snapshots_does_nothing():
+    frames = []
+    engine = MorphEngine(frames.append, num_params=8)
+    engine.capture('Synth', SNAPSHOT_A, {1: {'val': 0.0}})
+    engine.morph('Synth', 0.5)
+    engine.morph('Other', 0.5)
+    assert frames == []
+
+
+def test_capture_resets_emitted_values():
+    engine, frames = make_engine()
+    engine.morph('Synth', 1.0)
+    engine.capture('Synth', SNAPSHOT_B, {1: {'val': 1.0}, 2: {'val': 0.5}})
+    engine.morph('Synth', 1.0)
+    assert frames[1] == [(1, 1.0), (2, 0.5)]
+
+
+def test_params_outside_range_ignored():
+    frames = []
+    engine = MorphEngine(frames.append, num_params=2)
+    engine.capture('Synth', SNAPSHOT_A, {2: {'val': 0.0}, 5: {'val': 0.0}})
+    engine.capture('Synth', SNAPSHOT_B, {2: {'val': 1.0}, 5: {'val': 1.0}})
+    engine.morph('Synth', 0.5)
+    assert frames == [[(2, pytest.approx(0.5))]]
@@ -0,0 +1,439 @@
+"""Tests for `oscremap.oscproxy` using loopback midi backend."""
+
+import socket
+import threading
+import time
+
+import pytest
+
+from bidict import frozenbidict
+from pythonosc.dispatcher import Dispatcher
+
+from oscremap.midi import CONTROL_CHANGE
+from oscremap.oscproxy import OSCProxy
+from oscremap.transport import BatchOSCUDPServer
+
+
+PARAM_CC = CONTROL_CHANGE | 0
+
+
+class OSCRecorder(object):
+    """
+    Unix datagram endpoint standing in for DAW or controller.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.messages = []
+        dispatcher = Dispatcher()
+        dispatcher.set_default_handler(
+            lambda addr, *args: self.messages.append((addr, args)))
+        self.server = BatchOSCUDPServer(
+            path, dispatcher, family=socket.AF_UNIX)
+
+    def receive(self):
+        self.server.handle_batch(self.server.drain())
+        messages, self.messages = self.messages, []
+        return messages
+
+    def close(self):
+        self.server.server_close()
+
+
+def make_config(tmp_path, **extra):
+    cfg = {
+        'fx_maps_path': str(tmp_path / 'fx_maps.yaml'),
+        'global': {'params': 4},
+        'controller_midi': {
+            'backend': 'loopback',
+            'input_port': 'loopback',
+            'output_port': 'loopback',
+            'param_channel': 0,
+            'cmd_channel': 1,
+            'cc_param_start': 0,
+        },
+        'controller_osc': {
+            'listen_ip': '127.0.0.1',
+            'listen_port': 0,
+            'remote_ip': 'unix:' + str(tmp_path / 'ctl.sock'),
+        },
+        'daw_osc': {
+            'listen_ip': '127.0.0.1',
+            'listen_port': 0,
+            'remote_ip': 'unix:' + str(tmp_path / 'daw.sock'),
+        },
+    }
+    for section, value in extra.items():
+        if isinstance(value, dict) and section in cfg:
+            cfg[section].update(value)
+        else:
+            cfg[section] = value
+    return cfg
+
+
+@pytest.fixture
+def daw(tmp_path):
+    recorder = OSCRecorder(str(tmp_path / 'daw.sock'))
+    yield recorder
+    recorder.close()
+
+
+@pytest.fixture
+def make_proxy(tmp_path, daw):
+    proxies = []
+
+    def make(**extra):
+        proxy = OSCProxy(make_config(tmp_path, **extra))
+        proxies.append(proxy)
+        return proxy
+
+    yield make
+    for proxy in proxies:
+        if proxy.smoother is not None:
+            proxy.smoother.stop()
+        proxy.daw_osc_server.server_close()
+        proxy.ctl_osc_server.server_close()
+        proxy.to_daw_client.close()
+
+
+def drain(queue):
+    items = []
+    while not queue.empty():
+        items.append(queue.get_nowait())
+    return items
+
+
+def param_values(items):
+    return [item for item in items if item[0].endswith('/val')]
+
+
+def select_fx(proxy, fx_name, fx_map=None):
+    if fx_map is not None:
+        proxy.fx_maps[fx_name] = frozenbidict(fx_map)
+    proxy.handle_osc_from_daw('/fx/name', fx_name)
+    drain(proxy.send_osc_to_internal_queue)
+    drain(proxy.send_midi_to_ctl_queue)
+
+
+def test_midi_cc_sent_to_daw(make_proxy, daw):
+    proxy = make_proxy()
+    select_fx(proxy, 'Synth', {1: 3})
+
+    proxy.midi_in.inject([PARAM_CC, 0, 127])
+    assert daw.receive() == [('/fx/param/3/val', (1.0,))]
+
+
+def test_reload_fx_maps_updates_current_fx(make_proxy, tmp_path):
+    proxy = make_proxy()
+    select_fx(proxy, 'Synth', {1: 1})
+    proxy.save_fx_maps()
+
+    (tmp_path / 'fx_maps.yaml').write_text('Synth: {1: 2, 2: 5}\nOther: {}\n')
+    proxy.reload_fx_maps()
+    assert dict(proxy.routing.source_target_map) == {1: 2, 2: 5}
+    assert proxy.fx_maps['Other'] == {}
+    assert [msg[1] for msg in drain(proxy.send_midi_to_ctl_queue)] == [
+        0, 1, 2, 3]
+
+
+def test_reload_repaints_new_layout(make_proxy, tmp_path):
+    proxy = make_proxy()
+    select_fx(proxy, 'Synth')
+    proxy.paint_page()
+    drain(proxy.send_midi_to_ctl_queue)
+
+    cfg = make_config(tmp_path, **{'global': {'params': 2}})
+    proxy.reload_config(cfg)
+    assert [msg[1] for msg in drain(proxy.send_midi_to_ctl_queue)] == [0, 1]
+    assert all(len(paint[1]) == 2 for paint in proxy.page_paints.values())
+
+
+def test_reload_closes_replaced_clients(make_proxy, tmp_path):
+    proxy = make_proxy()
+    old_ctl_client = proxy.ctl_osc_client
+    old_daw_client = proxy.to_daw_client
+
+    cfg = make_config(tmp_path)
+    cfg['controller_osc']['remote_ip'] = 'unix:' + str(tmp_path / 'c2.sock')
+    cfg['daw_osc']['remote_ip'] = 'unix:' + str(tmp_path / 'd2.sock')
+    proxy.reload_config(cfg)
+
+    assert proxy.ctl_osc_client is not old_ctl_client
+    assert proxy.to_daw_client is not old_daw_client
+    assert proxy.daw_sender.client is proxy.to_daw_client
+    assert old_ctl_client.sock.fileno() == -1
+    assert old_daw_client.sock.fileno() == -1
+
+
+def test_fx_switch_stops_smoothing(make_proxy, daw):
+    proxy = make_proxy(smoothing={'time': 1.0})
+    select_fx(proxy, 'A', {1: 1})
+    proxy.handle_osc_from_daw('/fx/param/1/val', 0.0)
+    proxy.midi_in.inject([PARAM_CC, 0, 127])
+    assert proxy.smoother.tick()
+
+    select_fx(proxy, 'B', {1: 1})
+    daw.receive()
+    assert not proxy.smoother.tick()
+    assert daw.receive() == []
+
+
+def test_osc_echo_still_sent_to_midi(make_proxy, daw):
+    proxy = make_proxy()
+    select_fx(proxy, 'Synth', {1: 1})
+
+    proxy.handle_osc_from_ctl('/fx/param/1/val', 1.0)
+    proxy.handle_osc_from_daw('/fx/param/1/val', 1.0)
+
+    assert param_values(drain(proxy.send_osc_to_internal_queue)) == []
+    assert drain(proxy.send_midi_to_ctl_queue) == [[PARAM_CC, 0, 127]]
+
+
+def test_midi_echo_still_sent_to_osc(make_proxy, daw):
+    proxy = make_proxy()
+    select_fx(proxy, 'Synth', {1: 1})
+
+    proxy.midi_in.inject([PARAM_CC, 0, 127])
+    proxy.handle_osc_from_daw('/fx/param/1/val', 1.0)
+
+    assert param_values(drain(proxy.send_osc_to_internal_queue)) == [
+        ('/fx/param/1/val', (1.0,))]
+    assert drain(proxy.send_midi_to_ctl_queue) == []
+    assert proxy.echo_suppressed == 1
+
+
+def test_morph_echo_releases_takeover_and_reaches_controllers(
+        make_proxy, daw):
+    proxy = make_proxy(
+        morph={'params': 16}, smoothing={'time': 0.1},
+        controller_midi={'takeover': 'pickup'})
+    select_fx(proxy, 'Synth', {1: 1})
+
+    proxy.handle_osc_from_daw('/fx/param/1/val', 0.0)
+    proxy.handle_osc_from_ctl('/fx/snapshot/a')
+    proxy.handle_osc_from_daw('/fx/param/1/val', 1.0)
+    proxy.handle_osc_from_ctl('/fx/snapshot/b')
+    proxy.midi_in.inject([PARAM_CC, 0, 127])
+    while proxy.smoother.tick():
+        pass
+    drain(proxy.send_osc_to_internal_queue)
+    drain(proxy.send_midi_to_ctl_queue)
+
+    proxy.handle_osc_from_ctl('/fx/morph', 0.0)
+    assert daw.receive() == [('/fx/param/1/val', (0.0,))]
+    proxy.handle_osc_from_daw('/fx/param/1/val', 0.0)
+    assert param_values(drain(proxy.send_osc_to_internal_queue)) == [
+        ('/fx/param/1/val', (0.0,))]
+    assert drain(proxy.send_midi_to_ctl_queue) == [[PARAM_CC, 0, 0]]
+
+    proxy.midi_in.inject([PARAM_CC, 0, 126])
+    assert not proxy.smoother.tick()
+    assert daw.receive() == []
+
+
+def test_source_to_slot_follows_page(make_proxy):
+    proxy = make_proxy()
+    select_fx(proxy, 'Synth', {5: 5, 6: 9})
+    assert proxy.source_to_slot(2) == 2
+    assert proxy.source_to_slot(6) is None
+
+    proxy.select_page(1)
+    assert proxy.page == 1
+    assert proxy.source_to_slot(2) is None
+    assert proxy.source_to_slot(6) == 2
+    assert proxy.slot_to_source(2) == 6
+
+
+def test_select_page_clamped_to_mapped_pages(make_proxy):
+    proxy = make_proxy()
+    select_fx(proxy, 'Synth', {5: 5})
+    proxy.select_page(5)
+    assert proxy.page == 2
+    proxy.select_page(-1)
+    assert proxy.page == 0
+
+
+def test_off_page_update_keeps_prefetched_paint(make_proxy):
+    proxy = make_proxy()
+    select_fx(proxy, 'Synth', {5: 5, 6: 9})
+    assert 1 in proxy.page_paints
+
+    proxy.handle_osc_from_daw('/fx/param/9/name', 'Cutoff')
+    proxy.handle_osc_from_daw('/fx/param/9/val', 1.0)
+    assert drain(proxy.send_osc_to_internal_queue) == []
+    assert drain(proxy.send_midi_to_ctl_queue) == []
+    osc_msgs, midi_msgs = proxy.page_paints[1]
+    assert osc_msgs[3] == ('/fx/param/2/name', ('Cutoff',))
+    assert osc_msgs[5] == ('/fx/param/2/val', (1.0,))
+    assert midi_msgs[1] == (1, 127)
+
+    proxy.select_page(1)
+    msgs = drain(proxy.send_osc_to_internal_queue)
+    assert ('/fx/page', (2,)) in msgs
+    assert ('/fx/param/2/name', ('Cutoff',)) in msgs
+    assert ('/fx/param/2/val', (1.0,)) in msgs
+
+
+def test_page_paint_sent_in_one_flush(make_proxy, tmp_path):
+    ctl = OSCRecorder(str(tmp_path / 'ctl.sock'))
+    try:
+        proxy = make_proxy(controller_osc={'send_remote': True})
+        select_fx(proxy, 'Synth', {1: 1, 5: 5})
+        drain(proxy.send_osc_to_ctl_queue)
+
+        proxy.handle_osc_from_daw('/fx/param/1/str', 'old')
+        proxy.handle_osc_from_daw('/fx/param/5/str', '1 kHz')
+        proxy.select_page(1)
+        items = proxy.send_osc_to_ctl_queue.get_many(256)
+        assert [item[0] for item in items] == ['#bundle']
+
+        proxy.send_items_to_ctl(items)
+        msgs = ctl.receive()
+    finally:
+        ctl.close()
+    assert msgs[0] == ('/fx/page', (2,))
+    assert len(msgs) == 1 + 3 * 4
+    assert ('/fx/param/1/str', ('1 kHz',)) in msgs
+    assert ('/fx/param/1/str', ('old',)) not in msgs
+
+
+def test_ctl_flush_sends_state_before_values_and_text(make_proxy, tmp_path):
+    ctl = OSCRecorder(str(tmp_path / 'ctl.sock'))
+    try:
+        proxy = make_proxy(controller_osc={'send_remote': True})
+        select_fx(proxy, 'Synth', {1: 1})
+        drain(proxy.send_osc_to_ctl_queue)
+
+        proxy.handle_osc_from_daw('/fx/param/1/str', '1 kHz')
+        proxy.handle_osc_from_daw('/fx/param/1/val', 0.5)
+        proxy.send_osc_to_ctl('/fx/learn', 1)
+        proxy.send_items_to_ctl(proxy.send_osc_to_ctl_queue.get_many(2))
+        assert ctl.receive() == [
+            ('/fx/learn', (1,)), ('/fx/param/1/val', (0.5,))]
+        proxy.send_items_to_ctl(proxy.send_osc_to_ctl_queue.get_many(2))
+        assert ctl.receive() == [('/fx/param/1/str', ('1 kHz',))]
+    finally:
+        ctl.close()
+
+
+def test_tcp_handler_threads_tuned_as_server(make_proxy):
+    proxy = make_proxy(threads={'ctl-osc-server': {'policy': 'other'}})
+    thread = threading.current_thread()
+    name = thread.name
+    try:
+        proxy.register_handler_thread('ctl-osc-server', thread, True)
+        assert thread.name == 'ctl-osc-server-conn'
+        assert proxy.thread_tuner.threads[thread.native_id] == (
+            'ctl-osc-server', thread.native_id)
+        proxy.register_handler_thread('ctl-osc-server', thread, False)
+        assert thread.native_id not in proxy.thread_tuner.threads
+    finally:
+        thread.name = name
+
+
+def test_coalesce_midi_keeps_latest_param_cc(make_proxy):
+    proxy = make_proxy()
+    msgs = [
+        [PARAM_CC, 0, 10],
+        [PARAM_CC, 1, 20],
+        [CONTROL_CHANGE | 1, 0, 1],
+        [PARAM_CC, 0, 30],
+    ]
+    assert proxy.coalesce_midi(msgs) == [
+        [PARAM_CC, 0, 30], [PARAM_CC, 1, 20], [CONTROL_CHANGE | 1, 0, 1]]
+    assert proxy.midi_in_coalesced == 1
+
+
+def test_midi_input_batch_mode(make_proxy, daw):
+    proxy = make_proxy(controller_midi={'input_mode': 'batch'})
+    select_fx(proxy, 'Synth', {1: 1})
+    proxy.midi_in_thread.start()
+
+    for value in (10, 20, 127):
+        proxy.midi_in.inject([PARAM_CC, 0, value])
+    deadline = time.monotonic() + 1.0
+    messages = []
+    while not messages and time.monotonic() < deadline:
+        time.sleep(0.01)
+        messages = daw.receive()
+    assert messages[-1] == ('/fx/param/1/val', (1.0,))
+
+
+def select_macro_fx(proxy, tmp_path):
+    (tmp_path / 'fx_maps.yaml').write_text(
+        'Synth:\n'
+        '  map: {2: 2}\n'
+        '  macros:\n'
+        '    1: [3, {target: 4, curve: {max: 0.5}}]\n')
+    proxy.reload_fx_maps()
+    select_fx(proxy, 'Synth')
+
+
+def test_macro_fans_out_in_one_bundle(make_proxy, daw, tmp_path):
+    proxy = make_proxy()
+    select_macro_fx(proxy, tmp_path)
+    packets = []
+    daw.server.tap = packets.append
+
+    proxy.midi_in.inject([PARAM_CC, 0, 127])
+    assert daw.receive() == [
+        ('/fx/param/3/val', (1.0,)), ('/fx/param/4/val', (0.5,))]
+    assert len(packets) == 1
+
+    proxy.handle_osc_from_ctl('/fx/param/1/val', 0.0)
+    assert daw.receive() == [
+        ('/fx/param/3/val', (0.0,)), ('/fx/param/4/val', (0.0,))]
+
+
+def test_macro_feedback_from_primary_target(make_proxy, daw, tmp_path):
+    proxy = make_proxy()
+    select_macro_fx(proxy, tmp_path)
+
+    proxy.handle_osc_from_daw('/fx/param/4/val', 0.25)
+    assert drain(proxy.send_midi_to_ctl_queue) == []
+    proxy.handle_osc_from_daw('/fx/param/3/val', 1.0)
+    assert drain(proxy.send_midi_to_ctl_queue) == [[PARAM_CC, 0, 127]]
+    assert param_values(drain(proxy.send_osc_to_internal_queue)) == [
+        ('/fx/param/1/val', (1.0,))]
+
+
+def test_learn_ignores_modulated_feedback(make_proxy, daw):
+    proxy = make_proxy(modulation={'generators': {'lfo1': {'freq': 5}}})
+    select_fx(proxy, 'Synth')
+
+    proxy.handle_osc_from_ctl('/fx/mod/learn', 'lfo1')
+    assert proxy.learn_active
+    proxy.handle_osc_from_daw('/fx/param/5/val', 0.4)
+    assert proxy.modulation_engine.is_assigned(5)
+    assert not proxy.learn_active
+
+    proxy.toggle_learn()
+    proxy.midi_in.inject([PARAM_CC, 1, 64])
+    proxy.handle_osc_from_daw('/fx/param/5/val', 0.43)
+    assert dict(proxy.routing.source_target_map) == {}
+
+    proxy.handle_osc_from_daw('/fx/param/6/val', 0.2)
+    assert dict(proxy.routing.source_target_map) == {2: 6}
+
+
+def test_learn_ignores_echo(make_proxy, daw):
+    proxy = make_proxy()
+    select_fx(proxy, 'Synth', {1: 1})
+
+    proxy.toggle_learn()
+    proxy.midi_in.inject([PARAM_CC, 0, 127])
+    proxy.handle_osc_from_daw('/fx/param/1/val', 1.0)
+    assert proxy.routing.learn_target is None
+
+
+def test_fx_switch_repaints_sysex_display(make_proxy):
+    proxy = make_proxy(controller_midi={'sysex': {'delay': 0}})
+    select_fx(proxy, 'A', {1: 1, 2: 2})
+    proxy.handle_osc_from_daw('/fx/param/1/name', 'Cutoff')
+    proxy.handle_osc_from_daw('/fx/param/2/name', 'Reso')
+    proxy.sysex_display.flush()
+
+    select_fx(proxy, 'B', {1: 1})
+    assert proxy.sysex_display.flush()
+    assert proxy.sysex_display.shown[(1, 0)] == []
+    assert proxy.sysex_display.shown[(2, 0)] == []
@@ -0,0 +1,63 @@
+"""Tests for `oscremap.pacing`."""
+
+import pytest
+
+from oscremap.pacing import AdaptivePacer, FixedPacer, create_pacer
+
+
+def make_pacer(**kwargs):
+    return AdaptivePacer(
+        0.01, 8192, 256, min_bundle_size=1024, min_flush_size=32, **kwargs)
+
+
+def test_create_pacer_from_endpoint_config():
+    pacer = create_pacer({'send_interval': 0.02, 'flush_size': 64}, 4096)
+    assert isinstance(pacer, FixedPacer)
+    assert pacer.flush_size == 64
+
+    pacer = create_pacer({'flush_size': 64, 'pacing': {'step': 0.001}}, 4096)
+    assert isinstance(pacer, AdaptivePacer)
+    assert pacer.interval == 0.01
+    assert pacer.bundle_size == 4096
+    assert pacer.flush_size == 64
+
+
+def test_congestion_backs_off_interval_bundle_and_flush_size():
+    pacer = make_pacer()
+    pacer.update(10, 0.0, dropped=1)
+    assert pacer.interval == pytest.approx(0.02)
+    assert pacer.bundle_size == 4096
+    assert pacer.flush_size == 128
+
+    pacer.update(10, 0.015)
+    for _ in range(5):
+        pacer.update(10, 0.0, dropped=1)
+    assert pacer.interval == pytest.approx(0.1)
+    assert pacer.bundle_size == 1024
+    assert pacer.flush_size == 32
+    assert pacer.stats()['backoffs'] == 7
+
+
+def test_clean_flushes_grow_back_while_backlogged():
+    pacer = make_pacer(flush_step=64, bundle_step=4096)
+    pacer.update(10, 0.0, dropped=1)
+    pacer.update(0, 0.0)
+    assert pacer.flush_size == 128
+    assert pacer.interval == pytest.approx(0.0195)
+
+    for _ in range(3):
+        pacer.update(10, 0.0)
+    assert pacer.flush_size == 256
+    assert pacer.bundle_size == 8192
+
+
+def test_unacked_flushes_count_as_congestion():
+    pacer = make_pacer(acks=True, max_in_flight=2)
+    for _ in range(3):
+        pacer.next_seq()
+    pacer.update(0, 0.0)
+    assert pacer.stats()['backoffs'] == 1
+
+    pacer.ack(3)
+    assert pacer.stats()['in_flight'] == 0
+    assert pacer.rtt is not None
@@ -0,0 +1,84 @@
+"""Tests for `oscremap.queues`."""
+
+from oscremap.queues import (
+    CLASS_NAME, CLASS_TEXT, CLASS_VALUE, OverloadQueue, classify_midi,
+    classify_osc, midi_key, osc_key)
+
+
+def osc_queue(maxsize):
+    return OverloadQueue(classify_osc, osc_key, maxsize=maxsize)
+
+
+def test_classify_osc():
+    assert classify_osc(('/fx/param/1/val', 0.5)) == CLASS_VALUE
+    assert classify_osc(('/fx/param/1/name', 'Cutoff')) == CLASS_NAME
+    assert classify_osc(('/fx/param/1/str', '1 kHz')) == CLASS_TEXT
+    assert classify_osc(('/fx/name', 'Synth')) not in (
+        CLASS_VALUE, CLASS_NAME, CLASS_TEXT)
+
+
+def test_latest_value_coalesced_in_place():
+    q = osc_queue(8)
+    q.put(('/fx/param/1/val', 0.1))
+    q.put(('/fx/param/2/val', 0.2))
+    q.put(('/fx/param/1/val', 0.3))
+    assert q.get_many(8) == [
+        ('/fx/param/1/val', 0.3), ('/fx/param/2/val', 0.2)]
+    assert q.stats()['coalesced'][CLASS_VALUE] == 1
+
+
+def test_state_never_dropped():
+    q = osc_queue(2)
+    for i in range(4):
+        q.put(('/fx/name', 'fx{}'.format(i)))
+    assert q.qsize() == 4
+    assert [q.get_nowait()[1] for _ in range(4)] == [
+        'fx0', 'fx1', 'fx2', 'fx3']
+
+
+def test_full_queue_sheds_value_strings_before_names():
+    q = osc_queue(2)
+    q.put(('/fx/param/1/name', 'Cutoff'))
+    q.put(('/fx/param/1/str', '1 kHz'))
+    q.put(('/fx/param/2/name', 'Reso'))
+    assert q.get_many(8) == [
+        ('/fx/param/1/name', 'Cutoff'), ('/fx/param/2/name', 'Reso')]
+    assert q.stats()['dropped'][CLASS_TEXT] == 1
+
+
+def test_value_string_does_not_shed_names():
+    q = osc_queue(2)
+    q.put(('/fx/param/1/name', 'Cutoff'))
+    q.put(('/fx/param/2/name', 'Reso'))
+    q.put(('/fx/param/1/str', '1 kHz'))
+    assert q.get_many(8) == [
+        ('/fx/param/1/name', 'Cutoff'), ('/fx/param/2/name', 'Reso')]
+    assert q.stats()['dropped'][CLASS_TEXT] == 1
+    assert q.stats()['dropped'][CLASS_NAME] == 0
+
+
+def test_get_many_returns_more_important_first():
+    q = osc_queue(8)
+    q.put(('/fx/param/1/str', '1 kHz'))
+    q.put(('/fx/param/1/val', 0.5))
+    q.put(('/fx/name', 'Synth'))
+    assert q.get_many(2) == [('/fx/name', 'Synth'), ('/fx/param/1/val', 0.5)]
+    assert q.get_many(2) == [('/fx/param/1/str', '1 kHz')]
+
+
+def test_midi_cc_coalesced_per_channel_and_controller():
+    q = OverloadQueue(classify_midi, midi_key, maxsize=8)
+    q.put([0xB0, 1, 10])
+    q.put([0xB1, 1, 20])
+    q.put([0xB0, 1, 30])
+    assert q.get_many(8) == [[0xB0, 1, 30], [0xB1, 1, 20]]
+
+
+def test_policies_from_config():
+    q = OverloadQueue.from_config(classify_osc, osc_key, {
+        'maxsize': 4, 'policies': {CLASS_VALUE: 'drop_oldest'}})
+    assert q.maxsize == 4
+    q.put(('/fx/param/1/val', 0.1))
+    q.put(('/fx/param/1/val', 0.3))
+    assert q.qsize() == 2
+    assert q.stats()['coalesced'][CLASS_VALUE] == 0
@@ -0,0 +1,68 @@
+"""Tests for `oscremap.realtime`."""
+
+import os
+import threading
+
+import pytest
+
+from oscremap import realtime
+from oscremap.realtime import ThreadTuner
+
+
+pytestmark = pytest.mark.skipif(
+    not realtime.SUPPORTED, reason='thread scheduling not supported')
+
+
+def test_role_without_settings_left_alone():
+    tuner = ThreadTuner({'other-role': {'policy': 'batch'}})
+    tuner.register('ctl-osc-server', threading.get_native_id())
+    assert tuner.stats() == {}
+
+
+def test_realtime_policy_failure_keeps_current_policy(monkeypatch):
+    def refuse(native_id, policy, param):
+        raise PermissionError(1, 'Operation not permitted')
+    monkeypatch.setattr(os, 'sched_setscheduler', refuse)
+
+    native_id = threading.get_native_id()
+    before = ThreadTuner().read(native_id)
+    tuner = ThreadTuner({'default': {'policy': 'fifo', 'priority': 50}})
+    tuner.register('ctl-osc-server', native_id)
+    assert tuner.stats()['ctl-osc-server'] == before
+
+
+def test_unknown_policy_ignored():
+    native_id = threading.get_native_id()
+    tuner = ThreadTuner({'default': {'policy': 'fastest'}})
+    tuner.register('ctl-osc-server', native_id)
+    assert tuner.stats()['ctl-osc-server'] == tuner.read(native_id)
+
+
+def test_unsupported_platform_ignores_settings(monkeypatch):
+    monkeypatch.setattr(realtime, 'SUPPORTED', False)
+    tuner = ThreadTuner({'default': {'policy': 'fifo'}})
+    tuner.register('ctl-osc-server', threading.get_native_id())
+    assert tuner.stats() == {}
+
+
+def test_expected_role_pending_until_registered():
+    tuner = ThreadTuner({'ctl-midi-in': {'cpus': [0]}})
+    tuner.expect('ctl-midi-in')
+    tuner.expect('daw-osc-server')
+    assert tuner.stats() == {'ctl-midi-in': {'pending': True}}
+
+
+def test_threads_sharing_role_reapplied_on_reload():
+    cpus = sorted(os.sched_getaffinity(0))
+    native_id = threading.get_native_id()
+    tuner = ThreadTuner()
+    tuner.register('ctl-osc-server', native_id)
+    tuner.register('ctl-osc-server', native_id, key='conn')
+    assert len(tuner.threads) == 2
+
+    tuner.unregister('conn')
+    tuner.reload({'default': {'cpus': cpus[:1]}})
+    try:
+        assert tuner.stats()['ctl-osc-server']['cpus'] == cpus[:1]
+    finally:
+        os.sched_setaffinity(0, cpus)
@@ -0,0 +1,46 @@
+"""Tests for `oscremap.routing`."""
+
+from bidict import frozenbidict
+
+from oscremap.macros import Macro
+from oscremap.routing import EMPTY_ROUTING
+
+
+def make_routing():
+    return EMPTY_ROUTING.with_maps(
+        frozenbidict({1: 1, 2: 2}), {}, {3: Macro([(5, None), (6, None)])},
+        {})
+
+
+def test_learned_returns_new_snapshot():
+    routing = make_routing()._replace(learn_source=3, learn_target=7)
+    learned = routing.learned()
+
+    assert dict(learned.source_target_map) == {1: 1, 2: 2, 3: 7}
+    assert learned.learn_source is None
+    assert learned.learn_target is None
+    assert learned.macros == {}
+    assert learned.macro_feedback == {}
+
+    assert dict(routing.source_target_map) == {1: 1, 2: 2}
+    assert 3 in routing.macros
+    assert routing.macro_feedback == {5: 3}
+
+
+def test_learned_moves_target_to_new_source():
+    routing = make_routing()._replace(learn_source=4, learn_target=2)
+    learned = routing.learned()
+    assert dict(learned.source_target_map) == {1: 1, 4: 2}
+    assert isinstance(learned.source_target_map, frozenbidict)
+    assert dict(routing.source_target_map) == {1: 1, 2: 2}
+
+
+def test_target_source_and_feedback():
+    routing = make_routing()
+    assert routing.target_source(2) == 2
+    assert routing.target_source(5) == 3
+    assert routing.target_source(6) is None
+    assert routing.source_feedback(3) == (5, None)
+    assert routing.source_feedback(1) == (1, None)
+    assert routing.max_source() == 3
+    assert EMPTY_ROUTING.max_source() is None
@@ -0,0 +1,84 @@
+"""Tests for `oscremap.rules`."""
+
+import pytest
+
+from oscremap.rules import SIDE_CONTROLLER, SIDE_DAW, RuleError, RuleSet
+
+
+RULES = [
+    {
+        'match': '/track/{num:int}/volume',
+        'send': {
+            'address': '/mixer/{num}/vol',
+            'args': [{'arg': 0, 'scale': [0, 1, 0, 100]}],
+        },
+    },
+    {'match': '/track/*/volume', 'send': {'address': '/other'}},
+    {'match': '/play', 'from': 'controller',
+     'send': {'address': '/transport/play'}},
+]
+
+
+def outputs(rules, source, address, args=()):
+    found = rules.route(source, address, args)
+    return None if found is None else found[1]
+
+
+def test_from_config_without_rules():
+    assert RuleSet.from_config(None) is None
+    assert RuleSet.from_config([]) is None
+
+
+def test_capture_converted_and_arg_scaled():
+    rules = RuleSet(RULES)
+    assert outputs(rules, SIDE_DAW, '/track/3/volume', (0.5,)) == [
+        (SIDE_CONTROLLER, '/mixer/3/vol', (50.0,))]
+
+
+def test_failed_conversion_falls_through_to_wildcard():
+    rules = RuleSet(RULES)
+    assert outputs(rules, SIDE_DAW, '/track/master/volume', (0.5,)) == [
+        (SIDE_CONTROLLER, '/other', (0.5,))]
+
+
+def test_first_rule_in_config_order_wins():
+    rules = RuleSet(list(reversed(RULES)))
+    assert outputs(rules, SIDE_DAW, '/track/3/volume', (0.5,)) == [
+        (SIDE_CONTROLLER, '/other', (0.5,))]
+
+
+def test_exact_rule_only_matches_its_source():
+    rules = RuleSet(RULES)
+    assert outputs(rules, SIDE_CONTROLLER, '/play') == [
+        (SIDE_DAW, '/transport/play', ())]
+    assert outputs(rules, SIDE_DAW, '/play') is None
+
+
+def test_scale_clamped_by_default():
+    rules = RuleSet(RULES)
+    assert outputs(rules, SIDE_DAW, '/track/1/volume', (2.0,)) == [
+        (SIDE_CONTROLLER, '/mixer/1/vol', (100.0,))]
+
+
+def test_unknown_capture_rejected():
+    with pytest.raises(RuleError):
+        RuleSet([{'match': '/a/{num}', 'send': {'address': '/b/{other}'}}])
+
+
+def test_multiple_sends_with_captures_and_types():
+    rules = RuleSet([{
+        'match': '/track/{num:int}/mute',
+        'continue': True,
+        'send': [
+            {'address': '/mixer/{num}/mute',
+             'args': [{'arg': 0, 'type': 'bool'}]},
+            {'to': 'daw', 'address': '/log',
+             'args': ['track {num}', {'capture': 'num'}]},
+        ],
+    }])
+    rule, found = rules.route(SIDE_DAW, '/track/2/mute', (1.0,))
+    assert rule.passthrough
+    assert found == [
+        (SIDE_CONTROLLER, '/mixer/2/mute', (1,)),
+        (SIDE_DAW, '/log', ('track 2', 2)),
+    ]
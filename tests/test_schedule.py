@@ -0,0 +1,69 @@
+"""Tests for `oscremap.schedule`."""
+
+import pytest
+
+from pythonosc.osc_bundle_builder import IMMEDIATELY
+
+from oscremap import schedule
+from oscremap.schedule import FlushClock
+
+
+class FakeTime(object):
+
+    def __init__(self):
+        self.now = 100.0
+        self.wall_offset = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+    def time(self):
+        return self.now + self.wall_offset
+
+    def sleep(self, delay):
+        self.now += delay
+
+
+@pytest.fixture
+def fake_time(monkeypatch):
+    fake = FakeTime()
+    monkeypatch.setattr(schedule, 'time', fake)
+    return fake
+
+
+def test_immediate_flushes_spaced_by_interval(fake_time):
+    clock = FlushClock(0.01)
+    assert clock.wait() is IMMEDIATELY
+    start = fake_time.now
+    assert clock.wait() is IMMEDIATELY
+    assert fake_time.now == pytest.approx(start + 0.01)
+
+    fake_time.now += 0.05
+    clock.wait()
+    assert fake_time.now == pytest.approx(start + 0.06)
+    assert clock.stats()['mode'] == 'immediate'
+    assert clock.stats()['late'] == 0
+
+
+def test_scheduled_flushes_aligned_to_ticks(fake_time):
+    clock = FlushClock(0.01, latency=0.005)
+    fake_time.now += 0.013
+    timetag = clock.wait()
+    assert fake_time.now == pytest.approx(100.02)
+    assert timetag == pytest.approx(100.02 + 1000.0 + 0.005)
+    assert clock.stats()['mode'] == 'scheduled'
+
+
+def test_scheduled_flush_counted_late_after_latency(fake_time):
+    clock = FlushClock(0.01, latency=0.005)
+    flush_time = clock.next_flush_time(fake_time.now + 0.001)
+    fake_time.sleep = lambda delay: setattr(
+        fake_time, 'now', fake_time.now + delay + 0.008)
+    fake_time.now += 0.001
+    timetag = clock.wait()
+
+    stats = clock.stats()
+    assert stats['late'] == 1
+    assert stats['lateness_max_ms'] == pytest.approx(8.0)
+    # timetag stays on tick grid, so late bundle is not delayed further
+    assert timetag == pytest.approx(flush_time + 1000.0 + 0.005)
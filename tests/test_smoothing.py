@@ -0,0 +1,85 @@
+"""Tests for `oscremap.smoothing`."""
+
+import pytest
+
+from oscremap.smoothing import (
+    SMOOTHING_LINEAR, SMOOTHING_ONE_POLE, ParamSmoother)
+
+
+def smoother(emitted, **kwargs):
+    return ParamSmoother(emitted.extend, **kwargs)
+
+
+def test_jumps_without_known_value():
+    emitted = []
+    smoother(emitted).set_target(1, 0.5)
+    assert emitted == [(1, 0.5)]
+
+
+def run_stream(s, values, ticks_per_value):
+    """
+    Set targets at fixed rate, ticking smoother in between.
+    """
+    for value in values:
+        s.set_target(1, value)
+        for _ in range(ticks_per_value):
+            s.tick()
+    while s.tick():
+        pass
+
+
+def test_linear_ramp_reaches_target():
+    emitted = []
+    s = smoother(emitted, mode=SMOOTHING_LINEAR, ramp_time=0.04, rate=100)
+    s.observe(1, 0.0)
+    s.set_target(1, 1.0)
+    while s.tick():
+        pass
+    assert [value for _, value in emitted] == pytest.approx(
+        [0.25, 0.5, 0.75, 1.0])
+
+
+def test_observe_ignored_during_ramp():
+    emitted = []
+    s = smoother(emitted, mode=SMOOTHING_LINEAR, ramp_time=0.02, rate=100)
+    s.observe(1, 0.0)
+    s.set_target(1, 1.0)
+    s.observe(1, 0.9)
+    s.tick()
+    assert emitted == [(1, 0.5)]
+
+
+def test_clear_stops_ramps():
+    emitted = []
+    s = smoother(emitted, ramp_time=1.0)
+    s.observe(1, 0.0)
+    s.set_target(1, 1.0)
+    s.tick()
+    s.clear()
+    del emitted[:]
+    assert not s.tick()
+    assert emitted == []
+
+    s.set_target(1, 0.3)
+    assert emitted == [(1, 0.3)]
+
+
+@pytest.mark.parametrize('mode', [SMOOTHING_ONE_POLE, SMOOTHING_LINEAR])
+@pytest.mark.parametrize('cc_rate', [20, 100])
+def test_knob_stream_sends_no_more_than_raw(mode, cc_rate):
+    emitted = []
+    s = smoother(emitted, mode=mode)
+    s.observe(1, 0.0)
+    values = [cc / 127.0 for cc in range(1, 41)]
+    run_stream(s, values, max(1, int(50 / cc_rate)))
+    assert len(emitted) <= len(values)
+    assert emitted[-1] == (1, values[-1])
+
+
+def test_jump_ramped_in_resolution_steps():
+    emitted = []
+    s = smoother(emitted, mode=SMOOTHING_LINEAR, ramp_time=0.1, rate=50)
+    s.observe(1, 0.0)
+    run_stream(s, [1.0], 0)
+    assert len(emitted) == 5
+    assert emitted[-1] == (1, 1.0)
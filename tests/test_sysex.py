@@ -0,0 +1,64 @@
+"""Tests for `oscremap.sysex`."""
+
+from oscremap.sysex import (
+    FIELD_NAME, FIELD_STR, SYSEX_END, SYSEX_START, SysExDisplay)
+
+
+def test_waits_for_delay():
+    display = SysExDisplay(delay=60)
+    display.update([(1, FIELD_NAME, 'Cutoff')])
+    assert display.flush() == []
+
+
+def test_message_layout():
+    display = SysExDisplay(delay=0)
+    display.update([(2, FIELD_STR, '1 kHz'), (1, FIELD_NAME, 'Cutoff')])
+    assert display.flush() == [
+        [SYSEX_START, 0x7D, 0x01,
+         1, 0x00, 6] + list(b'Cutoff') +
+        [2, 0x01, 5] + list(b'1 kHz') +
+        [SYSEX_END]]
+
+
+def test_text_truncated_to_width():
+    display = SysExDisplay(width=4, delay=0)
+    display.update([(1, FIELD_NAME, 'Cutoff')])
+    msg, = display.flush()
+    assert msg[3:-1] == [1, 0x00, 4] + list(b'Cuto')
+
+
+def test_shown_texts_not_sent_again():
+    display = SysExDisplay(delay=0)
+    display.update([(1, FIELD_NAME, 'Cutoff')])
+    display.flush()
+    display.update([(1, FIELD_NAME, 'Cutoff')])
+    assert display.flush() == []
+    assert display.stats()['cached'] == 1
+
+    display.reset()
+    display.update([(1, FIELD_NAME, 'Cutoff')])
+    assert len(display.flush()) == 1
+
+
+def test_split_at_max_size():
+    display = SysExDisplay(max_size=32, delay=0)
+    display.update([(slot, FIELD_NAME, 'Param {}'.format(slot))
+                    for slot in range(1, 5)])
+    msgs = display.flush()
+    assert len(msgs) > 1
+    assert all(len(msg) <= 32 for msg in msgs)
+    assert all(msg[0] == SYSEX_START and msg[-1] == SYSEX_END
+               for msg in msgs)
+    assert display.stats()['texts'] == 4
+
+
+def test_change_reverted_before_flush_sends_nothing():
+    display = SysExDisplay(delay=0)
+    display.update([(1, FIELD_NAME, 'Cutoff')])
+    display.flush()
+
+    display.update([(1, FIELD_NAME, 'Reso')])
+    display.update([(1, FIELD_NAME, 'Cutoff')])
+    assert display.pending_time is None
+    assert display.flush() == []
+    assert display.stats()['messages'] == 1
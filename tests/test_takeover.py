@@ -0,0 +1,53 @@
+"""Tests for `oscremap.takeover`."""
+
+import pytest
+
+from oscremap.takeover import (
+    TAKEOVER_OFF, TAKEOVER_PICKUP, TAKEOVER_SCALE, SoftTakeover,
+    load_takeover)
+
+
+def test_off_passes_position():
+    takeover = SoftTakeover()
+    assert takeover.filter(None, 1, 0.9, 0.1) == 0.9
+    assert takeover.filter(TAKEOVER_OFF, 1, 0.9, 0.1) == 0.9
+
+
+def test_unknown_value_passes_position():
+    takeover = SoftTakeover(TAKEOVER_PICKUP)
+    assert takeover.filter(None, 1, 0.9, None) == 0.9
+
+
+def test_pickup_ignores_until_crossing_value():
+    takeover = SoftTakeover(TAKEOVER_PICKUP)
+    assert takeover.filter(None, 1, 0.1, 0.5) is None
+    assert takeover.filter(None, 1, 0.3, 0.5) is None
+    assert takeover.filter(None, 1, 0.6, 0.5) == 0.6
+    assert takeover.filter(None, 1, 0.2, 0.5) == 0.2
+    assert takeover.stats()['ignored'] == 2
+
+
+def test_pickup_within_tolerance():
+    takeover = SoftTakeover(TAKEOVER_PICKUP)
+    assert takeover.filter(None, 1, 0.5 + 1 / 127, 0.5) == 0.5 + 1 / 127
+
+
+def test_scale_reaches_end_with_knob():
+    takeover = SoftTakeover(TAKEOVER_SCALE)
+    assert takeover.filter(None, 1, 0.2, 0.6) is None
+    assert takeover.filter(None, 1, 0.4, 0.6) == pytest.approx(0.7)
+    assert takeover.filter(None, 1, 1.0, 0.6) == pytest.approx(1.0)
+
+
+def test_release_drops_state():
+    takeover = SoftTakeover(TAKEOVER_PICKUP)
+    takeover.filter(None, 1, 0.1, 0.5)
+    takeover.filter(None, 1, 0.9, 0.5)
+    takeover.release(1)
+    assert takeover.filter(None, 1, 0.1, 0.5) is None
+
+
+def test_load_takeover():
+    assert load_takeover({'2': 'scale'}) == {2: TAKEOVER_SCALE}
+    with pytest.raises(ValueError):
+        load_takeover({'2': 'catch'})
@@ -0,0 +1,262 @@
+"""Tests for `oscremap.transport`."""
+
+import os
+import socket
+import threading
+import time
+
+import pytest
+
+from pythonosc.dispatcher import Dispatcher
+
+from oscremap.sender import Packet
+from oscremap.transport import (
+    SLIP_END, SLIP_ESC, BatchOSCUDPServer, SLIPDecoder, SLIPTCPClient,
+    SLIPTCPServer, UDPClient, create_osc_client, peer_endpoint, slip_encode,
+    unix_path)
+
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def udp_batch(messages, **kwargs):
+    """
+    Send messages to batch server in separate datagrams, return what
+    single batch dispatched and the server.
+    """
+    received = []
+    dispatcher = Dispatcher()
+    dispatcher.set_default_handler(
+        lambda addr, *args: received.append((addr,) + args))
+    server = BatchOSCUDPServer(('127.0.0.1', 0), dispatcher, **kwargs)
+    client = UDPClient(*server.server_address)
+    try:
+        for address, value in messages:
+            client.send_message(address, value)
+        server.handle_batch(server.drain())
+    finally:
+        client.close()
+        server.server_close()
+    return received, server
+
+
+VALUES_AROUND_FX_CHANGE = [
+    ('/fx/param/1/val', 0.125),
+    ('/fx/param/1/val', 0.25),
+    ('/fx/name', 'Other'),
+    ('/fx/param/1/val', 0.375),
+    ('/fx/param/2/val', 0.5),
+    ('/fx/param/1/val', 0.625),
+]
+
+
+def test_batch_dispatches_all_by_default():
+    received, server = udp_batch(VALUES_AROUND_FX_CHANGE)
+    assert received == VALUES_AROUND_FX_CHANGE
+    stats = server.stats()
+    assert stats['received'] == 6
+    assert stats['batches'] == 1
+    assert stats['max_batch'] == 6
+    assert stats['coalesced'] == 0
+
+
+def test_batch_coalesces_values_between_other_messages():
+    received, server = udp_batch(VALUES_AROUND_FX_CHANGE, coalesce=True)
+    assert received == [
+        ('/fx/param/1/val', 0.25),
+        ('/fx/name', 'Other'),
+        ('/fx/param/2/val', 0.5),
+        ('/fx/param/1/val', 0.625),
+    ]
+    assert server.stats()['coalesced'] == 2
+
+
+def test_batch_limited_by_max_batch():
+    received, server = udp_batch(VALUES_AROUND_FX_CHANGE, max_batch=4)
+    assert received == VALUES_AROUND_FX_CHANGE[:4]
+    assert server.stats()['max_batch'] == 4
+
+
+def test_batch_counts_parse_errors():
+    received = []
+    dispatcher = Dispatcher()
+    dispatcher.set_default_handler(lambda addr, *args: received.append(addr))
+    server = BatchOSCUDPServer(('127.0.0.1', 0), dispatcher, rcvbuf=65536)
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        sock.sendto(b'garbage', server.server_address)
+        server.handle_batch(server.drain())
+    finally:
+        sock.close()
+        server.server_close()
+    assert received == []
+    assert server.stats()['parse_errors'] == 1
+    assert server.stats()['rcvbuf'] >= 65536
+
+
+def test_slip_round_trip():
+    packets = [b'plain', SLIP_END + b'end' + SLIP_END, b'esc' + SLIP_ESC,
+               SLIP_ESC + SLIP_END]
+    stream = b''.join(slip_encode(packet) for packet in packets)
+    assert SLIPDecoder().feed(stream) == packets
+
+
+def test_slip_decoder_keeps_partial_frame():
+    data = slip_encode(b'first') + slip_encode(b'sec' + SLIP_END + b'ond')
+    decoder = SLIPDecoder()
+    assert decoder.feed(data[:9]) == [b'first']
+    assert decoder.feed(data[9:14]) == []
+    assert decoder.feed(data[14:]) == [b'sec' + SLIP_END + b'ond']
+
+
+def test_tcp_round_trip():
+    received = []
+    dispatcher = Dispatcher()
+    dispatcher.set_default_handler(
+        lambda addr, *args: received.append((addr, args)))
+    server = SLIPTCPServer(('127.0.0.1', 0), dispatcher)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    client = SLIPTCPClient(*server.server_address)
+    try:
+        client.send_message('/fx/param/1/name', 'Cutoff')
+        client.send_message('/fx/param/1/str', '1 kHz')
+        assert wait_for(lambda: len(received) == 2)
+    finally:
+        client.close()
+        server.shutdown()
+        server.server_close()
+    assert received == [
+        ('/fx/param/1/name', ('Cutoff',)), ('/fx/param/1/str', ('1 kHz',))]
+    assert server.stats()['received'] == 2
+
+
+def test_tcp_handler_thread_reported():
+    events = []
+    server = SLIPTCPServer(('127.0.0.1', 0), Dispatcher())
+    server.on_handler_thread = lambda thread, started: events.append(
+        (thread.ident, started))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        conn = socket.create_connection(server.server_address)
+        assert wait_for(lambda: len(events) == 1)
+        conn.close()
+        assert wait_for(lambda: len(events) == 2)
+    finally:
+        server.shutdown()
+        server.server_close()
+    (ident, started), (end_ident, ended) = events
+    assert started and not ended
+    assert ident == end_ident != thread.ident
+
+
+def test_tcp_send_to_unreachable_peer_does_not_block():
+    listener = socket.socket()
+    listener.bind(('127.0.0.1', 0))
+    address = listener.getsockname()
+    listener.close()
+
+    client = SLIPTCPClient(*address)
+    start_time = time.monotonic()
+    for _ in range(10):
+        client.send_message('/fx/param/1/name', 'Cutoff')
+    assert time.monotonic() - start_time < 0.1
+    assert wait_for(lambda: client.dropped == 10)
+    client.close()
+
+
+def test_tcp_send_to_stalled_peer_does_not_block():
+    listener = socket.socket()
+    listener.bind(('127.0.0.1', 0))
+    listener.listen(1)
+    client = SLIPTCPClient(*listener.getsockname(), max_pending=256 * 1024)
+    try:
+        packet = Packet(bytes(64 * 1024))
+        start_time = time.monotonic()
+        for _ in range(200):
+            client.send(packet)
+        assert time.monotonic() - start_time < 0.5
+        assert client.dropped > 0
+    finally:
+        client.close()
+        listener.close()
+
+
+def test_closed_tcp_client_does_not_reconnect():
+    listener = socket.socket()
+    listener.bind(('127.0.0.1', 0))
+    listener.listen(1)
+    listener.settimeout(0.2)
+    try:
+        client = SLIPTCPClient(*listener.getsockname())
+        client.close()
+        client.send_message('/fx/param/1/name', 'Cutoff')
+        assert client.dropped == 1
+        try:
+            conn, _ = listener.accept()
+        except socket.timeout:
+            conn = None
+        assert conn is None
+    finally:
+        listener.close()
+
+
+def test_unix_path():
+    assert unix_path('unix:/tmp/oscremap.sock') == '/tmp/oscremap.sock'
+    assert unix_path('127.0.0.1') is None
+
+
+def test_peer_endpoint_swaps_sides():
+    peer = peer_endpoint({
+        'listen_ip': '127.0.0.1', 'listen_port': 9000,
+        'remote_ip': '127.0.0.2', 'remote_port': 9001,
+        'transport': 'tcp'})
+    assert peer['listen_ip'] == '127.0.0.2'
+    assert peer['listen_port'] == 9001
+    assert peer['remote_ip'] == '127.0.0.1'
+    assert peer['remote_port'] == 9000
+    assert peer['transport'] == 'tcp'
+
+
+def test_unix_server_replaces_stale_socket(tmp_path):
+    path = str(tmp_path / 'osc.sock')
+    stale = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+    stale.bind(path)
+    stale.close()
+
+    server = BatchOSCUDPServer(path, Dispatcher(), family=socket.AF_UNIX)
+    server.server_close()
+
+
+def test_unix_server_keeps_other_files(tmp_path):
+    path = tmp_path / 'osc.sock'
+    path.write_text('not a socket')
+
+    with pytest.raises(FileExistsError):
+        BatchOSCUDPServer(str(path), Dispatcher(), family=socket.AF_UNIX)
+    assert path.read_text() == 'not a socket'
+    assert os.path.exists(str(path))
+
+
+def test_unix_datagram_round_trip(tmp_path):
+    path = str(tmp_path / 'osc.sock')
+    received = []
+    dispatcher = Dispatcher()
+    dispatcher.set_default_handler(lambda addr, *args: received.append(
+        (addr, args)))
+    server = BatchOSCUDPServer(path, dispatcher, family=socket.AF_UNIX)
+    try:
+        client = create_osc_client({
+            'remote_ip': 'unix:' + path, 'remote_port': None})
+        client.send_message('/fx/param/1/val', 0.25)
+        server.handle_batch(server.drain())
+        client.close()
+    finally:
+        server.server_close()
+    assert received == [('/fx/param/1/val', (0.25,))]
+    assert not os.path.exists(path)
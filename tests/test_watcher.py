@@ -0,0 +1,50 @@
+"""Tests for `oscremap.watcher`."""
+
+import threading
+
+from oscremap.watcher import FileWatcher
+
+
+def test_poll_detects_change(tmp_path):
+    path = tmp_path / 'config.yaml'
+    path.write_text('a: 1\n')
+    watcher = FileWatcher(lambda path: None)
+    watcher.inotify_fd = None
+    watcher.add(str(path))
+
+    assert watcher.poll() == set()
+    path.write_text('a: 22\n')
+    assert watcher.poll() == {str(path)}
+    assert watcher.poll() == set()
+
+
+def test_poll_detects_created_file(tmp_path):
+    path = tmp_path / 'fx_maps.yaml'
+    watcher = FileWatcher(lambda path: None)
+    watcher.inotify_fd = None
+    watcher.add(str(path))
+
+    path.write_text('Synth: {}\n')
+    assert watcher.poll() == {str(path)}
+
+
+def test_callback_on_change(tmp_path):
+    path = tmp_path / 'config.yaml'
+    path.write_text('a: 1\n')
+    changed = []
+    event = threading.Event()
+
+    def callback(path):
+        changed.append(path)
+        event.set()
+
+    watcher = FileWatcher(callback, poll_interval=0.01, settle_time=0.01)
+    watcher.add(str(path))
+    watcher.add(str(tmp_path / 'other.yaml'))
+    watcher.start()
+    try:
+        path.write_text('a: 22\n')
+        assert event.wait(2.0)
+    finally:
+        watcher.stop()
+    assert changed[0] == str(path)